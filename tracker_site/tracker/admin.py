@@ -1,3 +1,31 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import AddressParticipation, IndexedRange, IndexedTransaction, TxChain
+
+
+@admin.register(IndexedTransaction)
+class IndexedTransactionAdmin(admin.ModelAdmin):
+    list_display = ("chain", "tx_hash", "block_number", "from_address", "to_address")
+    list_filter = ("chain",)
+    search_fields = ("tx_hash", "from_address", "to_address")
+
+
+@admin.register(AddressParticipation)
+class AddressParticipationAdmin(admin.ModelAdmin):
+    list_display = ("chain", "address", "block_number", "transaction")
+    list_filter = ("chain",)
+    search_fields = ("address",)
+
+
+@admin.register(IndexedRange)
+class IndexedRangeAdmin(admin.ModelAdmin):
+    list_display = ("chain", "address", "start_block", "end_block", "updated_at")
+    list_filter = ("chain",)
+    search_fields = ("address",)
+
+
+@admin.register(TxChain)
+class TxChainAdmin(admin.ModelAdmin):
+    list_display = ("tx_hash", "chain", "updated_at")
+    list_filter = ("chain",)
+    search_fields = ("tx_hash",)
@@ -0,0 +1,290 @@
+# tracker/async_rpc.py
+"""
+Async counterparts of tracker/rpc.py for the ASGI view stack.
+
+AsyncChainClient speaks JSON-RPC over one aiohttp session per event loop
+(shared with the async explorer and Arkham calls), goes through the same
+RPCResponseCache as the sync clients and exposes an AsyncWeb3 instance, so
+one worker can keep hundreds of slow lookups in flight without a thread each.
+Endpoint selection and hedging work as in rpc.py; a hedge race's loser is
+cancelled and its latency so far still counts against its endpoint.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import aiohttp
+from web3 import AsyncWeb3
+from web3.providers.rpc import AsyncHTTPProvider
+
+from .health import CircuitOpenError, latency_class
+from .instrumentation import batch_name, record
+from .metrics import RPC_HEDGES
+from .ratelimit import RATE_LIMIT_RETRIES, retry_after
+from .rpc import (
+    RPC_CONNECTIVITY_TTL,
+    RPC_HEDGE,
+    RPC_RATE_BURST,
+    RPC_RATE_LIMIT,
+    RPC_SCAN_CONCURRENCY,
+    RPC_TIMEOUT,
+    RPC_TIP_TTL,
+    Endpoint,
+    RPCError,
+    build_endpoints,
+    endpoint_config,
+    endpoint_urls,
+    followed_tip,
+    rank,
+)
+from .rpc_cache import RPCResponseCache, block_of, finality_depth, is_cacheable
+
+logger = logging.getLogger(__name__)
+
+# Concurrent connections per event loop (all hosts) for the async stack.
+ASYNC_HTTP_POOL_SIZE = int(os.getenv("ASYNC_HTTP_POOL_SIZE", "200"))
+
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+def shared_session() -> aiohttp.ClientSession:
+    """Keep-alive aiohttp session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        # outside ASGI every async request runs on a throwaway loop; forget
+        # sessions of closed loops (they cannot be closed cleanly any more)
+        for stale_loop in [lp for lp in _sessions if lp.is_closed()]:
+            del _sessions[stale_loop]
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=ASYNC_HTTP_POOL_SIZE))
+        _sessions[loop] = session
+    return session
+
+
+class PooledAsyncHTTPProvider(AsyncHTTPProvider):
+    """AsyncHTTPProvider that sends every request through its owning AsyncChainClient."""
+
+    def __init__(self, client: "AsyncChainClient"):
+        super().__init__(client.rpc_url)
+        self._client = client
+
+    async def make_request(self, method, params):
+        return await self._client.send(method, params)
+
+    async def make_batch_request(self, batch_requests):
+        return await self._client.send_batch(batch_requests)
+
+
+class AsyncChainClient:
+    """Async JSON-RPC client for one chain (see rpc.ChainClient)."""
+
+    def __init__(self, chain_name: str, rpc_url: Union[str, Sequence[str]], timeout: float = RPC_TIMEOUT,
+                 cache: Optional[RPCResponseCache] = None, scan_concurrency: int = RPC_SCAN_CONCURRENCY,
+                 rate_limit: float = RPC_RATE_LIMIT, rate_burst: Optional[float] = RPC_RATE_BURST):
+        self.chain_name = chain_name
+        self.endpoints = build_endpoints(chain_name, endpoint_urls(rpc_url), rate_limit, rate_burst)
+        self.rpc_url = self.endpoints[0].url
+        self.scan_concurrency = max(1, scan_concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache = cache
+        self.finality_depth = finality_depth(chain_name)
+        self.w3 = AsyncWeb3(PooledAsyncHTTPProvider(self))
+        self._connected: Optional[bool] = None
+        self._connected_at = 0.0
+        self._tip: Optional[int] = None
+        self._tip_at = 0.0
+
+    # -------------------- transport --------------------
+    async def _post(self, data: bytes, methods: List[str]) -> Any:
+        ranked = rank(self.endpoints)
+        if not ranked:
+            for endpoint in self.endpoints:
+                endpoint.health.allow()  # counts the fast failure
+            raise CircuitOpenError(self.chain_name)
+        if len(ranked) == 1 or not RPC_HEDGE:
+            return await self._post_to(ranked[0], data, methods)
+        return await self._post_hedged(ranked[0], ranked[1], data, methods)
+
+    async def _post_hedged(self, primary: Endpoint, runner_up: Endpoint, data: bytes, methods: List[str]) -> Any:
+        first = asyncio.ensure_future(self._post_to(primary, data, methods))
+        tasks = {first: (primary, time.perf_counter())}
+        try:
+            await asyncio.wait({first}, timeout=primary.hedge_delay(latency_class(methods)))
+            if first.done():
+                if first.exception() is None:
+                    return first.result()
+                logger.debug("%s failed, retrying on %s: %s", primary.label, runner_up.label, first.exception())
+                RPC_HEDGES.inc(chain=self.chain_name, outcome="failover")
+                return await self._post_to(runner_up, data, methods)
+            second = asyncio.ensure_future(self._post_to(runner_up, data, methods))
+            tasks[second] = (runner_up, time.perf_counter())
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    RPC_HEDGES.inc(chain=self.chain_name, outcome="hedge_won" if task is second else "primary_won")
+                    for loser in pending:
+                        endpoint, started = tasks[loser]
+                        endpoint.health.abandoned((time.perf_counter() - started) * 1000.0, latency_class(methods))
+                    return task.result()
+            RPC_HEDGES.inc(chain=self.chain_name, outcome="both_failed")
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _post_to(self, endpoint: Endpoint, data: bytes, methods: List[str]) -> Any:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            endpoint.health.check()
+            await endpoint.limiter.aacquire(len(methods))
+            try:
+                return await self._post_once(endpoint, data, methods)
+            except aiohttp.ClientResponseError as e:
+                if e.status != 429 or attempt == RATE_LIMIT_RETRIES or not endpoint.limiter.enabled:
+                    raise
+                await endpoint.limiter.athrottled(retry_after(e.headers or {}))
+
+    async def _post_once(self, endpoint: Endpoint, data: bytes, methods: List[str]) -> Any:
+        started = time.perf_counter()
+        error = False
+        try:
+            async with shared_session().post(endpoint.url, data=data, timeout=self.timeout,
+                                             headers={"Content-Type": "application/json"}) as r:
+                r.raise_for_status()
+                body = await r.json(content_type=None)
+        except Exception as e:
+            error = True
+            if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                self._connected = None
+            if not (isinstance(e, aiohttp.ClientResponseError) and e.status == 429):
+                endpoint.health.failure(e, (time.perf_counter() - started) * 1000.0)
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            record("rpc", self.chain_name, batch_name(methods), elapsed_ms, len(methods), error)
+        endpoint.health.success(elapsed_ms, latency_class(methods))
+        return body
+
+    async def _cache_store(self, calls: List[Tuple[str, Any]], responses: List[Dict[str, Any]]):
+        """Cache the storable responses of calls (disk writes off the event loop)."""
+        if self.cache is None:
+            return
+        entries = []
+        for (method, params), response in zip(calls, responses):
+            if "error" in response or not is_cacheable(method, params):
+                continue
+            result = response.get("result")
+            block = block_of(method, result, params)
+            final = block is not None and block <= await self.final_block(block)
+            entries.append((method, params, result, final))
+        if entries:
+            await self.cache.aput_many(self.chain_name, entries)
+
+    async def send(self, method: str, params: Any) -> Dict[str, Any]:
+        """Send one JSON-RPC request (read-through cache) and return the response envelope."""
+        if self.cache is not None:
+            cached = (await self.cache.aenvelopes(self.chain_name, [(method, params)]))[0]
+            if cached is not None:
+                return cached
+        response = await self._post(self.w3.provider.encode_rpc_request(method, params), [method])
+        await self._cache_store([(method, params)], [response])
+        return response
+
+    async def send_batch(self, calls: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """Send a JSON-RPC batch; cached calls are answered locally."""
+        if not calls:
+            return []
+        responses: List[Optional[Dict[str, Any]]] = (
+            await self.cache.aenvelopes(self.chain_name, calls) if self.cache is not None else [None] * len(calls))
+        missing = [i for i, r in enumerate(responses) if r is None]
+        if missing:
+            payload = [{"jsonrpc": "2.0", "method": calls[i][0], "params": calls[i][1], "id": n}
+                       for n, i in enumerate(missing)]
+            fetched = await self._post(json.dumps(payload).encode("utf-8"), [calls[i][0] for i in missing])
+            if not isinstance(fetched, list):
+                raise RPCError("batch", fetched.get("error") if isinstance(fetched, dict) else fetched)
+            by_id = {item.get("id"): item for item in fetched if isinstance(item, dict)}
+            for n, i in enumerate(missing):
+                responses[i] = by_id.get(n, {"id": n, "error": {"message": "missing batch response"}})
+            await self._cache_store([calls[i] for i in missing], [responses[i] for i in missing])
+        return responses
+
+    async def request(self, method: str, params: Any) -> Any:
+        response = await self.send(method, params)
+        if "error" in response:
+            raise RPCError(method, response["error"])
+        return response.get("result")
+
+    # -------------------- chain tip / finality --------------------
+    async def tip(self, max_age: float = RPC_TIP_TTL) -> int:
+        tip = followed_tip(self.chain_name, max_age)
+        if tip is None:
+            if self._tip is not None and time.monotonic() - self._tip_at < max_age:
+                return self._tip
+            tip = int(await self.request("eth_blockNumber", []), 16)
+        self._tip = max(tip, self._tip or 0)
+        self._tip_at = time.monotonic()
+        return self._tip
+
+    async def final_block(self, block: Optional[int] = None) -> int:
+        known = self._tip
+        if known is not None and block is not None and block <= known - self.finality_depth:
+            return known - self.finality_depth
+        try:
+            return await self.tip() - self.finality_depth
+        except Exception as e:
+            logger.debug("Could not read chain tip for %s: %s", self.chain_name, e)
+            return -1
+
+    # -------------------- connectivity --------------------
+    async def is_connected(self) -> bool:
+        if not rank(self.endpoints):
+            return False
+        now = time.monotonic()
+        if self._connected is not None and now - self._connected_at < RPC_CONNECTIVITY_TTL:
+            return self._connected
+        try:
+            ok = bool(await self.w3.is_connected())
+        except Exception as e:
+            logger.debug("Connectivity probe failed for %s: %s", self.chain_name, e)
+            ok = False
+        self._connected = ok
+        self._connected_at = time.monotonic()
+        return ok
+
+
+class AsyncWeb3ClientRegistry:
+    """Lazily built AsyncChainClient per chain name (see rpc.Web3ClientRegistry)."""
+
+    def __init__(self, endpoints: Dict[str, Any], cache: Optional[RPCResponseCache] = None):
+        self._endpoints = endpoints
+        self.cache = cache
+        self._clients: Dict[str, AsyncChainClient] = {}
+
+    def chains(self) -> List[str]:
+        return list(self._endpoints.keys())
+
+    def get(self, chain_name: Optional[str]) -> Optional[AsyncChainClient]:
+        rpc, options = endpoint_config(self._endpoints.get(chain_name) if chain_name else None)
+        if not rpc:
+            return None
+        client = self._clients.get(chain_name)
+        if client is None:
+            client = self._clients[chain_name] = AsyncChainClient(chain_name, rpc, cache=self.cache, **options)
+        return client
+
+    async def connected(self, chain_name: Optional[str]) -> Optional[AsyncChainClient]:
+        client = self.get(chain_name)
+        if client is None:
+            return None
+        if not await client.is_connected():
+            logger.debug("RPC not connected for %s", chain_name)
+            return None
+        return client
@@ -0,0 +1,177 @@
+# tracker/async_views.py
+"""
+Async versions of tx_search, last10_from_tx and download_tx_pdf_plain.
+
+They are routed under async/ and meant to be served by an ASGI server through
+tracker_site/asgi.py (e.g. `uvicorn tracker_site.asgi:application`), where a
+slow lookup only holds a coroutine instead of a worker thread. Node calls go
+through AsyncChainClient, explorer and Arkham calls through aiohttp; context
+building and PDF rendering are shared with the sync views.
+"""
+import logging
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.shortcuts import render
+
+from .async_rpc import AsyncWeb3ClientRegistry
+from .chainmemo import afind_tx, known_chain
+from .history import awallet_history
+from .labels import ARKHAM_KEY, aresolve_labels
+from .pdfs import is_tx_hash, read_cached_pdf, store_pdf
+from .scan import SCAN_BLOCK_BUDGET
+from .views import (
+    REPORTLAB_AVAILABLE,
+    RPC_CLIENTS,
+    RPC_ENDPOINTS,
+    history_error,
+    label_tx_sources,
+    last10_results,
+    pdf_response,
+    pdf_tx_data,
+    render_tx_pdf,
+    tx_context,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async clients share the sync clients' RPC response cache
+ASYNC_RPC_CLIENTS = AsyncWeb3ClientRegistry(RPC_ENDPOINTS, cache=RPC_CLIENTS.cache)
+
+
+# -------------------- Helpers --------------------
+async def afetch_tx_bundle(client, tx_hash: str):
+    """Fetch (tx, receipt, block) for a hash on one chain."""
+    tx = await client.w3.eth.get_transaction(tx_hash)
+    receipt = await client.w3.eth.get_transaction_receipt(tx_hash)
+    block = await client.w3.eth.get_block(receipt.blockNumber)
+    return tx, receipt, block
+
+
+def _chains_to_search(selected_chain: Optional[str]):
+    return [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
+
+
+# -------------------- Views --------------------
+async def tx_search_async(request):
+    """Async tx_search (same template and context)."""
+    query = (request.GET.get("q") or "").strip()
+    selected_chain = request.GET.get("chain")
+    context = {
+        "query": query,
+        "tx": None,
+        "err": None,
+        "chain": selected_chain,
+        "chains": list(RPC_ENDPOINTS.keys()),
+    }
+
+    if not query:
+        return render(request, "tx_search.html", context)
+
+    if not query.startswith("0x") or len(query) != 66:
+        context["err"] = "Invalid transaction hash format"
+        return render(request, "tx_search.html", context)
+
+    hit = await afind_tx(ASYNC_RPC_CLIENTS, query, _chains_to_search(selected_chain),
+                         lambda client: afetch_tx_bundle(client, query))
+    if hit is None:
+        context["err"] = f"Transaction {query} not found on selected chain(s)."
+        return render(request, "tx_search.html", context)
+
+    tx, receipt, block = hit.result
+    labels = await aresolve_labels([tx.get("from"), tx.get("to")]) if ARKHAM_KEY else {}
+    context["tx"] = tx_context(query, tx, receipt, block, labels)
+    context["chain"] = hit.chain
+    return render(request, "tx_search.html", context)
+
+
+async def last10_from_tx_async(request):
+    """Async last10_from_tx (same template and context)."""
+    tx_hash = (request.GET.get("q") or "").strip()
+    selected_chain = request.GET.get("chain")
+    context = {
+        "query": tx_hash or None,
+        "chains": list(RPC_ENDPOINTS.keys()),
+        "chain": selected_chain,
+        "txs": None,
+        "chart_json": None,
+        "wallet": None,
+        "total_value_eth": 0.0,
+        "tx_count": 0,
+        "err": None,
+    }
+
+    if not tx_hash:
+        return render(request, "last10_from_tx.html", context)
+
+    if not tx_hash.startswith("0x") or len(tx_hash) < 10:
+        context["err"] = "Invalid transaction hash format"
+        return render(request, "last10_from_tx.html", context)
+
+    # Step 1: find base tx on any chain
+    hit = await afind_tx(ASYNC_RPC_CLIENTS, tx_hash, _chains_to_search(selected_chain),
+                         lambda client: client.w3.eth.get_transaction(tx_hash))
+    if hit is None or not hit.result:
+        context["err"] = f"Transaction {tx_hash} not found on supported chains or node doesn't have it."
+        return render(request, "last10_from_tx.html", context)
+    base_tx, client, found_chain = hit.result, hit.client, hit.chain
+
+    from_addr = base_tx.get("from")
+    if not from_addr:
+        context["err"] = "Source address not found in base transaction."
+        return render(request, "last10_from_tx.html", context)
+    context["wallet"] = from_addr
+    context["chain"] = found_chain
+
+    try:
+        start_block = int(base_tx.get("blockNumber") or await client.tip())
+    except Exception:
+        start_block = await client.tip()
+
+    # Step 2: race the explorer against the index + parallel batched async node scan
+    history = await awallet_history(client, from_addr, start_block, SCAN_BLOCK_BUDGET, limit=10)
+    collected = history.txs
+    context["history_source"] = history.source
+    if not collected:
+        context["err"] = history_error(history, from_addr)
+        return render(request, "last10_from_tx.html", context)
+
+    if ARKHAM_KEY:
+        await aresolve_labels([a for tx_info in collected if not tx_info.source for a in (tx_info.from_, tx_info.to)])
+    # labels are cached by now, so this does no network I/O
+    label_tx_sources(collected, client.w3)
+
+    context.update(last10_results(collected))
+    return render(request, "last10_from_tx.html", context)
+
+
+async def download_tx_pdf_plain_async(request):
+    """Async download_tx_pdf_plain."""
+    tx_hash = (request.GET.get("q") or "").strip()
+    selected_chain = request.GET.get("chain")
+    if not tx_hash:
+        return HttpResponse("Missing transaction hash (q parameter).", status=400)
+    if not is_tx_hash(tx_hash):
+        return HttpResponse("Invalid transaction hash format.", status=400)
+
+    cached_chain = await sync_to_async(known_chain)(tx_hash) or selected_chain
+    cached = await sync_to_async(read_cached_pdf)(cached_chain, tx_hash)
+    if cached is not None:
+        return pdf_response(cached, tx_hash)
+
+    hit = await afind_tx(ASYNC_RPC_CLIENTS, tx_hash, _chains_to_search(selected_chain),
+                         lambda client: afetch_tx_bundle(client, tx_hash))
+    if hit is None:
+        return HttpResponse(f"Transaction {tx_hash} not found.", status=404)
+
+    if not REPORTLAB_AVAILABLE:
+        return HttpResponse("PDF generation dependency missing. Install reportlab (pip install reportlab).", status=500)
+
+    tx, receipt, block = hit.result
+    data = pdf_tx_data(tx_hash, hit.chain, tx, receipt, block)
+    # reportlab rendering is CPU-bound: keep it off the event loop
+    pdf = await sync_to_async(render_tx_pdf, thread_sensitive=False)(data)
+    if int(receipt.blockNumber) <= await hit.client.final_block(int(receipt.blockNumber)):
+        await sync_to_async(store_pdf)(hit.chain, tx_hash, pdf)
+    return pdf_response(pdf, tx_hash)
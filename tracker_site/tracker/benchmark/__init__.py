@@ -0,0 +1,12 @@
+# tracker/benchmark/__init__.py
+"""
+Offline benchmark harness: a fake JSON-RPC node and a fake Etherscan-style
+API (fakes.py) plus end-to-end scenarios for tx_search, last10_from_tx,
+download_tx_pdf_plain and fetch_last_txs_from_explorer (runner.py).
+
+Run it with `python manage.py benchmark` (see --help); the report is JSON.
+"""
+from .fakes import WALLET, FakeChain, FakeExplorer, FakeNode
+from .runner import SCENARIOS, offline_stack, run_benchmarks
+
+__all__ = ["WALLET", "FakeChain", "FakeExplorer", "FakeNode", "SCENARIOS", "offline_stack", "run_benchmarks"]
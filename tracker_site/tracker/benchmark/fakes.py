@@ -0,0 +1,362 @@
+# tracker/benchmark/fakes.py
+"""
+Local stand-ins for a chain's JSON-RPC node and its Etherscan-style API.
+
+FakeChain generates a deterministic chain: every block holds
+`txs_per_block` transactions and the benchmark wallet sends the first one of
+every `wallet_every`-th block. Tx hashes encode their (block, index), so any
+tx, receipt or block is produced on demand without storing the chain.
+
+Every `token_every`-th block also holds a Transfer log of TOKEN involving
+the wallet (received and sent in turn, every fifth one an ERC-721 transfer),
+served by FakeNode's eth_getLogs; like hosted providers it refuses ranges
+wider than `max_log_range` blocks. Headers carry a matching logsBloom.
+
+FakeNode also answers eth_getTransactionCount at any block, like an archive
+node; with `archive_depth` set it keeps state only for that many blocks below
+the tip and rejects older ones the way a full node does.
+
+FakeNode and FakeExplorer serve it over HTTP on 127.0.0.1 with a fixed
+per-request latency and count every call by method / action.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from ..bloom import make_bloom
+
+WALLET = "0x" + "ab" * 20
+COUNTERPARTY = "0x" + "cd" * 20
+OTHER = "0x" + "ef" * 20
+TOKEN = "0x" + "70" * 20
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def _h(*parts) -> str:
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+
+
+class FakeChain:
+    """Deterministic chain data shared by FakeNode and FakeExplorer."""
+
+    def __init__(self, tip: int = 20000, wallet_every: int = 97, txs_per_block: int = 3,
+                 chain_id: int = 1, genesis_ts: int = 1700000000, block_time: int = 12, token_every: int = 50):
+        self.tip = tip
+        self.wallet_every = wallet_every
+        self.token_every = token_every
+        self.txs_per_block = txs_per_block
+        self.chain_id = chain_id
+        self.genesis_ts = genesis_ts
+        self.block_time = block_time
+
+    # -------------------- ids --------------------
+    @staticmethod
+    def block_hash(n: int) -> str:
+        return "0x" + _h("block", n)
+
+    @staticmethod
+    def tx_hash(n: int, i: int) -> str:
+        # block and index in the first 24 hex digits, padding after
+        return "0x" + f"{n:016x}{i:08x}" + _h("tx", n, i)[:40]
+
+    def locate(self, tx_hash: str) -> Optional[Tuple[int, int]]:
+        """(block, index) of a hash this chain generated, else None."""
+        try:
+            n, i = int(tx_hash[2:18], 16), int(tx_hash[18:26], 16)
+        except (TypeError, ValueError):
+            return None
+        if 0 <= n <= self.tip and 0 <= i < self.txs_per_block and self.tx_hash(n, i) == tx_hash.lower():
+            return n, i
+        return None
+
+    def wallet_blocks(self, start: int, end: int, descending: bool = True) -> range:
+        """Blocks in [start, end] holding a wallet tx."""
+        end = min(end, self.tip)
+        first = -(-max(start, 0) // self.wallet_every) * self.wallet_every
+        last = end - end % self.wallet_every
+        if descending:
+            return range(last, first - 1, -self.wallet_every)
+        return range(first, last + 1, self.wallet_every)
+
+    def wallet_tx_hashes(self, count: int) -> List[str]:
+        """Hashes of the wallet's `count` newest txs."""
+        return [self.tx_hash(n, 0) for n in list(self.wallet_blocks(0, self.tip))[:count]]
+
+    # -------------------- objects (JSON-RPC shapes) --------------------
+    def timestamp(self, n: int) -> int:
+        return self.genesis_ts + self.block_time * n
+
+    def tx(self, n: int, i: int) -> Dict[str, Any]:
+        sender = WALLET if (i == 0 and n % self.wallet_every == 0) else COUNTERPARTY
+        return {
+            "blockHash": self.block_hash(n), "blockNumber": hex(n), "from": sender,
+            "to": COUNTERPARTY if sender == WALLET else OTHER, "gas": hex(21000), "gasPrice": hex(10**9),
+            "hash": self.tx_hash(n, i), "input": "0x", "nonce": hex(n // self.wallet_every),
+            "transactionIndex": hex(i), "value": hex(10**17 * (i + 1)), "type": "0x0",
+            "chainId": hex(self.chain_id), "v": "0x1b", "r": "0x" + _h("r"), "s": "0x" + _h("s"),
+        }
+
+    def receipt(self, n: int, i: int) -> Dict[str, Any]:
+        tx = self.tx(n, i)
+        return {
+            "blockHash": tx["blockHash"], "blockNumber": tx["blockNumber"], "transactionHash": tx["hash"],
+            "transactionIndex": tx["transactionIndex"], "from": tx["from"], "to": tx["to"], "status": "0x1",
+            "gasUsed": hex(21000), "cumulativeGasUsed": hex(21000 * (i + 1)), "effectiveGasPrice": hex(10**9),
+            "logs": [], "logsBloom": "0x" + "00" * 256, "contractAddress": None, "type": "0x0",
+        }
+
+    def block(self, n: int, full: bool) -> Dict[str, Any]:
+        txs = [self.tx(n, i) for i in range(self.txs_per_block)]
+        return {
+            "number": hex(n), "hash": self.block_hash(n), "parentHash": self.block_hash(n - 1),
+            "timestamp": hex(self.timestamp(n)), "transactions": txs if full else [t["hash"] for t in txs],
+            "gasLimit": hex(30000000), "gasUsed": hex(21000 * self.txs_per_block), "miner": OTHER,
+            "logsBloom": self.logs_bloom(n), "nonce": "0x0000000000000000", "difficulty": "0x0",
+            "totalDifficulty": "0x0", "extraData": "0x", "size": "0x400", "baseFeePerGas": hex(10**9),
+            "stateRoot": "0x" + _h("state", n), "receiptsRoot": "0x" + _h("receipts", n),
+            "transactionsRoot": "0x" + _h("txs", n), "sha3Uncles": "0x" + _h("uncles"), "uncles": [],
+            "mixHash": "0x" + _h("mix", n),
+        }
+
+    def logs_bloom(self, n: int) -> str:
+        """Header logsBloom of block n: the token Transfer log's emitter and topics, if it has one."""
+        if n <= 0 or n % self.token_every:
+            return "0x" + "00" * 256
+        log = self.transfer_log(n)
+        return make_bloom([bytes.fromhex(log["address"][2:])] + [bytes.fromhex(t[2:]) for t in log["topics"]])
+
+    def tx_count(self, address: str, n: int) -> int:
+        """Txs address has sent up to and including block n (the wallet's nonce after block n)."""
+        if address.lower() != WALLET or n < 0:
+            return 0
+        return min(n, self.tip) // self.wallet_every + 1
+
+    def transfer_log(self, n: int) -> Dict[str, Any]:
+        """The token Transfer log of block n (a multiple of token_every)."""
+        k = n // self.token_every
+        sender, receiver = (COUNTERPARTY, WALLET) if k % 2 == 0 else (WALLET, OTHER)
+        topics = [TRANSFER_TOPIC, "0x" + sender[2:].rjust(64, "0"), "0x" + receiver[2:].rjust(64, "0")]
+        data = hex(10**18 * (k % 7 + 1))
+        if k % 5 == 4:
+            topics.append("0x" + format(k, "064x"))  # token id
+            data = "0x"
+        tx = self.tx(n, 1)
+        return {"address": TOKEN, "topics": topics, "data": data, "blockNumber": hex(n), "blockHash": tx["blockHash"],
+                "transactionHash": tx["hash"], "transactionIndex": "0x1", "logIndex": "0x0", "removed": False}
+
+    def transfer_logs(self, lo: int, hi: int, topics: List[Optional[str]]) -> List[Dict[str, Any]]:
+        """Transfer logs in [lo, hi] matching a getLogs topic filter (None matches anything)."""
+        first = -(-max(lo, 1) // self.token_every) * self.token_every
+        logs = []
+        for n in range(first, min(hi, self.tip) + 1, self.token_every):
+            log = self.transfer_log(n)
+            if all(want is None or (i < len(log["topics"]) and log["topics"][i] == want.lower())
+                   for i, want in enumerate(topics)):
+                logs.append(log)
+        return logs
+
+    def explorer_row(self, n: int) -> Dict[str, str]:
+        """Etherscan txlist row of the wallet's tx in block n."""
+        tx = self.tx(n, 0)
+        return {
+            "blockNumber": str(n), "timeStamp": str(self.timestamp(n)), "hash": tx["hash"],
+            "nonce": str(int(tx["nonce"], 16)), "blockHash": tx["blockHash"], "transactionIndex": "0",
+            "from": tx["from"], "to": tx["to"], "value": str(int(tx["value"], 16)), "gas": "21000",
+            "gasPrice": str(10**9), "isError": "0", "txreceipt_status": "1", "input": "0x",
+            "contractAddress": "", "cumulativeGasUsed": "21000", "gasUsed": "21000",
+            "confirmations": str(self.tip - n),
+        }
+
+
+# -------------------- servers --------------------
+class _FakeServer:
+    """ThreadingHTTPServer on an ephemeral port with latency and a call counter."""
+
+    def __init__(self, chain: FakeChain, latency: float = 0.0):
+        self.chain = chain
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.last_call = 0.0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def count(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+            self.last_call = time.monotonic()
+
+    def wait_idle(self, quiet: float = 0.3, timeout: float = 60.0) -> bool:
+        """Block until no call arrived for `quiet` seconds (background work has settled)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            idle = time.monotonic() - self.last_call
+            if idle >= quiet:
+                return True
+            time.sleep(quiet - idle)
+        return False
+
+    def take_calls(self) -> Counter:
+        """Calls counted since the last take_calls()."""
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+    def respond(self, handler: BaseHTTPRequestHandler) -> Any:
+        raise NotImplementedError
+
+    def start(self) -> "_FakeServer":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out as separate writes; without TCP_NODELAY
+            # delayed ACKs add ~40 ms to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                data = json.dumps(fake.respond(self)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _reply
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeNode(_FakeServer):
+    """JSON-RPC node (single and batch requests) serving a FakeChain."""
+
+    max_log_range = 5000
+    archive_depth: Optional[int] = None  # blocks of historical state kept below the tip (None: all)
+    batches = True  # False: answer every batch with one error, like nodes that reject them
+
+    def respond(self, handler):
+        body = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length") or 0)) or b"null")
+        if isinstance(body, list):
+            if not self.batches:
+                self.count("batch_rejected")
+                return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch requests disabled"}}
+            return [self.call(req) for req in body]
+        return self.call(body)
+
+    def call(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        method, params = req.get("method"), req.get("params") or []
+        self.count(method)
+        handler = getattr(self, "rpc_" + str(method), None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": req.get("id"),
+                    "error": {"code": -32601, "message": f"the method {method} does not exist"}}
+        try:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": handler(*params)}
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32005, "message": str(e)}}
+
+    def _block_number(self, tag) -> int:
+        return self.chain.tip if tag in ("latest", "safe", "finalized", "pending") else int(tag, 16)
+
+    def rpc_web3_clientVersion(self):
+        return "FakeNode/1.0"
+
+    def rpc_net_version(self):
+        return str(self.chain.chain_id)
+
+    def rpc_eth_chainId(self):
+        return hex(self.chain.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return hex(self.chain.tip)
+
+    def rpc_eth_getBlockByNumber(self, tag, full=False):
+        n = self._block_number(tag)
+        return self.chain.block(n, full) if 0 <= n <= self.chain.tip else None
+
+    def rpc_eth_getTransactionByHash(self, tx_hash):
+        where = self.chain.locate(tx_hash)
+        return self.chain.tx(*where) if where else None
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        where = self.chain.locate(tx_hash)
+        return self.chain.receipt(*where) if where else None
+
+    def rpc_eth_getTransactionCount(self, address, tag="latest"):
+        n = self._block_number(tag)
+        if n > self.chain.tip:
+            raise ValueError("header not found")
+        if self.archive_depth is not None and n < self.chain.tip - self.archive_depth:
+            raise ValueError(f"missing trie node (state of block {n} is not available)")
+        return hex(self.chain.tx_count(address, n))
+
+    def rpc_eth_getLogs(self, flt):
+        lo, hi = self._block_number(flt.get("fromBlock", "latest")), self._block_number(flt.get("toBlock", "latest"))
+        if hi - lo + 1 > self.max_log_range:
+            raise ValueError(f"query exceeds max block range {self.max_log_range}")
+        if (flt.get("address") or TOKEN).lower() != TOKEN:
+            return []
+        return self.chain.transfer_logs(lo, hi, flt.get("topics") or [])
+
+    def rpc_eth_call(self, call, tag="latest"):
+        if (call.get("to") or "").lower() != TOKEN:
+            return "0x"
+        selector = (call.get("data") or call.get("input") or "")[:10]
+        if selector == "0x313ce567":  # decimals()
+            return "0x" + hex(18)[2:].rjust(64, "0")
+        if selector == "0x95d89b41":  # symbol()
+            return "0x" + hex(32)[2:].rjust(64, "0") + hex(3)[2:].rjust(64, "0") + b"TKN".hex().ljust(64, "0")
+        return "0x"
+
+
+class FakeExplorer(_FakeServer):
+    """Etherscan-style txlist API (page/offset/startblock/endblock/sort, result window) for the wallet."""
+
+    result_window = 10000
+
+    def respond(self, handler):
+        query = {k: v[-1] for k, v in parse_qs(urlparse(handler.path).query).items()}
+        action = query.get("action", "")
+        self.count(action)
+        if query.get("module") != "account" or action != "txlist":
+            return {"status": "0", "message": "NOTOK", "result": "Error! Missing Or invalid Module name"}
+        page, offset = int(query.get("page", 1)), int(query.get("offset", 10000))
+        if page * offset > self.result_window:
+            return {"status": "0", "message": "NOTOK",
+                    "result": "Result window is too large, PageNo x Offset size must be less than or equal to 10000"}
+        if query.get("address", "").lower() != WALLET:
+            return {"status": "0", "message": "No transactions found", "result": []}
+        blocks = self.chain.wallet_blocks(int(query.get("startblock", 0)), int(query.get("endblock", self.chain.tip)),
+                                          descending=query.get("sort", "asc") == "desc")
+        rows = [self.chain.explorer_row(n) for n in blocks[(page - 1) * offset:page * offset]]
+        if not rows:
+            return {"status": "0", "message": "No transactions found", "result": []}
+        return {"status": "1", "message": "OK", "result": rows}
@@ -0,0 +1,228 @@
+# tracker/benchmark/runner.py
+"""
+End-to-end benchmark scenarios against FakeNode / FakeExplorer.
+
+offline_stack() points the views at the fakes (one chain, "Ethereum
+Mainnet") with private in-memory caches and temporary PDF cache and metrics
+dirs; run_benchmarks() then drives each scenario through Django's test
+Client (or calls the function directly for the explorer walk) and reports
+throughput, latency percentiles and node / explorer calls per request as a
+dict ready for json.dumps.
+
+Every measured request uses a distinct wallet tx hash. Warm runs keep what
+the warm-up requests built (connection pools, wallet index, memo); cold runs
+reset all of it before every request.
+"""
+import os
+import sys
+import time
+import shutil
+import platform
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+import django
+from django.core.cache import caches
+from django.test import Client, override_settings
+
+from .. import explorer, history, metrics, pdfs, views
+from ..models import AddressParticipation, IndexedRange, IndexedTransaction, TxChain
+from ..rpc import Web3ClientRegistry
+from ..rpc_cache import RPCResponseCache
+from .fakes import WALLET, FakeChain, FakeExplorer, FakeNode
+
+CHAIN = "Ethereum Mainnet"
+SCENARIOS = ("tx_search", "last10_from_tx", "download_tx_pdf_plain", "fetch_last_txs_from_explorer")
+
+_BENCH_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"benchmark-{alias}"}
+    for alias in ("default", "rpc_memory", "rpc_disk")
+}
+
+
+@contextmanager
+def offline_stack(node_url: str, explorer_url: str, history_mode: Optional[str] = None) -> Iterator[str]:
+    """Route views, explorer calls, caches and metrics to the fakes / temp dirs; yields the temporary PDF cache dir."""
+    endpoints = {CHAIN: {"url": node_url}}
+    pdf_dir = tempfile.mkdtemp(prefix="tracker-bench-pdf-")
+    metrics_dir = tempfile.mkdtemp(prefix="tracker-bench-metrics-")
+    with ExitStack() as stack:
+        stack.callback(shutil.rmtree, metrics_dir, True)
+        stack.enter_context(metrics.isolated(metrics_dir))
+        stack.enter_context(override_settings(CACHES=_BENCH_CACHES, ALLOWED_HOSTS=["*"]))
+        stack.enter_context(mock.patch.object(views, "RPC_ENDPOINTS", endpoints))
+        stack.enter_context(mock.patch.object(views, "RPC_CLIENTS",
+                                              Web3ClientRegistry(endpoints, cache=RPCResponseCache())))
+        stack.enter_context(mock.patch.dict(explorer.EXPLORER_APIS[CHAIN], api_base=explorer_url,
+                                            rate_limit=0))
+        stack.enter_context(mock.patch.dict(os.environ, {explorer.EXPLORER_APIS[CHAIN]["env_key"]: "benchmark"}))
+        stack.enter_context(mock.patch.object(pdfs, "PDF_CACHE_DIR", pdfs.Path(pdf_dir)))
+        if history_mode:
+            stack.enter_context(mock.patch.object(history, "DEFAULT_HISTORY_MODE", history_mode))
+        stack.callback(shutil.rmtree, pdf_dir, True)
+        yield pdf_dir
+
+
+def reset_state(pdf_dir: str):
+    """Forget everything learned by earlier requests (caches, index, memo, PDFs)."""
+    for alias in _BENCH_CACHES:
+        caches[alias].clear()
+    for model in (AddressParticipation, IndexedTransaction, IndexedRange, TxChain):
+        model.objects.all().delete()
+    shutil.rmtree(pdf_dir, ignore_errors=True)
+
+
+def _percentile(sorted_ms: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_ms:
+        return 0.0
+    rank = max(1, -(-len(sorted_ms) * pct // 100))
+    return sorted_ms[int(rank) - 1]
+
+
+def _measure(call: Callable[[str], bool], tx_hashes: List[str], concurrency: int,
+             before_each: Optional[Callable[[], None]]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(tx_hash: str):
+        nonlocal errors
+        if before_each is not None:
+            before_each()
+        started = time.perf_counter()
+        try:
+            ok = call(tx_hash)
+        except Exception:
+            ok = False
+        ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(ms)
+            errors += not ok
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for tx_hash in tx_hashes:
+            one(tx_hash)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+            list(pool.map(one, tx_hashes))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(tx_hashes),
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "requests_per_s": round(len(tx_hashes) / wall, 2) if wall else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 2),
+            "p90": round(_percentile(latencies, 90), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def _per_request(calls: Counter, requests: int) -> Dict[str, Any]:
+    return {
+        "total": sum(calls.values()),
+        "per_request": round(sum(calls.values()) / requests, 2) if requests else 0.0,
+        "by_method": dict(sorted(calls.items())),
+    }
+
+
+def _settle(*servers):
+    for server in servers:
+        server.wait_idle()
+        server.take_calls()
+
+
+def _view_call(path: str) -> Callable[[str], bool]:
+    client = Client()
+
+    def call(tx_hash: str) -> bool:
+        response = client.get(path, {"q": tx_hash})
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+        context = getattr(response, "context", None)
+        return response.status_code == 200 and not (context is not None and context.get("err"))
+    return call
+
+
+def _explorer_call(limit: int) -> Callable[[str], bool]:
+    def call(_tx_hash: str) -> bool:
+        rows = explorer.fetch_last_txs_from_explorer(CHAIN, WALLET, limit=limit)
+        return bool(rows)
+    return call
+
+
+def scenario_call(name: str, explorer_limit: int) -> Callable[[str], bool]:
+    if name == "tx_search":
+        return _view_call("/search/")
+    if name == "last10_from_tx":
+        return _view_call("/last10/")
+    if name == "download_tx_pdf_plain":
+        return _view_call("/download_pdf/")
+    if name == "fetch_last_txs_from_explorer":
+        return _explorer_call(explorer_limit)
+    raise ValueError(f"Unknown benchmark scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+
+
+def run_benchmarks(scenarios=SCENARIOS, requests: int = 20, concurrency: int = 1, warmup: int = 1,
+                   cold: bool = False, node_latency: float = 0.02, explorer_latency: float = 0.05,
+                   tip: int = 20000, wallet_every: int = 97, history_mode: Optional[str] = None,
+                   explorer_limit: int = 100) -> Dict[str, Any]:
+    """
+    Run the named scenarios and return the JSON-ready report. cold resets
+    all state before every request (and requires concurrency 1).
+    """
+    if cold and concurrency > 1:
+        raise ValueError("cold runs reset shared state before each request; use concurrency 1")
+    for name in scenarios:
+        scenario_call(name, explorer_limit)  # validate names before starting servers
+
+    chain = FakeChain(tip=tip, wallet_every=wallet_every)
+    # newest wallet txs first; warm-up hashes are kept apart from measured ones
+    tx_hashes = chain.wallet_tx_hashes(warmup + requests)
+    warm_hashes, measured = tx_hashes[:warmup], tx_hashes[warmup:]
+    report: Dict[str, Any] = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": sys.platform,
+            "config": {
+                "requests": len(measured), "concurrency": concurrency, "warmup": warmup, "cold": cold,
+                "node_latency_s": node_latency, "explorer_latency_s": explorer_latency, "tip": tip,
+                "wallet_every": wallet_every, "history_mode": history_mode or history.DEFAULT_HISTORY_MODE,
+                "explorer_limit": explorer_limit,
+            },
+        },
+        "scenarios": {},
+    }
+
+    with FakeNode(chain, node_latency) as node, FakeExplorer(chain, explorer_latency) as fake_explorer, \
+            offline_stack(node.url, fake_explorer.url, history_mode) as pdf_dir:
+        for name in scenarios:
+            call = scenario_call(name, explorer_limit)
+            reset_state(pdf_dir)
+            for tx_hash in warm_hashes:
+                call(tx_hash)
+            # let the warm-up's background work (race losers) finish uncounted
+            _settle(node, fake_explorer)
+            result = _measure(call, measured, concurrency, (lambda: reset_state(pdf_dir)) if cold else None)
+            # background work started by measured requests is counted, not timed
+            node.wait_idle()
+            fake_explorer.wait_idle()
+            result["rpc_calls"] = _per_request(node.take_calls(), len(measured))
+            result["explorer_calls"] = _per_request(fake_explorer.take_calls(), len(measured))
+            report["scenarios"][name] = result
+    return report
@@ -0,0 +1,105 @@
+# tracker/bloom.py
+"""
+Block header logsBloom tests for the "bloom" scan mode.
+
+Each header carries a 2048-bit bloom filter of every log emitter address
+and log topic in the block. A wallet that is an indexed topic (ERC-20 /
+ERC-721 Transfer from/to, approvals, most DeFi events) or emits logs itself
+sets its bits, so a header whose bloom lacks them cannot hold such a log and
+the scan skips the block body. The bloom says nothing about txs that emit no
+log mentioning the wallet (plain ETH transfers, calls without such events):
+the mode trades those away for far fewer body downloads and is meant for
+token-active wallets.
+
+Outcomes are counted per chain (tracker_scan_bloom_blocks_total and
+bloom_stats()): headers skipped, candidate bodies that held a wallet tx, and
+false positives (candidate bodies without one: a real bloom collision, or a
+log naming the wallet in a tx it neither sent nor received).
+"""
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from eth_utils import keccak
+
+from .metrics import SCAN_BLOOM_BLOCKS
+
+BLOOM_BYTES = 256
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _bits(item: bytes) -> Tuple[Tuple[int, int], ...]:
+    """(byte index, mask) of the three bloom bits an item sets (yellow paper M3:2048)."""
+    h = keccak(item)
+    bits = []
+    for i in (0, 2, 4):
+        bit = ((h[i] << 8) | h[i + 1]) & 2047
+        bits.append((BLOOM_BYTES - 1 - bit // 8, 1 << (bit % 8)))
+    return tuple(bits)
+
+
+@lru_cache(maxsize=1024)
+def address_bits(address: str) -> Tuple[Tuple[Tuple[int, int], ...], Tuple[Tuple[int, int], ...]]:
+    """Bloom bits of an address as a log emitter and as a 32-byte topic."""
+    raw = bytes.fromhex(address.lower()[2:])
+    return _bits(raw), _bits(raw.rjust(32, b"\0"))
+
+
+def bloom_bytes(value: Any) -> Optional[bytes]:
+    """A header's logsBloom as bytes (hex string or bytes), None if missing or malformed."""
+    if isinstance(value, str):
+        try:
+            value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+        except ValueError:
+            return None
+    if isinstance(value, (bytes, bytearray)) and len(value) == BLOOM_BYTES:
+        return bytes(value)
+    return None
+
+
+def may_mention(logs_bloom: Any, address: str) -> bool:
+    """False only if no log in the block can have address as emitter or topic."""
+    bloom = bloom_bytes(logs_bloom)
+    if bloom is None:
+        return True  # cannot rule it out
+    return any(all(bloom[i] & mask for i, mask in bits) for bits in address_bits(address))
+
+
+def make_bloom(items: Iterable[bytes]) -> str:
+    """logsBloom hex for a set of emitter addresses / topics (used by the benchmark's fake chain)."""
+    bloom = bytearray(BLOOM_BYTES)
+    for item in items:
+        for i, mask in _bits(item):
+            bloom[i] |= mask
+    return "0x" + bloom.hex()
+
+
+def record_bloom(chain_name: str, skipped: int, hits: int, false_positives: int):
+    """Count one header batch's outcomes."""
+    for outcome, count in (("skipped", skipped), ("hit", hits), ("false_positive", false_positives)):
+        if count:
+            SCAN_BLOOM_BLOCKS.inc(count, chain=chain_name, outcome=outcome)
+    with _stats_lock:
+        stats = _stats.setdefault(chain_name, {"skipped": 0, "hits": 0, "false_positives": 0})
+        stats["skipped"] += skipped
+        stats["hits"] += hits
+        stats["false_positives"] += false_positives
+
+
+def bloom_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-chain bloom prefilter outcomes in this worker, with the false-positive rate among candidates."""
+    with _stats_lock:
+        out: Dict[str, Dict[str, Any]] = {chain: dict(stats) for chain, stats in _stats.items()}
+    for stats in out.values():
+        candidates = stats["hits"] + stats["false_positives"]
+        stats["headers"] = stats["skipped"] + candidates
+        stats["false_positive_rate"] = round(stats["false_positives"] / candidates, 4) if candidates else None
+    return out
+
+
+def candidates(numbers: List[int], headers: List[Dict[str, Any]], wallet: str) -> List[int]:
+    """Block numbers (in the given order) whose fetched header may mention wallet."""
+    return [n for n, response in zip(numbers, headers)
+            if response.get("result") and may_mention(response["result"].get("logsBloom"), wallet)]
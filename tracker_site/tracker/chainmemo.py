@@ -0,0 +1,97 @@
+# tracker/chainmemo.py
+"""
+Persistent tx hash -> chain memo.
+
+Once a hash has been found on a chain, follow-up requests for it (the PDF
+link after tx_search, last10 for the same tx, a wrong or missing chain
+parameter) should not repeat the multi-chain search. find_tx() asks the
+memoised chain first and records the winning chain of every search. The
+memo lives in the TxChain table (IndexedTransaction rows count too), fronted
+by the default Django cache.
+"""
+import os
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from .lookup import Hit, afirst_hit, first_hit
+from .models import IndexedTransaction, TxChain
+
+logger = logging.getLogger(__name__)
+
+# Seconds a memo entry / a "hash not memoised" answer stays in the cache front.
+CHAIN_MEMO_TTL = int(os.getenv("CHAIN_MEMO_TTL", str(24 * 3600)))
+CHAIN_MEMO_NEGATIVE_TTL = int(os.getenv("CHAIN_MEMO_NEGATIVE_TTL", "60"))
+
+_UNKNOWN = ""  # cached marker for "no memo for this hash"
+
+
+def _cache_key(tx_hash: str) -> str:
+    return f"txchain:{tx_hash.lower()}"
+
+
+def known_chain(tx_hash: str) -> Optional[str]:
+    """Chain this hash was last found on, or None."""
+    key = _cache_key(tx_hash)
+    chain = cache.get(key)
+    if chain is not None:
+        return chain or None
+    tx_hash = tx_hash.lower()
+    try:
+        chain = (TxChain.objects.filter(tx_hash=tx_hash).values_list("chain", flat=True).first()
+                 or IndexedTransaction.objects.filter(tx_hash=tx_hash).values_list("chain", flat=True).first())
+    except DatabaseError as e:
+        logger.warning("Chain memo unavailable: %s", e)
+        return None
+    cache.set(key, chain or _UNKNOWN, CHAIN_MEMO_TTL if chain else CHAIN_MEMO_NEGATIVE_TTL)
+    return chain
+
+
+def remember_chain(tx_hash: str, chain: str):
+    """Record that tx_hash lives on chain."""
+    key = _cache_key(tx_hash)
+    if cache.get(key) == chain:
+        return
+    try:
+        TxChain.objects.update_or_create(tx_hash=tx_hash.lower(), defaults={"chain": chain})
+    except DatabaseError as e:
+        logger.warning("Could not record chain memo for %s: %s", tx_hash, e)
+    cache.set(key, chain, CHAIN_MEMO_TTL)
+
+
+def find_tx(registry, tx_hash: str, chains: Iterable[Optional[str]], fetch: Callable[..., Any]) -> Optional[Hit]:
+    """
+    first_hit() for a tx hash: the memoised chain is asked alone first (even if
+    `chains` names another one); otherwise `chains` are searched concurrently
+    and the winning chain is memoised.
+    """
+    chains = list(chains)
+    memo = known_chain(tx_hash)
+    if memo and registry.get(memo) is not None:
+        hit = first_hit(registry, [memo], fetch)
+        if hit is not None:
+            return hit
+        chains = [c for c in chains if c != memo]
+    hit = first_hit(registry, chains, fetch)
+    if hit is not None:
+        remember_chain(tx_hash, hit.chain)
+    return hit
+
+
+async def afind_tx(registry, tx_hash: str, chains: Iterable[Optional[str]],
+                   fetch: Callable[..., Awaitable[Any]]) -> Optional[Hit]:
+    """Async find_tx() for an AsyncWeb3ClientRegistry."""
+    chains = list(chains)
+    memo = await sync_to_async(known_chain)(tx_hash)
+    if memo and registry.get(memo) is not None:
+        hit = await afirst_hit(registry, [memo], fetch)
+        if hit is not None:
+            return hit
+        chains = [c for c in chains if c != memo]
+    hit = await afirst_hit(registry, chains, fetch)
+    if hit is not None:
+        await sync_to_async(remember_chain)(tx_hash, hit.chain)
+    return hit
@@ -0,0 +1,298 @@
+# tracker/explorer.py
+"""
+Etherscan-family explorer API (Etherscan / Polygonscan / BscScan).
+
+iter_explorer_txs() walks an address's txlist lazily, one page per request,
+inside an optional [startblock, endblock] window, and stops as soon as the
+caller stops iterating, so long histories are consumed with one page in
+memory. Explorers refuse page * offset beyond their result window (10000
+rows); past it the walk narrows the block window to the last block seen and
+restarts at page 1, skipping rows of that boundary block already yielded.
+
+Every page request waits for its API key's rate limiter (ratelimit.py), so
+bursts queue instead of being refused; "Max rate limit reached" answers are
+retried after a back-off rather than read as an empty history.
+"""
+import os
+import asyncio
+import logging
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set
+
+import aiohttp
+import requests
+
+from .async_rpc import shared_session
+from .instrumentation import timed
+from .ratelimit import RATE_LIMIT_RETRIES, RateLimitExceeded, TokenBucket, bucket, retry_after
+from .records import TxRecord, to_record
+
+logger = logging.getLogger(__name__)
+
+EXPLORER_APIS = {
+    "Ethereum Mainnet": {
+        "api_base": "https://api.etherscan.io/api",
+        "env_key": "ETHERSCAN_API_KEY",
+        "explorer_tx": "https://etherscan.io/tx/{}",
+        "explorer_addr": "https://etherscan.io/address/{}",
+    },
+    "Sepolia Testnet": {
+        "api_base": "https://api-sepolia.etherscan.io/api",
+        "env_key": "ETHERSCAN_API_KEY",
+        "explorer_tx": "https://sepolia.etherscan.io/tx/{}",
+        "explorer_addr": "https://sepolia.infura.io/address/{}",
+    },
+    "Polygon Mainnet": {
+        "api_base": "https://api.polygonscan.com/api",
+        "env_key": "POLYGONSCAN_API_KEY",
+        "explorer_tx": "https://polygonscan.com/tx/{}",
+        "explorer_addr": "https://polygonscan.com/address/{}",
+    },
+    "Binance Smart Chain": {
+        "api_base": "https://api.bscscan.com/api",
+        "env_key": "BSCSCAN_API_KEY",
+        "explorer_tx": "https://bscscan.com/tx/{}",
+        "explorer_addr": "https://bscscan.com/address/{}",
+    },
+}
+
+EXPLORER_TIMEOUT = float(os.getenv("EXPLORER_TIMEOUT", "10"))
+# Rows per txlist page when walking a history.
+EXPLORER_PAGE_SIZE = int(os.getenv("EXPLORER_PAGE_SIZE", "100"))
+# Explorers reject page * offset above this.
+EXPLORER_RESULT_WINDOW = int(os.getenv("EXPLORER_RESULT_WINDOW", "10000"))
+# Requests per second and burst allowed per API key across all workers, unless
+# the EXPLORER_APIS entry sets "rate_limit" / "rate_burst"; 0 = unlimited.
+EXPLORER_RATE_LIMIT = float(os.getenv("EXPLORER_RATE_LIMIT", "5"))
+EXPLORER_RATE_BURST = float(os.getenv("EXPLORER_RATE_BURST", "0")) or None
+MAX_BLOCK = 99999999
+
+_session = requests.Session()
+
+
+class ExplorerError(Exception):
+    """Explorer not configured for the chain, API key missing or request failed."""
+
+
+class ExplorerAPIError(ExplorerError):
+    """Explorer answered with an error status (rate limit, invalid key, ...)."""
+
+
+def explorer_config(chain_name: str) -> Dict[str, str]:
+    """Config for a chain's explorer, with its API key; raises ExplorerError if unusable."""
+    cfg = EXPLORER_APIS.get(chain_name)
+    if not cfg:
+        raise ExplorerError(f"No explorer API for chain {chain_name}")
+    api_key = os.getenv(cfg["env_key"])
+    if not api_key:
+        raise ExplorerError(f"Explorer API key missing for chain {chain_name} (env var: {cfg['env_key']})")
+    return dict(cfg, api_key=api_key)
+
+
+def explorer_limiter(cfg: Dict[str, Any]) -> TokenBucket:
+    """Rate limiter of an explorer API key; chains sharing a key (Etherscan mainnet / Sepolia) share it."""
+    return bucket(f"explorer:{cfg['env_key']}", f"explorer:{cfg['env_key']}:{cfg['api_key']}",
+                  cfg.get("rate_limit", EXPLORER_RATE_LIMIT), cfg.get("rate_burst", EXPLORER_RATE_BURST))
+
+
+def _rate_limited(data: Any) -> bool:
+    """Etherscan-family "Max rate limit reached" answers (HTTP 200, status 0)."""
+    return (isinstance(data, dict) and data.get("status") != "1"
+            and "rate limit" in str(data.get("result") or data.get("message") or "").lower())
+
+
+class _Walk:
+    """Paging state shared by the sync and async walkers."""
+
+    def __init__(self, address: str, startblock: int, endblock: int, page_size: int, sort: str):
+        self.address = address
+        self.startblock = startblock
+        self.endblock = endblock
+        self.sort = sort
+        self.page_size = max(1, min(page_size, EXPLORER_RESULT_WINDOW))
+        self.page = 1
+        self.boundary_block: Optional[int] = None
+        self.boundary_hashes: Set[str] = set()
+        self.done = False
+
+    def params(self, api_key: str) -> Dict[str, Any]:
+        return {
+            "module": "account",
+            "action": "txlist",
+            "address": self.address,
+            "startblock": self.startblock,
+            "endblock": self.endblock,
+            "page": self.page,
+            "offset": self.page_size,
+            "sort": self.sort,
+            "apikey": api_key,
+        }
+
+    def rows(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """New rows of one page response; advances the walk."""
+        result = data.get("result")
+        if data.get("status") != "1" or not isinstance(result, list):
+            if isinstance(result, list):  # "No transactions found"
+                self.done = True
+                return []
+            raise ExplorerAPIError(f"Explorer API returned status={data.get('status')} "
+                                   f"message={data.get('message')} result={result}")
+        fresh = []
+        for row in result:
+            block = int(row.get("blockNumber") or 0)
+            if block == self.boundary_block and row.get("hash") in self.boundary_hashes:
+                continue
+            if block != self.boundary_block:
+                self.boundary_block, self.boundary_hashes = block, set()
+            self.boundary_hashes.add(row.get("hash"))
+            fresh.append(row)
+
+        if len(result) < self.page_size:
+            self.done = True
+        elif (self.page + 1) * self.page_size <= EXPLORER_RESULT_WINDOW:
+            self.page += 1
+        elif self.boundary_block is None or not fresh:
+            # a single block holds more rows than the result window
+            logger.warning("Explorer result window exhausted for %s at block %s", self.address, self.boundary_block)
+            self.done = True
+        else:
+            # restart from page 1 inside the window still left to walk
+            if self.sort == "desc":
+                self.endblock = self.boundary_block
+            else:
+                self.startblock = self.boundary_block
+            self.page = 1
+        return fresh
+
+
+def iter_explorer_txs(chain_name: str, address: str, startblock: int = 0, endblock: int = MAX_BLOCK,
+                      page_size: int = EXPLORER_PAGE_SIZE, sort: str = "desc") -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield raw txlist rows for address (newest first by default) within
+    [startblock, endblock], fetching the next page only when the previous one
+    has been consumed. Raises ExplorerError / ExplorerAPIError.
+    """
+    cfg = explorer_config(chain_name)
+    walk = _Walk(address, startblock, endblock, page_size, sort)
+    while not walk.done:
+        yield from walk.rows(_get_page(chain_name, cfg, walk.params(cfg["api_key"])))
+
+
+def _get_page(chain_name: str, cfg: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """One txlist request through the key's rate limiter; "rate limited" answers are queued again."""
+    limiter = explorer_limiter(cfg)
+    for _ in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            limiter.acquire()
+            with timed("explorer", chain_name, "txlist"):
+                r = _session.get(cfg["api_base"], params=params, timeout=EXPLORER_TIMEOUT)
+                r.raise_for_status()
+                data = r.json()
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 429:
+                raise ExplorerError(f"Explorer API request failed for {chain_name}: {e}") from e
+            limiter.throttled(retry_after(e.response.headers))
+        except (requests.RequestException, ValueError, RateLimitExceeded) as e:
+            raise ExplorerError(f"Explorer API request failed for {chain_name}: {e}") from e
+        else:
+            if not _rate_limited(data):
+                return data
+            limiter.throttled()
+        if not limiter.enabled:
+            break
+    raise ExplorerError(f"Explorer API rate limit exceeded for {chain_name}")
+
+
+async def aiter_explorer_txs(chain_name: str, address: str, startblock: int = 0, endblock: int = MAX_BLOCK,
+                             page_size: int = EXPLORER_PAGE_SIZE, sort: str = "desc") -> AsyncIterator[Dict[str, Any]]:
+    """Async iter_explorer_txs() over the shared aiohttp session."""
+    cfg = explorer_config(chain_name)
+    walk = _Walk(address, startblock, endblock, page_size, sort)
+    while not walk.done:
+        for row in walk.rows(await _aget_page(chain_name, cfg, walk.params(cfg["api_key"]))):
+            yield row
+
+
+async def _aget_page(chain_name: str, cfg: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Async _get_page()."""
+    limiter = explorer_limiter(cfg)
+    for _ in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            await limiter.aacquire()
+            with timed("explorer", chain_name, "txlist"):
+                async with shared_session().get(cfg["api_base"], params=params,
+                                                timeout=aiohttp.ClientTimeout(total=EXPLORER_TIMEOUT)) as r:
+                    r.raise_for_status()
+                    data = await r.json(content_type=None)
+        except aiohttp.ClientResponseError as e:
+            if e.status != 429:
+                raise ExplorerError(f"Explorer API request failed for {chain_name}: {e}") from e
+            await limiter.athrottled(retry_after(e.headers or {}))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, RateLimitExceeded) as e:
+            raise ExplorerError(f"Explorer API request failed for {chain_name}: {e}") from e
+        else:
+            if not _rate_limited(data):
+                return data
+            await limiter.athrottled()
+        if not limiter.enabled:
+            break
+    raise ExplorerError(f"Explorer API rate limit exceeded for {chain_name}")
+
+
+def fetch_last_txs_from_explorer(chain_name: str, address: str, limit: int = 10,
+                                 startblock: int = 0, endblock: int = MAX_BLOCK):
+    """
+    Fallback using Etherscan/Polygonscan/BscScan APIs to fetch recent txs for an address.
+    Walks explorer pages (see iter_explorer_txs) until `limit` rows are read.
+    Returns:
+      - list of tx dicts (newest first) on success
+      - [] if explorer returned no txs
+      - None if API key missing or request failed
+    """
+    rows = iter_explorer_txs(chain_name, address, startblock, endblock,
+                             page_size=min(limit, EXPLORER_PAGE_SIZE))
+    try:
+        return list(islice(rows, limit))
+    except ExplorerAPIError as exc:
+        logger.debug("%s", exc)
+        return []
+    except ExplorerError as exc:
+        logger.warning("%s", exc)
+        return None
+
+
+async def afetch_last_txs_from_explorer(chain_name: str, address: str, limit: int = 10,
+                                        startblock: int = 0, endblock: int = MAX_BLOCK):
+    """Async fetch_last_txs_from_explorer() (same return contract)."""
+    rows = []
+    try:
+        async for row in aiter_explorer_txs(chain_name, address, startblock, endblock,
+                                            page_size=min(limit, EXPLORER_PAGE_SIZE)):
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+    except ExplorerAPIError as exc:
+        logger.debug("%s", exc)
+        return []
+    except ExplorerError as exc:
+        logger.warning("%s", exc)
+        return None
+    return rows
+
+
+def explorer_tx_rows(chain_name: str, explorer_txs: list) -> List[TxRecord]:
+    """Convert explorer txlist rows into the TxRecords last10_from_tx.html renders."""
+    explorer_cfg = EXPLORER_APIS.get(chain_name)
+    collected = []
+    for et in explorer_txs:
+        try:
+            tx_info = to_record(et)
+        except (TypeError, ValueError) as e:
+            logger.debug("Skipping malformed explorer row %s: %s", et.get("hash"), e)
+            continue
+        tx_info.source = "Explorer (raw)"
+        # Add explorer URLs for template
+        tx_info.explorer_url = explorer_cfg["explorer_tx"].format(tx_info.hash)
+        tx_info.to_explorer_url = explorer_cfg["explorer_addr"].format(tx_info.to) if tx_info.to else None
+        collected.append(tx_info)
+    return collected
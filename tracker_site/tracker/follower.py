@@ -0,0 +1,324 @@
+# tracker/follower.py
+"""
+Chain-tip follower with an in-memory ring of recent blocks.
+
+Most last10 lookups are for active wallets whose base tx sits in the last few
+hundred blocks, and every such request used to download those blocks again.
+A ChainFollower polls the chain head (eth_blockNumber every
+FOLLOW_POLL_INTERVAL seconds, new blocks as JSON-RPC batches) and keeps the
+newest FOLLOW_BLOCKS blocks in a BlockRing: each block as its TxRecords, plus
+an address -> TxRecords index over the whole ring. collect_wallet_txs() reads
+the part of a scan the ring covers from memory before it looks at the
+database index or the node, and the followed head is published to
+rpc.note_tip() so client.tip() stops asking the node for it.
+
+The ring stays contiguous: a new block whose parentHash does not match the
+ring's newest block is a reorg, and ring blocks are dropped until the chain
+links up again (at most FOLLOW_MAX_REWINDS per poll; a deeper reorg goes on
+at the next poll). Blocks are always fetched from the node, not the RPC
+cache, whose copy of a replaced block can outlive the reorg; the fresh
+answers overwrite it. It is bounded by block count and by FOLLOW_MAX_BYTES
+(estimated record size), whichever is hit first.
+
+Followers are per worker process and start on a chain's first last10 scan;
+one that has not been read for FOLLOW_IDLE seconds stops polling (its ring is
+kept, and refilled from the head when it restarts). FOLLOW_BLOCKS=0 disables
+them. The node has no push channel here (no websocket transport), so heads
+are polled.
+"""
+import os
+import copy
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from .metrics import FOLLOWER_REORGS, RING_SCAN_BLOCKS
+from .records import TxRecord, to_record
+from .rpc import ChainClient, note_tip
+from .scan import SCAN_BATCH_SIZE, ScanResult, decode_raw_block
+
+logger = logging.getLogger(__name__)
+
+# Recent blocks kept per chain (0 disables the followers).
+FOLLOW_BLOCKS = int(os.getenv("FOLLOW_BLOCKS", "128"))
+# Upper bound on a ring's estimated size; the oldest blocks go first.
+FOLLOW_MAX_BYTES = int(os.getenv("FOLLOW_MAX_BYTES", str(32 * 1024 * 1024)))
+# Seconds between head polls.
+FOLLOW_POLL_INTERVAL = float(os.getenv("FOLLOW_POLL_INTERVAL", "2"))
+# A follower nobody read for this many seconds stops polling until needed again.
+FOLLOW_IDLE = float(os.getenv("FOLLOW_IDLE", "600"))
+# Ring blocks a single poll may drop for reorgs before it waits for the next poll.
+FOLLOW_MAX_REWINDS = int(os.getenv("FOLLOW_MAX_REWINDS", "16"))
+
+_RECORD_BYTES = 400  # rough footprint of one TxRecord besides its input
+
+
+class _Block(NamedTuple):
+    number: int
+    hash: Optional[str]
+    parent_hash: Optional[str]
+    txs: List[TxRecord]
+    size: int
+
+
+def _hex(value: Any) -> Optional[str]:
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return value.lower() if isinstance(value, str) else value
+
+
+class BlockRing:
+    """The newest blocks of one chain as TxRecords, contiguous, with an address index (thread-safe)."""
+
+    def __init__(self, max_blocks: int = FOLLOW_BLOCKS, max_bytes: int = FOLLOW_MAX_BYTES):
+        self.max_blocks = max(1, max_blocks)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._blocks: Deque[_Block] = deque()
+        # address -> its txs in ring order (oldest block first)
+        self._by_address: Dict[str, Deque[TxRecord]] = {}
+        self.size = 0
+
+    @property
+    def lowest(self) -> Optional[int]:
+        with self._lock:
+            return self._blocks[0].number if self._blocks else None
+
+    @property
+    def highest(self) -> Optional[int]:
+        with self._lock:
+            return self._blocks[-1].number if self._blocks else None
+
+    def __len__(self):
+        return len(self._blocks)
+
+    # -------------------- updates --------------------
+    def push(self, block: Any) -> bool:
+        """
+        Append the block after the ring's newest one (block: decoded full block).
+        False if it does not link up (wrong number or parentHash): the caller rewinds.
+        """
+        number = int(block["number"])
+        txs = []
+        for t in block.get("transactions") or []:
+            if t.get("from"):
+                txs.append(to_record(t, number, block.get("timestamp")))
+        entry = _Block(number, _hex(block.get("hash")), _hex(block.get("parentHash")), txs,
+                       sum(_RECORD_BYTES + len(t.input) for t in txs) + _RECORD_BYTES)
+        with self._lock:
+            if self._blocks:
+                newest = self._blocks[-1]
+                if number != newest.number + 1 or (entry.parent_hash and newest.hash
+                                                   and entry.parent_hash != newest.hash):
+                    return False
+            self._blocks.append(entry)
+            self.size += entry.size
+            for tx in txs:
+                for address in _participants(tx):
+                    self._by_address.setdefault(address, deque()).append(tx)
+            while len(self._blocks) > self.max_blocks or (self.size > self.max_bytes and len(self._blocks) > 1):
+                self._evict_oldest()
+        return True
+
+    def rewind(self) -> Optional[int]:
+        """Drop the newest block (reorged away); returns its number."""
+        with self._lock:
+            if not self._blocks:
+                return None
+            entry = self._blocks.pop()
+            self.size -= entry.size
+            for tx in reversed(entry.txs):
+                for address in _participants(tx):
+                    txs = self._by_address.get(address)
+                    if txs and txs[-1] is tx:
+                        txs.pop()
+                    if not txs:
+                        self._by_address.pop(address, None)
+            return entry.number
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._by_address.clear()
+            self.size = 0
+
+    def _evict_oldest(self):
+        entry = self._blocks.popleft()
+        self.size -= entry.size
+        for tx in entry.txs:
+            for address in _participants(tx):
+                txs = self._by_address.get(address)
+                if txs and txs[0] is tx:
+                    txs.popleft()
+                if not txs:
+                    self._by_address.pop(address, None)
+
+    # -------------------- reads --------------------
+    def scan(self, wallet: str, start_block: int, floor: int, limit: int) -> Optional[ScanResult]:
+        """
+        scan_wallet_txs() answered from memory: txs of wallet from start_block
+        down to max(floor, lowest ring block), newest first, stopping like the
+        node scan once `limit` is reached (the last block's txs all kept).
+        None if start_block is not in the ring.
+        """
+        with self._lock:
+            if not self._blocks or not (self._blocks[0].number <= start_block <= self._blocks[-1].number):
+                return None
+            bottom = max(floor, self._blocks[0].number)
+            txs = self._by_address.get(wallet.lower(), ())
+            # copies: views annotate the records they are handed (source, explorer links)
+            matches = [copy.copy(tx) for tx in reversed(txs) if bottom <= tx.block <= start_block]
+        lowest = bottom
+        if len(matches) >= limit:
+            lowest = matches[limit - 1].block
+            matches = [tx for tx in matches if tx.block >= lowest]
+        return ScanResult(matches, lowest, [])
+
+
+def _participants(tx: TxRecord):
+    sender, receiver = (tx.from_ or "").lower(), (tx.to or "").lower()
+    if sender:
+        yield sender
+    if receiver and receiver != sender:
+        yield receiver
+
+
+class ChainFollower:
+    """Polls one chain's head in a daemon thread and feeds its BlockRing."""
+
+    def __init__(self, client: ChainClient, blocks: int = FOLLOW_BLOCKS, interval: float = FOLLOW_POLL_INTERVAL,
+                 idle: float = FOLLOW_IDLE, batch_size: int = SCAN_BATCH_SIZE):
+        self.client = client
+        self.chain_name = client.chain_name
+        self.ring = BlockRing(blocks)
+        self.interval = interval
+        self.idle = idle
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.used_at = time.monotonic()
+        self.tip: Optional[int] = None
+        self.polled_at: Optional[float] = None
+        self.polls = 0
+        self.errors = 0
+        self.reorgs = 0
+        self.last_error: Optional[str] = None
+
+    def touch(self):
+        """Mark the ring as used, (re)starting the poll thread if it is not running."""
+        self.used_at = time.monotonic()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"follow-{self.chain_name}", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        logger.info("Following %s (%d blocks, every %.1fs)", self.chain_name, self.ring.max_blocks, self.interval)
+        while time.monotonic() - self.used_at < self.idle:
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"[:300]
+                logger.debug("Follower poll failed for %s: %s", self.chain_name, e)
+            time.sleep(self.interval)
+        logger.info("Stopped following %s (idle)", self.chain_name)
+
+    def poll(self):
+        """Read the head and append the blocks the ring is missing."""
+        tip = int(self.client.request("eth_blockNumber", []), 16)
+        note_tip(self.chain_name, tip)
+        self.tip, self.polled_at = tip, time.time()
+        self.polls += 1
+        rewinds = 0
+        while True:
+            highest = self.ring.highest
+            if highest is None or tip - highest >= self.ring.max_blocks:
+                self.ring.clear()
+                nxt = max(0, tip - self.ring.max_blocks + 1)
+            else:
+                nxt = highest + 1
+            if nxt > tip or not self._extend(nxt, tip):
+                return
+            rewinds += 1
+            if rewinds >= FOLLOW_MAX_REWINDS:
+                logger.info("Reorg on %s deeper than %d blocks; continuing next poll", self.chain_name, rewinds)
+                return
+
+    def _extend(self, lo: int, hi: int) -> bool:
+        """Fetch and push blocks lo..hi oldest first; True after a reorg rewind (poll again)."""
+        for start in range(lo, hi + 1, self.batch_size):
+            numbers = list(range(start, min(hi, start + self.batch_size - 1) + 1))
+            calls = [("eth_getBlockByNumber", [hex(n), True]) for n in numbers]
+            responses = self.client.send_batch(calls, fresh=True)
+            for number, response in zip(numbers, responses):
+                raw = response.get("result")
+                if not raw:
+                    # the head is not visible on every endpoint yet; next poll
+                    logger.debug("Follower could not fetch %s block %s: %s", self.chain_name, number,
+                                 response.get("error"))
+                    return False
+                if not self.ring.push(decode_raw_block(raw)):
+                    dropped = self.ring.rewind()
+                    self.reorgs += 1
+                    FOLLOWER_REORGS.inc(chain=self.chain_name)
+                    logger.info("Reorg on %s at block %s; dropped ring block %s", self.chain_name, number, dropped)
+                    return True
+        return False
+
+    def scan(self, wallet: str, start_block: int, floor: int, limit: int) -> Optional[ScanResult]:
+        """BlockRing.scan(), counted in tracker_ring_scan_blocks."""
+        self.touch()
+        result = self.ring.scan(wallet, start_block, floor, limit)
+        if result is not None:
+            RING_SCAN_BLOCKS.inc(start_block - result.lowest_block + 1, chain=self.chain_name)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "tip": self.tip,
+            "polled_at": self.polled_at,
+            "ring": [self.ring.lowest, self.ring.highest],
+            "ring_blocks": len(self.ring),
+            "ring_bytes": self.ring.size,
+            "polls": self.polls,
+            "errors": self.errors,
+            "reorgs": self.reorgs,
+            "last_error": self.last_error,
+        }
+
+
+_followers: Dict[str, ChainFollower] = {}
+_followers_lock = threading.Lock()
+
+
+def chain_follower(client) -> Optional[ChainFollower]:
+    """
+    The process-wide follower of client's chain, started on first use; None
+    if following is disabled. An async client gets a follower with its own
+    sync ChainClient on the same endpoints (their limiters and health are shared).
+    """
+    if FOLLOW_BLOCKS <= 0:
+        return None
+    found = _followers.get(client.chain_name)
+    if found is None:
+        with _followers_lock:
+            found = _followers.get(client.chain_name)
+            if found is None:
+                if not isinstance(client, ChainClient):
+                    client = ChainClient(client.chain_name, [e.url for e in client.endpoints],
+                                         cache=client.cache, pool_maxsize=2)
+                found = _followers[client.chain_name] = ChainFollower(client)
+    found.touch()
+    return found
+
+
+def follower_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-chain follower state for this worker."""
+    with _followers_lock:
+        followers = dict(_followers)
+    return {name: f.stats() for name, f in followers.items()}
@@ -0,0 +1,262 @@
+# tracker/health.py
+"""
+Per-endpoint health tracking with a circuit breaker.
+
+A hanging node (the BSC dataseed, an Infura outage) used to cost every
+cross-chain lookup a full RPC_TIMEOUT in is_connected() or get_transaction.
+EndpointHealth counts the outcome of every HTTP call to an RPC endpoint:
+after BREAKER_FAILURE_THRESHOLD consecutive failures the breaker opens and
+calls fail at once with CircuitOpenError (registries report the chain as not
+connected, so first_hit() skips it). While open, a background probe
+(eth_blockNumber with a short timeout) runs after a cool-down; it closes the
+breaker on success and re-opens it with a doubled cool-down otherwise. Real
+requests never act as the probe.
+
+The EWMA latency and the recent latency percentiles also drive endpoint
+selection and hedging when a chain has several endpoints (rpc.rank()).
+Percentiles are kept per latency class (method, plus batch size rounded up to
+a power of two), since a 100-block batch and a single call share no useful
+threshold.
+Breakers are per worker process; endpoint_health() shares one between the
+sync and async clients of an endpoint. health_page() shows them all.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+import requests
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .instrumentation import batch_name
+from .metrics import RPC_BREAKER_REJECTED, RPC_BREAKER_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed calls that open the breaker.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds before the first probe of an open breaker; doubled per failed probe up to the max.
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "5"))
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "60"))
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "3"))
+# Weight of the newest call in the latency / error-rate averages.
+HEALTH_EWMA_ALPHA = float(os.getenv("HEALTH_EWMA_ALPHA", "0.2"))
+# Recent successful call latencies kept per latency class for percentiles (hedging threshold).
+HEALTH_LATENCY_SAMPLES = int(os.getenv("HEALTH_LATENCY_SAMPLES", "200"))
+# Latency classes tracked per endpoint; the least recently used one makes room for a new one.
+HEALTH_LATENCY_CLASSES = int(os.getenv("HEALTH_LATENCY_CLASSES", "32"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_probe_session = requests.Session()
+
+
+def latency_class(methods: Sequence[str]) -> str:
+    """Latency class of a call: its method (batch_name), plus " xN" for a batch of up to N calls (N a power of 2)."""
+    name = batch_name(list(methods))
+    if len(methods) <= 1:
+        return name
+    return f"{name} x{1 << (len(methods) - 1).bit_length()}"
+
+
+class CircuitOpenError(Exception):
+    """The endpoint's breaker is open; the call was not sent."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name}: circuit open, endpoint skipped")
+        self.name = name
+
+
+class EndpointHealth:
+    """Call outcomes and breaker state of one RPC endpoint (thread-safe)."""
+
+    def __init__(self, name: str, url: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN, max_cooldown: float = BREAKER_MAX_COOLDOWN):
+        self.name = name
+        self.url = url
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.changed_at = time.time()
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.probes = 0
+        self.latency_ms: Optional[float] = None
+        # latency class -> recent latencies, least recently used class first
+        self._samples: Dict[str, Deque[float]] = {}
+        self.error_rate = 0.0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+
+    # -------------------- call outcomes --------------------
+    def allow(self) -> bool:
+        """True if a call may be sent now; counts the rejection otherwise."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            self.rejected += 1
+        RPC_BREAKER_REJECTED.inc(chain=self.name)
+        return False
+
+    def check(self):
+        """Raise CircuitOpenError unless allow()."""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+
+    def success(self, ms: float, kind: str):
+        """A call of latency class `kind` (latency_class()) answered after ms."""
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._sample(kind, ms)
+            self._average(ms, 0.0)
+
+    def abandoned(self, ms: float, kind: str):
+        """A call given up after ms (it lost a hedge race): its latency so far counts, its outcome does not."""
+        with self._lock:
+            self._sample(kind, ms)
+            a = HEALTH_EWMA_ALPHA
+            self.latency_ms = ms if self.latency_ms is None else (1 - a) * self.latency_ms + a * ms
+
+    def failure(self, error: BaseException, ms: Optional[float] = None):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:300]
+            self.last_failure_at = time.time()
+            self._average(ms, 1.0)
+            opens = self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            if opens:
+                self.cooldown = self.base_cooldown
+                self._set_state(OPEN)
+        if opens:
+            logger.warning("Circuit opened for %s after %d failures (last: %s); probing in %.0fs",
+                           self.name, self.consecutive_failures, self.last_error, self.cooldown)
+            self._schedule_probe()
+
+    def _average(self, ms: Optional[float], failed: float):
+        a = HEALTH_EWMA_ALPHA
+        if ms is not None:
+            self.latency_ms = ms if self.latency_ms is None else (1 - a) * self.latency_ms + a * ms
+        self.error_rate = (1 - a) * self.error_rate + a * failed
+
+    def _sample(self, kind: str, ms: float):
+        samples = self._samples.pop(kind, None)
+        if samples is None:
+            samples = deque(maxlen=HEALTH_LATENCY_SAMPLES)
+            while len(self._samples) >= max(1, HEALTH_LATENCY_CLASSES):
+                self._samples.pop(next(iter(self._samples)))
+        samples.append(ms)
+        self._samples[kind] = samples
+
+    def latency_percentile(self, pct: float, kind: str, min_samples: int = 20) -> Optional[float]:
+        """pct-th percentile (nearest rank) of recent latencies of one latency class in ms, None if too few."""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[max(0, min(len(samples) - 1, int(len(samples) * pct / 100.0 + 0.5) - 1))]
+
+    def _set_state(self, state: str):
+        self.state = state
+        self.changed_at = time.time()
+        RPC_BREAKER_TRANSITIONS.inc(chain=self.name, state=state)
+
+    # -------------------- probing --------------------
+    def _schedule_probe(self):
+        timer = threading.Timer(self.cooldown, self.probe)
+        timer.daemon = True
+        timer.start()
+
+    def probe(self):
+        """Half-open check: one eth_blockNumber outside any request; closes or re-opens the breaker."""
+        with self._lock:
+            if self.state != OPEN:
+                return
+            self._set_state(HALF_OPEN)
+            self.probes += 1
+        started = time.perf_counter()
+        try:
+            r = _probe_session.post(self.url, timeout=BREAKER_PROBE_TIMEOUT,
+                                    json={"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []})
+            r.raise_for_status()
+            if "result" not in r.json():
+                raise ValueError("no result in probe response")
+        except Exception as e:
+            with self._lock:
+                self.last_error = f"probe {type(e).__name__}: {e}"[:300]
+                self.last_failure_at = time.time()
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._set_state(OPEN)
+            logger.info("Probe failed for %s (%s); next in %.0fs", self.name, e, self.cooldown)
+            self._schedule_probe()
+            return
+        with self._lock:
+            self.consecutive_failures = 0
+            self._average((time.perf_counter() - started) * 1000.0, 0.0)
+            self._set_state(CLOSED)
+        logger.warning("Circuit closed for %s (probe answered)", self.name)
+
+    # -------------------- status --------------------
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = sorted(self._samples)
+        p95 = {kind: round(ms, 1) for kind in kinds if (ms := self.latency_percentile(95, kind)) is not None}
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "since": self.changed_at,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "probes": self.probes,
+                "cooldown_s": self.cooldown if self.state != CLOSED else None,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                "p95_ms": p95,  # per latency class
+                "error_rate": round(self.error_rate, 3),
+                "last_error": self.last_error,
+                "last_failure_at": self.last_failure_at,
+            }
+
+
+_endpoints: Dict[str, EndpointHealth] = {}
+_endpoints_lock = threading.Lock()
+
+
+def endpoint_health(name: str, url: str) -> EndpointHealth:
+    """The process-wide EndpointHealth of an endpoint URL."""
+    found = _endpoints.get(url)
+    if found is None:
+        with _endpoints_lock:
+            found = _endpoints.get(url)
+            if found is None:
+                found = _endpoints[url] = EndpointHealth(name, url)
+    return found
+
+
+def health_status() -> List[Dict[str, Any]]:
+    """Status of every endpoint this worker has called, worst first."""
+    order = {OPEN: 0, HALF_OPEN: 1, CLOSED: 2}
+    with _endpoints_lock:
+        endpoints = list(_endpoints.values())
+    return sorted((h.status() for h in endpoints), key=lambda s: (order[s["state"]], s["name"]))
+
+
+def health_page(request):
+    """GET internal/rpc-health/: breaker state per endpoint for this worker (?format=json for JSON)."""
+    endpoints = health_status()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"pid": os.getpid(), "endpoints": endpoints})
+    for status in endpoints:
+        status["since_s"] = round(time.time() - status["since"])
+    return render(request, "rpc_health.html", {"pid": os.getpid(), "endpoints": endpoints})
@@ -0,0 +1,233 @@
+# tracker/history.py
+"""
+Wallet history for last10_from_tx from the node scan and/or the explorer.
+
+The view used to ask the explorer only after a full node scan came back
+empty, so a wallet without recent activity always paid the slowest path
+first. In "race" mode wallet_history() starts the explorer txlist call and
+the index/node scan together and returns the first complete answer; if the
+first answer is incomplete (explorer down, scan budget exhausted short of
+`limit`) it waits for the other source and merges both, deduped by hash.
+Which source won is counted per chain (history_stats()) so the mode can be
+tuned per chain through LAST10_HISTORY_MODES.
+
+Modes: "race", "node" (scan, explorer as fallback: the old behaviour) and
+"explorer" (explorer, scan as fallback).
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from django.db import connection
+
+from .explorer import afetch_last_txs_from_explorer, explorer_tx_rows, fetch_last_txs_from_explorer
+from .instrumentation import submit
+from .lookup import Cancelled
+from .records import TxRecord
+from .rpc import ChainClient
+from .scan import Progress
+from .txindex import acollect_wallet_txs, collect_wallet_txs
+
+logger = logging.getLogger(__name__)
+
+HISTORY_MODES = ("race", "node", "explorer")
+DEFAULT_HISTORY_MODE = os.getenv("LAST10_HISTORY_MODE", "race")
+# Per-chain overrides, e.g. "Binance Smart Chain=node;Polygon Mainnet=explorer"
+CHAIN_HISTORY_MODES: Dict[str, str] = dict(
+    item.split("=", 1) for item in os.getenv("LAST10_HISTORY_MODES", "").split(";") if "=" in item)
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+_background: Set[asyncio.Future] = set()
+
+
+class History(NamedTuple):
+    txs: List[TxRecord]             # newest first, at most `limit`
+    source: str                     # "node", "explorer", "merged" or "none"
+    explorer_ok: Optional[bool]     # None: not asked, False: unavailable/failed, True: answered
+
+
+def history_mode(chain_name: str) -> str:
+    mode = CHAIN_HISTORY_MODES.get(chain_name, DEFAULT_HISTORY_MODE)
+    if mode not in HISTORY_MODES:
+        logger.warning("Unknown history mode %r for %s, using race", mode, chain_name)
+        return "race"
+    return mode
+
+
+def _record(chain_name: str, source: str, **timings_ms: float):
+    with _stats_lock:
+        stats = _stats.setdefault(chain_name, {})
+        stats[f"wins_{source}"] = stats.get(f"wins_{source}", 0) + 1
+        for name, ms in timings_ms.items():
+            if ms is not None:
+                stats[f"{name}_ms_total"] = stats.get(f"{name}_ms_total", 0.0) + ms
+                stats[f"{name}_count"] = stats.get(f"{name}_count", 0) + 1
+    logger.info("last10 history for %s answered by %s (%s)", chain_name, source, timings_ms)
+
+
+def history_stats() -> Dict[str, Dict[str, float]]:
+    """Per-chain win counts and source latencies recorded by this worker."""
+    with _stats_lock:
+        return {chain: dict(stats) for chain, stats in _stats.items()}
+
+
+def _merge(limit: int, *sources: Optional[List[TxRecord]]) -> List[TxRecord]:
+    by_hash: Dict[str, TxRecord] = {}
+    for txs in sources:
+        for tx in txs or []:
+            by_hash.setdefault((tx.hash or "").lower(), tx)
+    return sorted(by_hash.values(), key=lambda t: t.block or 0, reverse=True)[:limit]
+
+
+def _settle(chain_name: str, results: Dict[str, Optional[List[TxRecord]]], timings: Dict[str, float],
+            limit: int, final: bool) -> Optional[History]:
+    """
+    Decide the race from the sources answered so far, or return None to keep
+    waiting. A node answer is complete once it holds `limit` txs, an explorer
+    answer once it holds any (explorer pages are newest first); otherwise both
+    sources are awaited and merged.
+    """
+    node, explorer = results.get("node"), results.get("explorer")
+    if node is not None and len(node) >= limit and "explorer" not in results:
+        txs, source = node[:limit], "node"
+    elif explorer and "node" not in results:
+        txs, source = explorer[:limit], "explorer"
+    elif not final:
+        return None
+    else:
+        txs = _merge(limit, node, explorer)
+        source = "merged" if node and explorer else "node" if node else "explorer" if explorer else "none"
+    _record(chain_name, source, **timings)
+    return History(txs, source, None if "explorer" not in results else explorer is not None)
+
+
+def _explorer(chain_name: str, wallet: str, start_block: int, limit: int) -> Optional[List[TxRecord]]:
+    rows = fetch_last_txs_from_explorer(chain_name, wallet, limit=limit, endblock=start_block)
+    return None if rows is None else explorer_tx_rows(chain_name, rows)
+
+
+def _node(client: ChainClient, wallet: str, start_block: int, max_blocks: int, limit: int,
+          progress: Optional[Progress], cancelled: Optional[threading.Event] = None) -> List[TxRecord]:
+    try:
+        return collect_wallet_txs(client, wallet, start_block, max_blocks, limit=limit, progress=progress,
+                                  cancelled=cancelled)
+    finally:
+        # runs on a helper thread: do not leak its database connection
+        connection.close()
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Cancelled:
+        logger.debug("last10 history source %s cancelled", fn.__name__)
+        result = None
+    except Exception as e:
+        logger.warning("last10 history source %s failed: %s", fn.__name__, e)
+        result = None
+    return result, (time.perf_counter() - started) * 1000
+
+
+def wallet_history(client: ChainClient, wallet: str, start_block: int, max_blocks: int,
+                   limit: int = 10, mode: Optional[str] = None, progress: Optional[Progress] = None,
+                   cancelled: Optional[threading.Event] = None) -> History:
+    """
+    Up to `limit` txs of wallet at or below start_block, newest first, from
+    the index/node scan (budget max_blocks) and/or the chain's explorer.
+    progress is handed to the node scan (see scan.scan_wallet_txs); it may
+    raise lookup.Cancelled to stop the scan. Once `cancelled` is set (the
+    caller went away) the fallback source is not asked.
+    """
+    chain = client.chain_name
+    mode = mode or history_mode(chain)
+    sources = {
+        "node": lambda: _timed(collect_wallet_txs, client, wallet, start_block, max_blocks, limit, None, progress,
+                               cancelled),
+        "explorer": lambda: _timed(_explorer, chain, wallet, start_block, limit),
+    }
+    results: Dict[str, Optional[List[TxRecord]]] = {}
+    timings: Dict[str, float] = {}
+
+    if mode != "race":
+        for source in (("node", "explorer") if mode == "node" else ("explorer", "node")):
+            results[source], timings[source] = sources[source]()
+            if results[source] or (cancelled is not None and cancelled.is_set()):
+                break
+        return _settle(chain, results, timings, limit, final=True)
+
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-race")
+    settled = threading.Event()
+    try:
+        futures = {
+            submit(executor, _timed, _node, client, wallet, start_block, max_blocks, limit, progress, settled): "node",
+            submit(executor, sources["explorer"]): "explorer",
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]], timings[futures[future]] = future.result()
+            history = _settle(chain, results, timings, limit, final=not pending)
+            if history is not None:
+                return history
+    finally:
+        # a losing node scan stops at its next block and still indexes what it
+        # covered; a losing explorer call finishes in the background. The
+        # request waits for neither.
+        settled.set()
+        executor.shutdown(wait=False)
+
+
+async def _atimed(coro):
+    started = time.perf_counter()
+    try:
+        result = await coro
+    except Exception as e:
+        logger.warning("last10 history source failed: %s", e)
+        result = None
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def _aexplorer(chain_name: str, wallet: str, start_block: int, limit: int) -> Optional[List[TxRecord]]:
+    rows = await afetch_last_txs_from_explorer(chain_name, wallet, limit=limit, endblock=start_block)
+    return None if rows is None else explorer_tx_rows(chain_name, rows)
+
+
+async def awallet_history(client, wallet: str, start_block: int, max_blocks: int,
+                          limit: int = 10, mode: Optional[str] = None) -> History:
+    """Async wallet_history() for an AsyncChainClient."""
+    chain = client.chain_name
+    mode = mode or history_mode(chain)
+    sources = {
+        "node": lambda: _atimed(acollect_wallet_txs(client, wallet, start_block, max_blocks, limit=limit)),
+        "explorer": lambda: _atimed(_aexplorer(chain, wallet, start_block, limit)),
+    }
+    results: Dict[str, Optional[List[TxRecord]]] = {}
+    timings: Dict[str, float] = {}
+
+    if mode != "race":
+        for source in (("node", "explorer") if mode == "node" else ("explorer", "node")):
+            results[source], timings[source] = await sources[source]()
+            if results[source]:
+                break
+        return _settle(chain, results, timings, limit, final=True)
+
+    tasks = {asyncio.ensure_future(fetch()): source for source, fetch in sources.items()}
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            results[tasks[task]], timings[tasks[task]] = task.result()
+        history = _settle(chain, results, timings, limit, final=not pending)
+        if history is not None:
+            # the loser finishes in the background; keep it referenced until then
+            for task in pending:
+                _background.add(task)
+                task.add_done_callback(_background.discard)
+            return history
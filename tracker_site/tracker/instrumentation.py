@@ -0,0 +1,228 @@
+# tracker/instrumentation.py
+"""
+Per-request accounting of outbound calls (node RPC, explorer, Arkham).
+
+ServerTimingMiddleware gives every request a RequestTimings in a context
+variable; the RPC clients, the explorer walker and the Arkham lookups call
+record() for each HTTP call they make (cache hits are not calls). Totals are
+grouped by (kind, target, name), e.g. ("rpc", "Ethereum Mainnet",
+"eth_getBlockByNumber"), and leave the request as a Server-Timing header
+plus one structured "request timings" log line (INFO; silent unless
+REQUEST_TIMINGS_LOG_LEVEL enables it).
+
+Work handed to thread pools must carry the request's context: use submit()
+(or contextvars.copy_context().run) instead of executor.submit(). asyncio
+tasks inherit it on their own.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import observe_call
+
+logger = logging.getLogger(__name__)
+
+# Add the Server-Timing header (the log line is always written).
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") != "0"
+# Per-(kind, target, name) entries in the header; the rest only show in the kind totals.
+SERVER_TIMING_MAX_ENTRIES = int(os.getenv("SERVER_TIMING_MAX_ENTRIES", "12"))
+
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class RequestTimings:
+    """Outbound call counts and durations of one request (thread-safe)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        # (kind, target, name) -> [calls, http requests, errors, total ms]
+        self._entries: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def add(self, kind: str, target: str, name: str, ms: float, calls: int = 1, error: bool = False):
+        with self._lock:
+            entry = self._entries.setdefault((kind, target, name), [0, 0, 0, 0.0])
+            entry[0] += calls
+            entry[1] += 1
+            entry[2] += error
+            entry[3] += ms
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Entries sorted by total time, slowest first."""
+        with self._lock:
+            items = list(self._entries.items())
+        return [
+            {"kind": kind, "target": target, "name": name, "calls": int(calls), "requests": int(requests),
+             "errors": int(errors), "ms": round(ms, 2)}
+            for (kind, target, name), (calls, requests, errors, ms) in sorted(items, key=lambda i: -i[1][3])
+        ]
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Per-kind sums (durations of concurrent calls add up, so they can exceed wall time)."""
+        totals: Dict[str, Dict[str, float]] = {}
+        for entry in self.entries():
+            kind = totals.setdefault(entry["kind"], {"calls": 0, "requests": 0, "errors": 0, "ms": 0.0})
+            for field in ("calls", "requests", "errors", "ms"):
+                kind[field] += entry[field]
+        for kind in totals.values():
+            kind["ms"] = round(kind["ms"], 2)
+        return totals
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("tracker_request_timings", default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record(kind: str, target: str, name: str, ms: float, calls: int = 1, error: bool = False):
+    """Account one outbound HTTP call carrying `calls` logical calls to the metrics and the current request."""
+    observe_call(kind, target, name, ms, calls, error)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(kind, target, name, ms, calls, error)
+
+
+@contextmanager
+def timed(kind: str, target: str, name: str, calls: int = 1) -> Iterator[None]:
+    """record() the duration of the block; an exception counts as an error."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(kind, target, name, (time.perf_counter() - started) * 1000.0, calls, error)
+
+
+def batch_name(methods: List[str]) -> str:
+    """Entry name of a JSON-RPC batch: its method if uniform, else "batch"."""
+    unique = set(methods)
+    return unique.pop() if len(unique) == 1 else "batch"
+
+
+def submit(executor, fn: Callable, *args, **kwargs):
+    """executor.submit() that runs fn in a copy of the caller's context (keeps request accounting)."""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+# -------------------- response --------------------
+def _token(*parts: str) -> str:
+    return _TOKEN_UNSAFE.sub("_", "-".join(p for p in parts if p))
+
+
+def server_timing(timings: RequestTimings) -> str:
+    """Server-Timing header value: app total, per-kind totals, then the slowest entries."""
+    metrics = [f"app;dur={timings.elapsed_ms():.1f}"]
+    for kind, total in timings.totals().items():
+        metrics.append(f'{_token(kind)};dur={total["ms"]:.1f};desc="{int(total["calls"])} calls"')
+    for entry in timings.entries()[:SERVER_TIMING_MAX_ENTRIES]:
+        desc = f'{entry["target"]} {entry["name"]} x{entry["calls"]}'.replace('"', "'")
+        metrics.append(f'{_token(entry["kind"], entry["target"], entry["name"])};dur={entry["ms"]:.1f};desc="{desc}"')
+    return ", ".join(metrics)
+
+
+def log_timings(request, status: Optional[int], timings: RequestTimings):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info("request timings %s", json.dumps({
+        "method": request.method,
+        "path": request.path,
+        "status": status,
+        "total_ms": round(timings.elapsed_ms(), 2),
+        "totals": timings.totals(),
+        "calls": timings.entries(),
+    }))
+
+
+class ServerTimingMiddleware:
+    """
+    Accounts a request's outbound calls (see module docstring). Streaming
+    responses get the header for the work done before streaming starts; the
+    log line is written once the stream is exhausted and covers all of it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings: RequestTimings):
+        if SERVER_TIMING:
+            response["Server-Timing"] = server_timing(timings)
+        if getattr(response, "streaming", False):
+            stream = self._astream if response.is_async else self._stream
+            response.streaming_content = stream(request, response, response.streaming_content, timings)
+        else:
+            log_timings(request, response.status_code, timings)
+        return response
+
+    @staticmethod
+    def _stream(request, response, content, timings: RequestTimings):
+        # the view's generator runs after __call__ returned: account each step to this request
+        content = iter(content)
+        try:
+            while True:
+                token = _current.set(timings)
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            log_timings(request, response.status_code, timings)
+
+    @staticmethod
+    async def _astream(request, response, content, timings: RequestTimings):
+        content = aiter(content)
+        try:
+            while True:
+                token = _current.set(timings)
+                try:
+                    chunk = await anext(content)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            log_timings(request, response.status_code, timings)
@@ -0,0 +1,163 @@
+# tracker/labels.py
+"""
+Arkham entity labels with caching.
+
+Labels (and "no label" answers) are cached in the default Django cache with
+separate positive and negative TTLs; failed lookups are cached briefly so a
+down API is not hit for every address. Concurrent lookups for the same
+address share one HTTP call, and resolve_labels() labels a whole result set
+concurrently so enrichment costs about one round trip.
+"""
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import aiohttp
+import requests
+from django.core.cache import cache
+from dotenv import load_dotenv
+
+from .async_rpc import shared_session
+from .instrumentation import submit, timed
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Same env file the views read their keys from
+load_dotenv("variables.env")
+
+# Arkham (optional)
+ARKHAM_KEY = os.getenv("ARKHAM_API_KEY")
+ARKHAM_BASE = "https://api.arkhamintelligence.com"
+ARKHAM_TIMEOUT = float(os.getenv("ARKHAM_TIMEOUT", "8"))
+
+# Seconds to keep a found label / a "no label" answer / a failed lookup.
+ARKHAM_LABEL_TTL = int(os.getenv("ARKHAM_LABEL_TTL", str(24 * 3600)))
+ARKHAM_NEGATIVE_TTL = int(os.getenv("ARKHAM_NEGATIVE_TTL", "3600"))
+ARKHAM_ERROR_TTL = int(os.getenv("ARKHAM_ERROR_TTL", "60"))
+ARKHAM_MAX_WORKERS = int(os.getenv("ARKHAM_MAX_WORKERS", "8"))
+
+_NO_LABEL = ""  # cached marker for "Arkham has no entity for this address"
+_session = requests.Session()
+_inflight = SingleFlight()
+
+
+def _cache_key(address: str) -> str:
+    return f"arkham:{address.lower()}"
+
+
+def _answer(data: Optional[Dict[str, Any]]) -> Tuple[str, int]:
+    """(cached value, TTL) of an Arkham response (None = failed): the entity label or _NO_LABEL."""
+    if data is None:
+        return _NO_LABEL, ARKHAM_ERROR_TTL
+    for _, intel in data.items():
+        if isinstance(intel, dict) and intel.get("arkhamEntity"):
+            label = intel["arkhamEntity"].get("id")
+            if label:
+                return label, ARKHAM_LABEL_TTL
+            break
+    return _NO_LABEL, ARKHAM_NEGATIVE_TTL
+
+
+def _remember(address: str, data: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Extract the entity label from an Arkham response (None = failed) and cache the answer."""
+    value, ttl = _answer(data)
+    cache.set(_cache_key(address), value, ttl)
+    return value or None
+
+
+def _fetch_label(address: str) -> Optional[str]:
+    """One Arkham lookup; caches the answer (or the failure) before returning."""
+    try:
+        url = f"{ARKHAM_BASE}/intelligence/address/{address}/all"
+        with timed("arkham", "arkham", "address"):
+            r = _session.get(url, headers={"API-Key": ARKHAM_KEY}, timeout=ARKHAM_TIMEOUT)
+            r.raise_for_status()
+            data = r.json()
+    except Exception as e:
+        logger.debug("Arkham lookup failed for %s: %s", address, e)
+        data = None
+    return _remember(address, data)
+
+
+def arkham_label_for(address: str) -> Optional[str]:
+    """Return Arkham entity label for an address if available."""
+    if not address or not ARKHAM_KEY:
+        return None
+    cached = cache.get(_cache_key(address))
+    if cached is not None:
+        return cached or None
+    return _inflight.do(address.lower(), lambda: _fetch_label(address))
+
+
+def resolve_labels(addresses: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Label every unique address concurrently. Returns {lower-cased address: label or None}
+    and leaves the answers cached, so later arkham_label_for() calls are cache hits.
+    """
+    unique = {a.lower(): a for a in addresses if a}
+    if not unique or not ARKHAM_KEY:
+        return {a: None for a in unique}
+    cached = cache.get_many([_cache_key(a) for a in unique])
+    labels: Dict[str, Optional[str]] = {}
+    missing = []
+    for lower, original in unique.items():
+        value = cached.get(_cache_key(lower))
+        if value is None:
+            missing.append(original)
+        else:
+            labels[lower] = value or None
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), ARKHAM_MAX_WORKERS),
+                                thread_name_prefix="arkham") as pool:
+            futures = [submit(pool, arkham_label_for, a) for a in missing]
+            for original, future in zip(missing, futures):
+                labels[original.lower()] = future.result()
+    return labels
+
+
+# -------------------- async (ASGI views) --------------------
+_ainflight: Dict[Tuple[int, str], "asyncio.Future"] = {}
+
+
+async def _afetch_label(address: str) -> Optional[str]:
+    try:
+        url = f"{ARKHAM_BASE}/intelligence/address/{address}/all"
+        with timed("arkham", "arkham", "address"):
+            async with shared_session().get(url, headers={"API-Key": ARKHAM_KEY},
+                                            timeout=aiohttp.ClientTimeout(total=ARKHAM_TIMEOUT)) as r:
+                r.raise_for_status()
+                data = await r.json(content_type=None)
+    except Exception as e:
+        logger.debug("Arkham lookup failed for %s: %s", address, e)
+        data = None
+    value, ttl = _answer(data)
+    await cache.aset(_cache_key(address), value, ttl)
+    return value or None
+
+
+async def aarkham_label_for(address: str) -> Optional[str]:
+    """Async arkham_label_for(); concurrent lookups on the same loop share one call. The cache is used
+    through Django's async cache API, off the event loop."""
+    if not address or not ARKHAM_KEY:
+        return None
+    cached = await cache.aget(_cache_key(address))
+    if cached is not None:
+        return cached or None
+    key = (id(asyncio.get_running_loop()), address.lower())
+    future = _ainflight.get(key)
+    if future is None:
+        future = _ainflight[key] = asyncio.ensure_future(_afetch_label(address))
+        future.add_done_callback(lambda _: _ainflight.pop(key, None))
+    return await asyncio.shield(future)
+
+
+async def aresolve_labels(addresses: Iterable[Optional[str]]) -> Dict[str, Optional[str]]:
+    """Async resolve_labels(): every unique address is looked up concurrently."""
+    unique = {a.lower(): a for a in addresses if a}
+    if not unique or not ARKHAM_KEY:
+        return {a: None for a in unique}
+    found = await asyncio.gather(*(aarkham_label_for(a) for a in unique.values()))
+    return dict(zip(unique.keys(), found))
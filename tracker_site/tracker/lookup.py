@@ -0,0 +1,128 @@
+# tracker/lookup.py
+"""
+Concurrent multi-chain lookups.
+
+When no chain is given the views used to try every chain in RPC_ENDPOINTS
+one after another, so a miss on one node cost a full timeout before the next
+chain was even asked. first_hit() asks all chains at once and returns the
+first chain that answers; worst-case latency becomes the slowest single chain.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+from .instrumentation import submit
+from .rpc import ChainClient, Web3ClientRegistry
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on chains queried at the same time by one request.
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "8"))
+
+
+class Hit(NamedTuple):
+    chain: str
+    client: ChainClient
+    result: Any
+
+
+class Cancelled(Exception):
+    """Raised inside a fetch function once another chain has already won."""
+
+
+def first_hit(registry: Web3ClientRegistry, chains: Iterable[Optional[str]],
+              fetch: Callable[[ChainClient, threading.Event], Any]) -> Optional[Hit]:
+    """
+    Run fetch(client, cancelled) for every reachable chain concurrently and
+    return the first non-None result as a Hit, or None if no chain has it.
+
+    Exceptions from fetch count as a miss. Once a chain wins, `cancelled` is
+    set and queued work is dropped; fetch functions doing several calls should
+    check the event between calls (or call check_cancelled) to stop early.
+    In-flight HTTP calls are abandoned rather than waited for.
+    """
+    chains = [c for c in dict.fromkeys(chains) if c]
+    if not chains:
+        return None
+    cancelled = threading.Event()
+
+    def task(chain_name: str) -> Optional[Hit]:
+        if cancelled.is_set():
+            return None
+        client = registry.connected(chain_name)
+        if client is None or cancelled.is_set():
+            return None
+        try:
+            result = fetch(client, cancelled)
+        except Cancelled:
+            return None
+        except Exception as e:
+            logger.debug("Lookup missed on %s: %s", chain_name, e)
+            return None
+        if result is None:
+            return None
+        return Hit(chain_name, client, result)
+
+    if len(chains) == 1:
+        return task(chains[0])
+
+    executor = ThreadPoolExecutor(max_workers=min(len(chains), FANOUT_MAX_WORKERS),
+                                  thread_name_prefix="chain-fanout")
+    try:
+        pending = {submit(executor, task, c) for c in chains}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                hit = future.result()
+                if hit is not None:
+                    cancelled.set()
+                    for other in pending:
+                        other.cancel()
+                    return hit
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def afirst_hit(registry, chains: Iterable[Optional[str]], fetch) -> Optional[Hit]:
+    """
+    Async first_hit() for an AsyncWeb3ClientRegistry: `await fetch(client)` runs
+    on every reachable chain; the first non-None result wins and the remaining
+    lookups are cancelled outright.
+    """
+    chains = [c for c in dict.fromkeys(chains) if c]
+
+    async def task(chain_name: str) -> Optional[Hit]:
+        client = await registry.connected(chain_name)
+        if client is None:
+            return None
+        try:
+            result = await fetch(client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug("Lookup missed on %s: %s", chain_name, e)
+            return None
+        return Hit(chain_name, client, result) if result is not None else None
+
+    pending = {asyncio.ensure_future(task(c)) for c in chains}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                hit = future.result()
+                if hit is not None:
+                    return hit
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def check_cancelled(cancelled: threading.Event):
+    """Abort a multi-call fetch early once another chain has won."""
+    if cancelled.is_set():
+        raise Cancelled()
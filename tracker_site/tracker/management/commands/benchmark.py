@@ -0,0 +1,81 @@
+# tracker/management/commands/benchmark.py
+"""
+python manage.py benchmark [--scenario NAME ...] [--requests N] [--concurrency N]
+                           [--cold] [--node-latency S] [--explorer-latency S] [--output FILE]
+
+Runs the offline benchmark (tracker/benchmark) against a throw-away test
+database and prints / writes the JSON report.
+"""
+import os
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+
+class Command(BaseCommand):
+    help = "Benchmark tx_search, last10_from_tx, download_tx_pdf_plain and the explorer walk against local fakes."
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        from tracker.benchmark import SCENARIOS
+
+        parser.add_argument("--scenario", action="append", choices=SCENARIOS, dest="scenarios",
+                            help="Scenario to run (repeatable; default: all).")
+        parser.add_argument("--requests", type=int, default=20, help="Measured requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Concurrent requests.")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests before each scenario.")
+        parser.add_argument("--cold", action="store_true", help="Reset caches, index and memo before every request.")
+        parser.add_argument("--node-latency", type=float, default=0.02, help="Seconds per fake node HTTP request.")
+        parser.add_argument("--explorer-latency", type=float, default=0.05, help="Seconds per fake explorer request.")
+        parser.add_argument("--tip", type=int, default=20000, help="Fake chain tip.")
+        parser.add_argument("--wallet-every", type=int, default=97, help="The wallet sends a tx every N blocks.")
+        parser.add_argument("--history-mode", choices=("race", "node", "explorer"),
+                            help="last10 history mode (default: LAST10_HISTORY_MODE).")
+        parser.add_argument("--explorer-limit", type=int, default=100, help="Rows per fetch_last_txs_from_explorer call.")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+
+    def handle(self, *args, **options):
+        from tracker.benchmark import SCENARIOS, run_benchmarks
+
+        db_file = None
+        if connections["default"].vendor == "sqlite":
+            # an in-memory test database locks whole tables across threads;
+            # background scans write while the next request runs
+            fd, db_file = tempfile.mkstemp(prefix="tracker-bench-", suffix=".sqlite3")
+            os.close(fd)
+            connections["default"].settings_dict["TEST"]["NAME"] = db_file
+
+        setup_test_environment()
+        db_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            report = run_benchmarks(
+                scenarios=options["scenarios"] or SCENARIOS,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+                cold=options["cold"],
+                node_latency=options["node_latency"],
+                explorer_latency=options["explorer_latency"],
+                tip=options["tip"],
+                wallet_every=options["wallet_every"],
+                history_mode=options["history_mode"],
+                explorer_limit=options["explorer_limit"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        finally:
+            teardown_databases(db_config, verbosity=0)
+            teardown_test_environment()
+            if db_file and os.path.exists(db_file):
+                os.unlink(db_file)
+
+        out = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(out + "\n")
+            self.stderr.write(f"Benchmark report written to {options['output']}")
+        else:
+            self.stdout.write(out)
@@ -0,0 +1,415 @@
+# tracker/metrics.py
+"""
+Prometheus metrics shared across worker processes.
+
+Each process keeps its counters and histograms in memory and writes them to
+METRICS_DIR/<pid>-<start>.json at most every METRICS_FLUSH_INTERVAL seconds
+(and at exit); the metrics/ view merges every file in the directory, so a
+scrape of any worker reports the whole deployment in the Prometheus text
+format. A scrape folds the files of exited workers into
+METRICS_DIR/exited.archive (under flock(), and read under a shared lock), so
+counters never go backwards while the directory stays small; clear
+METRICS_DIR when deploying to start from zero. Without fcntl the files are
+just kept. A worker forked after import starts from zero under its own file.
+isolated() points a process at a directory of its own (the benchmark).
+
+RPC, explorer and Arkham calls are observed through
+instrumentation.record(); cache lookups, scan depth and PDF render times by
+their modules.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = Path(os.getenv("METRICS_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR")
+                   or str(settings.RUNTIME_DIR / "metrics"))
+# Seconds between writes of this process's metrics file.
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUEUE_BUCKETS = (0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BLOCK_BUCKETS = (0, 10, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Summed values of exited workers ({"values": ..., "folded": [file names]}) and the lock guarding the directory.
+_ARCHIVE = "exited.archive"
+_LOCK = "merge.lock"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> str:
+        return json.dumps([[n, str(labels.get(n, ""))] for n in self.labelnames])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        _REGISTRY.update(self, self._key(labels), amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels: str):
+        _REGISTRY.update(self, self._key(labels), value)
+
+
+class _Registry:
+    """This process's values plus the file they are flushed to."""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._dir = METRICS_DIR
+        self._name = f"{self._pid}-{time.time_ns()}.json"
+        # metric name -> label key -> counter value or [bucket counts..., sum, count]
+        self._values: Dict[str, Dict[str, object]] = {}
+        self._flushed_at = 0.0
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+
+    def register(self, metric: _Metric):
+        self.metrics[metric.name] = metric
+
+    def update(self, metric: _Metric, key: str, value: float):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # forked: the parent's values are in the parent's file
+            series = self._values.setdefault(metric.name, {})
+            if isinstance(metric, Histogram):
+                state = series.get(key)
+                if state is None:
+                    state = series[key] = [0] * (len(metric.buckets) + 2)
+                for i, bound in enumerate(metric.buckets):
+                    if value <= bound:
+                        state[i] += 1
+                state[-2] += value
+                state[-1] += 1
+            else:
+                series[key] = series.get(key, 0) + value
+            self._dirty = True
+            due = time.monotonic() - self._flushed_at >= METRICS_FLUSH_INTERVAL
+            if not due and self._timer is None:
+                # an idle worker still publishes its last updates
+                self._timer = threading.Timer(METRICS_FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            if not self._dirty or self._pid != os.getpid():
+                return
+            data = json.dumps(self._values)
+            self._flushed_at = time.monotonic()
+            self._dirty = False
+            path = self._dir / self._name
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, data)
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", path, e)
+
+    def swap(self, directory: Path, values: Dict[str, Dict[str, object]]) -> Tuple[Path, Dict[str, Dict[str, object]]]:
+        """Use `directory` and `values` from now on; returns the previous pair."""
+        with self._lock:
+            previous = (self._dir, self._values)
+            self._dir, self._values = directory, values
+            self._dirty = bool(values)
+        return previous
+
+    def collect(self) -> Dict[str, Dict[str, object]]:
+        """Values of every process, merged; folds the files of exited processes into the archive first."""
+        self.flush()
+        directory = self._dir
+        with _dir_lock(directory, exclusive=True) as locked:
+            if locked:
+                self._fold_exited(directory)
+        merged: Dict[str, Dict[str, object]] = {}
+        with _dir_lock(directory, exclusive=False):
+            archive = _read_archive(directory)
+            _merge(merged, archive["values"])
+            for path in directory.glob("*.json"):
+                if path.name in archive["folded"]:
+                    continue  # folded by an interrupted prune
+                try:
+                    _merge(merged, json.loads(path.read_text()))
+                except (OSError, ValueError) as e:
+                    logger.debug("Skipping metrics file %s: %s", path, e)
+        return merged
+
+    def _fold_exited(self, directory: Path):
+        """Move the values of exited processes into the archive (caller holds the exclusive lock)."""
+        archive = _read_archive(directory)
+        folded = set(archive["folded"])
+        exited = []
+        for path in directory.glob("*.json"):
+            if path.name == self._name or path.name in folded:
+                continue
+            try:
+                pid = int(path.name.split("-", 1)[0])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):  # same pid, other start: an exited predecessor
+                exited.append(path)
+        gone = [name for name in folded if not (directory / name).exists()]
+        if not exited and not gone:
+            return
+        values = archive["values"]
+        for path in exited:
+            try:
+                _merge(values, json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.debug("Dropping unreadable metrics file %s: %s", path, e)
+            folded.add(path.name)
+        folded.difference_update(gone)
+        try:
+            _write_atomic(directory / _ARCHIVE, json.dumps({"values": values, "folded": sorted(folded)}))
+        except OSError as e:
+            logger.warning("Could not write metrics archive in %s: %s", directory, e)
+            return
+        for name in list(folded):
+            try:
+                (directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.debug("Could not remove folded metrics file %s: %s", name, e)
+                continue
+            folded.discard(name)
+        # the archive lists only files that are still there
+        try:
+            _write_atomic(directory / _ARCHIVE, json.dumps({"values": values, "folded": sorted(folded)}))
+        except OSError as e:
+            logger.debug("Could not rewrite metrics archive in %s: %s", directory, e)
+
+
+def _merge(target: Dict[str, Dict[str, object]], values: Dict[str, Dict[str, object]]):
+    """Add one process's values (or the archive's) to target."""
+    for name, series in values.items():
+        into = target.setdefault(name, {})
+        for key, value in series.items():
+            if isinstance(value, list):
+                current = into.get(key)
+                into[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                into[key] = into.get(key, 0) + value
+
+
+def _read_archive(directory: Path) -> Dict[str, object]:
+    try:
+        archive = json.loads((directory / _ARCHIVE).read_text())
+        return {"values": archive.get("values") or {}, "folded": list(archive.get("folded") or [])}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable metrics archive in %s: %s", directory, e)
+    return {"values": {}, "folded": []}
+
+
+def _write_atomic(path: Path, data: str):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by another user
+    return True
+
+
+@contextmanager
+def _dir_lock(directory: Path, exclusive: bool) -> Iterator[bool]:
+    """flock() on the directory's lock file; yields False (unlocked) without fcntl or when it cannot be opened."""
+    if fcntl is None:
+        yield False
+        return
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(directory / _LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError as e:
+        logger.debug("Could not open metrics lock in %s: %s", directory, e)
+        yield False
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield True
+    finally:
+        os.close(fd)
+
+
+_REGISTRY = _Registry()
+atexit.register(_REGISTRY.flush)
+
+
+@contextmanager
+def isolated(directory: Path) -> Iterator[Path]:
+    """Record and merge this process's metrics in `directory`, starting from zero; the previous values and
+    directory are restored afterwards (what was counted inside is only in `directory`)."""
+    directory = Path(directory)
+    _REGISTRY.flush()
+    previous = _REGISTRY.swap(directory, {})
+    try:
+        yield directory
+    finally:
+        _REGISTRY.flush()
+        _REGISTRY.swap(*previous)
+
+
+# -------------------- exposition --------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: Iterable[Sequence[str]], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = [(n, v) for n, v in pairs] + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in items) + "}"
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def render() -> str:
+    """All registered metrics, merged across processes, in the Prometheus text format (0.0.4)."""
+    values = _REGISTRY.collect()
+    lines: List[str] = []
+    for name, metric in sorted(_REGISTRY.metrics.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(values.get(name, {}).items()):
+            pairs = json.loads(key)
+            if isinstance(metric, Histogram):
+                for bound, count in zip(metric.buckets, value[:-2]):
+                    lines.append(f"{name}_bucket{_labels(pairs, ('le', _number(bound)))} {_number(count)}")
+                lines.append(f"{name}_bucket{_labels(pairs, ('le', '+Inf'))} {_number(value[-1])}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(pairs)} {_number(value[-1])}")
+            else:
+                lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """GET metrics/: Prometheus scrape endpoint."""
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# -------------------- metrics --------------------
+RPC_REQUEST_SECONDS = Histogram(
+    "tracker_rpc_request_duration_seconds", "Node JSON-RPC HTTP request latency (a batch is one request).",
+    ("chain", "method"))
+RPC_CALLS = Counter("tracker_rpc_calls_total", "Node JSON-RPC calls sent (batch members counted singly).",
+                    ("chain", "method"))
+RPC_ERRORS = Counter("tracker_rpc_errors_total", "Node JSON-RPC HTTP requests that failed.", ("chain", "method"))
+RPC_CACHE_LOOKUPS = Counter("tracker_rpc_cache_lookups_total", "RPC response cache lookups by result.",
+                            ("chain", "result"))
+EXPLORER_REQUESTS = Counter("tracker_explorer_requests_total", "Explorer API requests.", ("chain", "status"))
+EXPLORER_REQUEST_SECONDS = Histogram("tracker_explorer_request_duration_seconds", "Explorer API request latency.",
+                                     ("chain",))
+ARKHAM_REQUESTS = Counter("tracker_arkham_requests_total", "Arkham label API requests.", ("status",))
+ARKHAM_REQUEST_SECONDS = Histogram("tracker_arkham_request_duration_seconds", "Arkham label API request latency.")
+SCAN_DEPTH_BLOCKS = Histogram("tracker_last10_scan_depth_blocks",
+                              "Blocks below the base tx walked (index and node) to collect last10 history.",
+                              ("chain",), buckets=BLOCK_BUCKETS)
+SCAN_NODE_BLOCKS = Histogram("tracker_last10_node_blocks", "Blocks fetched from the node for one last10 history.",
+                             ("chain",), buckets=BLOCK_BUCKETS)
+PDF_RENDER_SECONDS = Histogram("tracker_pdf_render_seconds", "PDF render time.", ("kind",))
+RPC_BREAKER_TRANSITIONS = Counter("tracker_rpc_breaker_transitions_total",
+                                  "RPC endpoint circuit breaker state changes, by new state.", ("chain", "state"))
+RPC_BREAKER_REJECTED = Counter("tracker_rpc_breaker_rejected_total",
+                               "RPC calls failed fast because the endpoint's circuit was open.", ("chain",))
+RPC_HEDGES = Counter("tracker_rpc_hedges_total",
+                     "Calls on multi-endpoint chains that were hedged (which endpoint won), failed over, "
+                     "or not hedged because the chain's hedge pool was full (pool_full).",
+                     ("chain", "outcome"))
+RING_SCAN_BLOCKS = Counter("tracker_ring_scan_blocks_total",
+                           "Blocks of last10 scans answered from the followed recent-block ring.", ("chain",))
+FOLLOWER_REORGS = Counter("tracker_follower_reorgs_total", "Ring blocks dropped because the chain reorganised.",
+                          ("chain",))
+TOKEN_LOGS_SPLITS = Counter("tracker_token_logs_splits_total",
+                            "Token transfer getLogs windows refused as too large and retried smaller.", ("chain",))
+SCAN_BLOOM_BLOCKS = Counter("tracker_scan_bloom_blocks_total",
+                            "Bloom-mode scan headers by outcome (skipped; hit or false_positive when the body "
+                            "was fetched).", ("chain", "outcome"))
+NONCE_PROBES = Counter("tracker_nonce_probes_total",
+                       "Historical eth_getTransactionCount probes spent locating sent txs by nonce.", ("chain",))
+SINGLEFLIGHT_CALLS = Counter("tracker_singleflight_calls_total",
+                             "Coalesced lookups by outcome (leader ran it; joined a call in this process or "
+                             "another worker; wait_timeout).", ("flight", "outcome"))
+RATE_LIMIT_QUEUE_SECONDS = Histogram("tracker_ratelimit_queue_seconds",
+                                     "Time outbound calls queued for a rate limiter token.", ("limiter",),
+                                     buckets=QUEUE_BUCKETS)
+RATE_LIMIT_THROTTLED = Counter("tracker_ratelimit_throttled_total", "Upstream answers saying we were rate limited.",
+                               ("limiter",))
+RATE_LIMIT_REJECTED = Counter("tracker_ratelimit_rejected_total",
+                              "Outbound calls refused because the rate limit queue exceeded RATE_LIMIT_MAX_WAIT.",
+                              ("limiter",))
+
+
+def observe_call(kind: str, target: str, name: str, ms: float, calls: int, error: bool):
+    """Metrics side of instrumentation.record()."""
+    seconds = ms / 1000.0
+    status = "error" if error else "ok"
+    if kind == "rpc":
+        RPC_REQUEST_SECONDS.observe(seconds, chain=target, method=name)
+        RPC_CALLS.inc(calls, chain=target, method=name)
+        if error:
+            RPC_ERRORS.inc(chain=target, method=name)
+    elif kind == "explorer":
+        EXPLORER_REQUESTS.inc(chain=target, status=status)
+        EXPLORER_REQUEST_SECONDS.observe(seconds, chain=target)
+    elif kind == "arkham":
+        ARKHAM_REQUESTS.inc(status=status)
+        ARKHAM_REQUEST_SECONDS.observe(seconds)
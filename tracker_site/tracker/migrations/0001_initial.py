@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.CharField(max_length=64)),
+                ('address', models.CharField(max_length=42)),
+                ('start_block', models.PositiveBigIntegerField()),
+                ('end_block', models.PositiveBigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['chain', 'address', '-end_block'], name='tracker_range_addr_end_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='IndexedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.CharField(max_length=64)),
+                ('tx_hash', models.CharField(max_length=66)),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('from_address', models.CharField(max_length=42)),
+                ('to_address', models.CharField(blank=True, max_length=42, null=True)),
+                ('value_wei', models.DecimalField(decimal_places=0, default=0, max_digits=78)),
+                ('gas', models.PositiveBigIntegerField(default=0)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('input', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('chain', 'tx_hash'), name='tracker_indexedtx_chain_hash_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AddressParticipation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.CharField(max_length=64)),
+                ('address', models.CharField(max_length=42)),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='tracker.indexedtransaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['chain', 'address', '-block_number'], name='tracker_part_addr_block_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chain', 'address', 'transaction'), name='tracker_part_addr_tx_uniq')],
+            },
+        ),
+    ]
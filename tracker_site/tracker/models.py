@@ -1,3 +1,75 @@
 from django.db import models
 
-# Create your models here.
+
+class IndexedTransaction(models.Model):
+    """A transaction seen by a wallet scan, stored once per (chain, hash)."""
+
+    chain = models.CharField(max_length=64)
+    tx_hash = models.CharField(max_length=66)
+    block_number = models.PositiveBigIntegerField()
+    from_address = models.CharField(max_length=42)
+    to_address = models.CharField(max_length=42, null=True, blank=True)
+    value_wei = models.DecimalField(max_digits=78, decimal_places=0, default=0)
+    gas = models.PositiveBigIntegerField(default=0)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    input = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["chain", "tx_hash"], name="tracker_indexedtx_chain_hash_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.chain}:{self.tx_hash}"
+
+
+class AddressParticipation(models.Model):
+    """Links a (lower-cased) address to an indexed transaction it sent or received."""
+
+    chain = models.CharField(max_length=64)
+    address = models.CharField(max_length=42)
+    block_number = models.PositiveBigIntegerField()
+    transaction = models.ForeignKey(IndexedTransaction, on_delete=models.CASCADE, related_name="participants")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chain", "address", "-block_number"], name="tracker_part_addr_block_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["chain", "address", "transaction"], name="tracker_part_addr_tx_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.address} @ {self.block_number}"
+
+
+class IndexedRange(models.Model):
+    """
+    Inclusive block range [start_block, end_block] whose transactions for an
+    address are fully recorded in AddressParticipation.
+    """
+
+    chain = models.CharField(max_length=64)
+    address = models.CharField(max_length=42)
+    start_block = models.PositiveBigIntegerField()
+    end_block = models.PositiveBigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["chain", "address", "-end_block"], name="tracker_range_addr_end_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.chain}:{self.address} [{self.start_block}, {self.end_block}]"
+
+
+class TxChain(models.Model):
+    """Chain a (lower-cased) transaction hash was found on, so lookups can skip the multi-chain search."""
+
+    tx_hash = models.CharField(max_length=66, unique=True)
+    chain = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.tx_hash} -> {self.chain}"
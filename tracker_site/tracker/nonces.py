@@ -0,0 +1,132 @@
+# tracker/nonces.py
+"""
+Locate a wallet's outgoing transactions by nonce bisection.
+
+An account's transaction count at a block (eth_getTransactionCount(address,
+block)) only ever grows, by one per tx the account sends. So the block that
+holds nonce k is the first block whose count exceeds k, and a binary search
+over block numbers finds it without reading any block in between.
+
+sent_txs() reads the count at start_block (and below the floor), then bisects
+every block interval that still holds one of the newest `limit` nonces. All
+midpoints of a round go out as one JSON-RPC batch, so the search costs about
+log2(start_block - floor) round trips, a few dozen even over a chain's whole
+history. The few blocks it lands on are then fetched in one batch. A wallet
+with sparse activity spread over months needs no linear block scan at all.
+
+This needs historical state. Full (non-archive) nodes reject counts at old
+blocks ("missing trie node"), and the RPCError is raised to the caller.
+Incoming txs do not move the sender's nonce and are not found this way. A
+contract's nonce also moves on contract creation, so a located block may hold
+no tx from the wallet.
+"""
+import os
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import NONCE_PROBES
+from .records import TxRecord
+from .rpc import ChainClient, RPCError
+from .scan import SCAN_BATCH_SIZE, decode_raw_block, wallet_txs_in_block
+
+logger = logging.getLogger(__name__)
+
+# Bisection rounds a lookup may spend (each one batch); 64 covers any block range.
+NONCE_MAX_ROUNDS = int(os.getenv("NONCE_MAX_ROUNDS", "64"))
+
+# (lo_block, count at lo_block, hi_block, count at hi_block): the wallet sent
+# nonces count(lo)..count(hi)-1 in blocks lo+1..hi
+_Interval = Tuple[int, int, int, int]
+
+
+def _tx_counts(client: ChainClient, wallet: str, blocks: List[int]) -> List[int]:
+    """Transaction counts of wallet at the end of each block, in one batch."""
+    responses = client.send_batch([("eth_getTransactionCount", [wallet, hex(b)]) for b in blocks])
+    NONCE_PROBES.inc(len(blocks), chain=client.chain_name)
+    counts = []
+    for response in responses:
+        if "error" in response or response.get("result") is None:
+            raise RPCError("eth_getTransactionCount", response.get("error") or "no result")
+        counts.append(int(response["result"], 16))
+    return counts
+
+
+def _bisect(client: ChainClient, wallet: str, intervals: List[_Interval], wanted: int,
+            max_rounds: int) -> Tuple[Dict[int, Tuple[int, int]], int]:
+    """
+    Narrow the intervals down to single blocks; returns ({block: (first nonce,
+    last nonce + 1)}, rounds). Parts holding only nonces below `wanted` are dropped.
+    """
+    located: Dict[int, Tuple[int, int]] = {}
+    rounds = 0
+    while intervals:
+        open_: List[_Interval] = []
+        for lo, lo_count, hi, hi_count in intervals:
+            if hi_count <= max(lo_count, wanted):
+                continue
+            if hi - lo == 1:
+                located[hi] = (lo_count, hi_count)
+            else:
+                open_.append((lo, lo_count, hi, hi_count))
+        if not open_:
+            break
+        if rounds >= max_rounds:
+            raise RPCError("eth_getTransactionCount", f"nonce bisection did not converge in {max_rounds} rounds")
+        mids = [(lo + hi) // 2 for lo, _, hi, _ in open_]
+        counts = _tx_counts(client, wallet, mids)
+        rounds += 1
+        intervals = []
+        for (lo, lo_count, hi, hi_count), mid, mid_count in zip(open_, mids, counts):
+            intervals.append((lo, lo_count, mid, mid_count))
+            intervals.append((mid, mid_count, hi, hi_count))
+    return located, rounds
+
+
+def _fetch_blocks(client: ChainClient, numbers: List[int]) -> Dict[int, Optional[Any]]:
+    blocks: Dict[int, Optional[Any]] = {}
+    for i in range(0, len(numbers), max(1, SCAN_BATCH_SIZE)):
+        chunk = numbers[i:i + max(1, SCAN_BATCH_SIZE)]
+        responses = client.send_batch([("eth_getBlockByNumber", [hex(n), True]) for n in chunk])
+        for n, response in zip(chunk, responses):
+            raw = response.get("result")
+            blocks[n] = decode_raw_block(raw) if raw else None
+    return blocks
+
+
+def sent_txs(client: ChainClient, wallet: str, start_block: int, limit: int = 10, floor: int = 0,
+             max_rounds: int = NONCE_MAX_ROUNDS) -> Dict[str, Any]:
+    """
+    The wallet's newest `limit` outgoing txs in blocks [floor, start_block],
+    newest first, found by nonce bisection (every wallet-sent tx of a located
+    block is kept). Returns {"txs", "lowest_block", "nonce", "calls",
+    "failed_blocks"}: nonce is the wallet's tx count at start_block, calls the
+    JSON-RPC round trips spent. Raises RPCError when the node has no state for
+    the blocks asked about.
+    """
+    wallet = wallet.lower()
+    floor = max(0, floor)
+    if floor > 0:
+        base, top = _tx_counts(client, wallet, [floor - 1, start_block])
+    else:
+        base, top = 0, _tx_counts(client, wallet, [start_block])[0]
+    calls = 1
+    wanted = max(base, top - limit)
+    located, rounds = _bisect(client, wallet, [(floor - 1, base, start_block, top)], wanted, max_rounds)
+    calls += rounds
+
+    numbers = sorted(located, reverse=True)
+    blocks = _fetch_blocks(client, numbers) if numbers else {}
+    calls += -(-len(numbers) // max(1, SCAN_BATCH_SIZE))
+    txs: List[TxRecord] = []
+    failed = []
+    for n in numbers:
+        block = blocks.get(n)
+        if block is None:
+            failed.append(n)
+            continue
+        txs.extend(t for t in wallet_txs_in_block(block, n, wallet) if (t.from_ or "").lower() == wallet)
+    # with fewer than `limit` nonces in range every block down to the floor was accounted for
+    lowest = numbers[-1] if numbers and top - base >= limit else floor
+    logger.debug("Located %d sent txs of %s on %s in %d round trips (nonce %d)", len(txs), wallet,
+                 client.chain_name, calls, top)
+    return {"txs": txs, "lowest_block": lowest, "nonce": top, "calls": calls, "failed_blocks": failed}
@@ -0,0 +1,201 @@
+# tracker/pdfs.py
+"""
+Plain-text PDF rendering and the on-disk PDF artifact cache.
+
+A finalized transaction's PDF never changes, so download_tx_pdf_plain
+renders it once and afterwards serves the file from PDF_CACHE_DIR (keyed by
+chain, hash and PDF_TEMPLATE_VERSION) without touching the node. Bump
+PDF_TEMPLATE_VERSION whenever the layout or pdf_tx_data() fields change;
+files of older versions are simply never read again.
+
+render_report_pdf() puts a whole last10_from_tx result set into one document.
+"""
+import os
+import re
+import time
+import logging
+import tempfile
+import textwrap
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+from .metrics import PDF_RENDER_SECONDS
+
+# Optional PDF dependency
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas as rl_canvas
+    REPORTLAB_AVAILABLE = True
+except Exception:
+    REPORTLAB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = Path(os.getenv("PDF_CACHE_DIR", str(settings.RUNTIME_DIR / "pdf")))
+PDF_TEMPLATE_VERSION = "1"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+TX_HASH_RE = re.compile(r"0x[0-9a-fA-F]{64}")
+
+
+def is_tx_hash(value: str) -> bool:
+    """True for a 0x-prefixed 32-byte hex hash (the only shape allowed into cache paths)."""
+    return bool(TX_HASH_RE.fullmatch(value or ""))
+
+
+# -------------------- rendering --------------------
+class _TextDocument:
+    """Courier text lines on A4 pages, wrapping and breaking pages as needed."""
+
+    margin_x = 40
+    bottom = 80
+
+    def __init__(self):
+        self.buffer = BytesIO()
+        self.canvas = rl_canvas.Canvas(self.buffer, pagesize=A4)
+        self.top = A4[1] - 40
+        self.text = self._begin()
+
+    def _begin(self):
+        text = self.canvas.beginText(self.margin_x, self.top)
+        text.setFont("Courier", 10)
+        text.setLeading(14)
+        return text
+
+    def line(self, line: str = ""):
+        for w in textwrap.wrap(line, width=100) or [line]:
+            self.text.textLine(w)
+
+    def fields(self, data: Dict[str, str]):
+        """key: value lines, blank line after each (the single-tx layout)."""
+        for key, val in data.items():
+            self.line(f"{key}: {val}")
+            self.line()
+            self.break_if_full()
+
+    def break_if_full(self):
+        if self.text.getY() < self.bottom:
+            self.new_page()
+
+    def new_page(self):
+        self.canvas.drawText(self.text)
+        self.canvas.showPage()
+        self.text = self._begin()
+
+    def finish(self) -> bytes:
+        self.canvas.drawText(self.text)
+        self.canvas.showPage()
+        self.canvas.save()
+        pdf = self.buffer.getvalue()
+        self.buffer.close()
+        return pdf
+
+
+def render_tx_pdf(tx_data: dict) -> bytes:
+    """Render key/value lines into a plain-text A4 PDF (requires reportlab)."""
+    started = time.perf_counter()
+    doc = _TextDocument()
+    doc.fields(tx_data)
+    pdf = doc.finish()
+    PDF_RENDER_SECONDS.observe(time.perf_counter() - started, kind="tx")
+    return pdf
+
+
+def report_tx_data(tx) -> Dict[str, str]:
+    """Key/value lines for one TxRecord of a last10 report."""
+    return {
+        "Hash": tx.hash or "",
+        "Block": str(tx.block or ""),
+        "Timestamp (UTC)": tx.timestamp.isoformat() if tx.timestamp else "",
+        "From": tx.from_ or "",
+        "To": tx.to or "",
+        "Value (ETH)": str(tx.value_eth),
+        "Gas (limit)": str(tx.gas),
+        "Source": tx.source or "",
+    }
+
+
+def render_report_pdf(header: Dict[str, str], txs: Iterable) -> bytes:
+    """
+    One plain-text PDF for a set of TxRecords: the header lines, then every
+    tx's report_tx_data() block, rendered in a single pass over `txs`.
+    """
+    started = time.perf_counter()
+    doc = _TextDocument()
+    for key, val in header.items():
+        doc.line(f"{key}: {val}")
+    doc.line(f"Generated (UTC): {datetime.now(timezone.utc).isoformat(timespec='seconds')}")
+    for n, tx in enumerate(txs, 1):
+        doc.line()
+        doc.line(f"#{n} " + "-" * 60)
+        for key, val in report_tx_data(tx).items():
+            doc.line(f"{key}: {val}")
+        doc.break_if_full()
+    pdf = doc.finish()
+    PDF_RENDER_SECONDS.observe(time.perf_counter() - started, kind="report")
+    return pdf
+
+
+# -------------------- responses --------------------
+def pdf_filename(tx_hash: str) -> str:
+    return f"tx_{tx_hash[:10]}.pdf"
+
+
+def pdf_response(pdf: bytes, tx_hash: str, filename: Optional[str] = None) -> HttpResponse:
+    resp = HttpResponse(pdf, content_type="application/pdf")
+    resp["Content-Disposition"] = f'attachment; filename="{filename or pdf_filename(tx_hash)}"'
+    return resp
+
+
+# -------------------- artifact cache --------------------
+def cached_pdf_path(chain_name: str, tx_hash: str) -> Path:
+    """Cache file of a tx PDF for the current PDF_TEMPLATE_VERSION (ValueError if it would leave PDF_CACHE_DIR)."""
+    if not is_tx_hash(tx_hash):
+        raise ValueError(f"not a transaction hash: {tx_hash!r}")
+    root = PDF_CACHE_DIR.resolve()
+    path = (root / f"v{PDF_TEMPLATE_VERSION}" / _UNSAFE.sub("_", chain_name) / f"{tx_hash.lower()}.pdf").resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"PDF cache path escapes {root}: {path}")
+    return path
+
+
+def cached_pdf_response(chain_name: Optional[str], tx_hash: str) -> Optional[FileResponse]:
+    """FileResponse for a cached tx PDF, or None if it was never stored."""
+    if not chain_name:
+        return None
+    try:
+        f = open(cached_pdf_path(chain_name, tx_hash), "rb")
+    except (OSError, ValueError):
+        return None
+    return FileResponse(f, as_attachment=True, filename=pdf_filename(tx_hash), content_type="application/pdf")
+
+
+def read_cached_pdf(chain_name: Optional[str], tx_hash: str) -> Optional[bytes]:
+    """Cached tx PDF bytes (for the async view, which should not stream a sync file), or None."""
+    if not chain_name:
+        return None
+    try:
+        return cached_pdf_path(chain_name, tx_hash).read_bytes()
+    except (OSError, ValueError):
+        return None
+
+
+def store_pdf(chain_name: str, tx_hash: str, pdf: bytes):
+    """Write a tx PDF to the cache atomically (readers never see a partial file)."""
+    tmp = None
+    try:
+        path = cached_pdf_path(chain_name, tx_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, path)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not cache PDF for %s on %s: %s", tx_hash, chain_name, e)
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
@@ -0,0 +1,214 @@
+# tracker/ratelimit.py
+"""
+Outbound token buckets shared by every worker process on the host.
+
+Explorer API keys allow a few requests per second and RPC providers meter
+calls, so each RPC endpoint and each explorer API key gets a TokenBucket.
+The bucket state (tokens, last refill) lives in a small file under
+RATE_LIMIT_DIR guarded by flock(), so all workers draw from one budget.
+A caller takes its tokens immediately, going into debt when the bucket is
+empty, and sleeps for the debt it queued behind; calls are delayed in
+arrival order instead of failing. Only a wait above RATE_LIMIT_MAX_WAIT is
+refused (RateLimitExceeded).
+
+When upstream still answers "rate limited" (HTTP 429, Etherscan's "Max rate
+limit reached"), throttled() drains the bucket so every worker backs off.
+Queueing delays are exported as tracker_ratelimit_queue_seconds and show up
+in the request's Server-Timing as "ratelimit" entries.
+
+Without fcntl (Windows) the bucket is per process. The async API
+(aacquire(), athrottled()) does the file locking on a worker thread.
+"""
+import os
+import time
+import struct
+import asyncio
+import hashlib
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .instrumentation import record
+from .metrics import RATE_LIMIT_QUEUE_SECONDS, RATE_LIMIT_REJECTED, RATE_LIMIT_THROTTLED
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bucket files shared by every worker process (one per key).
+RATE_LIMIT_DIR = Path(os.getenv("RATE_LIMIT_DIR") or str(settings.RUNTIME_DIR / "ratelimit"))
+# Longest a call may queue for a token before it is refused.
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+# Times a call answered with "rate limited" is queued again before giving up.
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "2"))
+# Back-off after a "rate limited" answer that carries no Retry-After.
+RATE_LIMIT_THROTTLE_PENALTY = float(os.getenv("RATE_LIMIT_THROTTLE_PENALTY", "1"))
+
+_STATE = struct.Struct("<dd")  # tokens, wall-clock time of the last refill
+
+
+class RateLimitExceeded(Exception):
+    """The wait for a token would exceed the caller's max_wait."""
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, at most `burst` banked. `key` identifies the
+    shared budget (an endpoint URL, an API key's env var); `name` labels it in
+    metrics and logs. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, name: str, key: str, rate: float, burst: Optional[float] = None):
+        self.name = name
+        self.rate = max(0.0, rate)
+        self.burst = max(1.0, burst if burst is not None else self.rate)
+        self.path = RATE_LIMIT_DIR / (hashlib.sha256(key.encode()).hexdigest()[:32] + ".bucket")
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid = 0
+        self._local: Tuple[float, float] = (self.burst, time.time())
+
+    def __repr__(self):
+        return f"TokenBucket({self.name!r}, rate={self.rate}, burst={self.burst})"
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    # -------------------- shared state --------------------
+    def _open(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        if self._fd is not None and self._pid == os.getpid():
+            return self._fd
+        # a forked child must not reuse the parent's descriptor: flock() locks
+        # are per open file, so parent and child would not exclude each other
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        except OSError as e:
+            logger.warning("Rate limiter %s falls back to per-process state (%s): %s", self.name, self.path, e)
+            self._fd = None
+        return self._fd
+
+    def _read(self, fd: Optional[int]) -> Tuple[float, float]:
+        if fd is None:
+            return self._local
+        data = os.pread(fd, _STATE.size, 0)
+        return _STATE.unpack(data) if len(data) == _STATE.size else (self.burst, time.time())
+
+    def _write(self, fd: Optional[int], tokens: float, stamp: float):
+        if fd is None:
+            self._local = (tokens, stamp)
+        else:
+            os.pwrite(fd, _STATE.pack(tokens, stamp), 0)
+
+    def _update(self, change) -> Optional[float]:
+        """Apply change(tokens_after_refill) -> (new tokens, result) under the cross-process lock."""
+        with self._lock:
+            fd = self._open()
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                tokens, stamp = self._read(fd)
+                now = time.time()
+                tokens = min(self.burst, tokens + max(0.0, now - stamp) * self.rate)
+                tokens, result = change(tokens)
+                self._write(fd, tokens, now)
+                return result
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    # -------------------- API --------------------
+    def reserve(self, cost: float = 1, max_wait: Optional[float] = RATE_LIMIT_MAX_WAIT) -> float:
+        """Take `cost` tokens and return the seconds to wait before using them (raises RateLimitExceeded)."""
+        if not self.enabled:
+            return 0.0
+
+        def take(tokens: float):
+            wait = max(0.0, (cost - tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return tokens, None
+            return tokens - cost, wait
+
+        wait = self._update(take)
+        if wait is None:
+            RATE_LIMIT_REJECTED.inc(limiter=self.name)
+            raise RateLimitExceeded(f"{self.name}: rate limit queue longer than {max_wait:g}s")
+        RATE_LIMIT_QUEUE_SECONDS.observe(wait, limiter=self.name)
+        if wait > 0:
+            record("ratelimit", self.name, "queue", wait * 1000.0)
+        return wait
+
+    def acquire(self, cost: float = 1, max_wait: Optional[float] = RATE_LIMIT_MAX_WAIT) -> float:
+        """Block until `cost` tokens are ours; returns the seconds waited."""
+        wait = self.reserve(cost, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, cost: float = 1, max_wait: Optional[float] = RATE_LIMIT_MAX_WAIT) -> float:
+        """Async acquire(): the bucket file is locked and updated on a worker thread, and the event loop
+        keeps serving while this call queues."""
+        if not self.enabled:
+            return 0.0
+        wait = await sync_to_async(self.reserve, thread_sensitive=False)(cost, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def throttled(self, retry_after: Optional[float] = None):
+        """Upstream said "too many requests": hold every worker back for retry_after seconds."""
+        RATE_LIMIT_THROTTLED.inc(limiter=self.name)
+        if not self.enabled:
+            return
+        penalty = retry_after if retry_after is not None else RATE_LIMIT_THROTTLE_PENALTY
+        logger.info("Rate limited by upstream (%s); backing off %.1fs", self.name, penalty)
+        self._update(lambda tokens: (min(tokens, -penalty * self.rate), None))
+
+    async def athrottled(self, retry_after: Optional[float] = None):
+        """Async throttled() (the bucket file is updated on a worker thread)."""
+        if not self.enabled:
+            RATE_LIMIT_THROTTLED.inc(limiter=self.name)
+            return
+        await sync_to_async(self.throttled, thread_sensitive=False)(retry_after)
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(name: str, key: str, rate: float, burst: Optional[float] = None) -> TokenBucket:
+    """The process-wide TokenBucket for `key` (the first caller's rate/burst win)."""
+    found = _buckets.get(key)
+    if found is None:
+        with _buckets_lock:
+            found = _buckets.get(key)
+            if found is None:
+                found = _buckets[key] = TokenBucket(name, key, rate, burst)
+    return found
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta or HTTP date), else None."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,133 @@
+# tracker/records.py
+"""
+Compact transaction records for the last10_from_tx pipeline.
+
+TxRecord is a __slots__ object (no per-instance dict) holding ints and
+strings only; value_eth and timestamp are derived on access. to_record() is
+the one normaliser for node txs (AttributeDict/raw dict), explorer txlist
+rows and IndexedTransaction rows, so the scan, index and explorer paths all
+produce the same type. Templates read records like dicts (t.hash, t.from via
+t.get); TxRecordEncoder serialises them for json_script.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from web3 import Web3
+
+_WEI_PER_ETH = 10 ** 18
+
+# public key -> slot (``from`` is a keyword)
+_FIELDS = {
+    "hash": "hash",
+    "from": "from_",
+    "to": "to",
+    "value_wei": "value_wei",
+    "value_eth": "value_eth",
+    "gas": "gas",
+    "block": "block",
+    "timestamp": "timestamp",
+    "input": "input",
+    "source": "source",
+    "explorer_url": "explorer_url",
+    "to_explorer_url": "to_explorer_url",
+}
+
+
+def _int(value: Any) -> int:
+    """Quantity as int: accepts ints, Decimals, hex and decimal strings, None."""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value, 16) if value.startswith("0x") else int(value)
+    return int(value)
+
+
+def _hexstr(value: Any) -> Optional[str]:
+    if isinstance(value, (bytes, bytearray)):
+        return Web3.to_hex(value)
+    return value
+
+
+class TxRecord:
+    __slots__ = ("hash", "from_", "to", "value_wei", "gas", "block", "ts", "input",
+                 "source", "explorer_url", "to_explorer_url")
+
+    def __init__(self, hash: Optional[str], from_: Optional[str], to: Optional[str], value_wei: int = 0,
+                 gas: int = 0, block: int = 0, ts: Optional[int] = None, input: str = "",
+                 source: Optional[str] = None):
+        self.hash = hash
+        self.from_ = from_
+        self.to = to
+        self.value_wei = value_wei
+        self.gas = gas
+        self.block = block
+        self.ts = ts  # unix seconds
+        self.input = input
+        self.source = source
+        self.explorer_url = None
+        self.to_explorer_url = None
+
+    @property
+    def value_eth(self) -> float:
+        return self.value_wei / _WEI_PER_ETH
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        return datetime.fromtimestamp(self.ts, tz=timezone.utc) if self.ts else None
+
+    # dict-style access, so code and templates written against the old tx dicts keep working
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, _FIELDS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = _FIELDS.get(key)
+        return getattr(self, slot) if slot else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, slot) for key, slot in _FIELDS.items()}
+
+    def __repr__(self):
+        return f"TxRecord({self.hash!r}, block={self.block})"
+
+
+def to_record(obj: Any, block: Optional[int] = None, timestamp: Any = None) -> TxRecord:
+    """
+    Normalise one transaction into a TxRecord. obj may be a node tx
+    (AttributeDict or raw dict; pass the block's number/timestamp), an explorer
+    txlist row (string quantities, timeStamp) or an IndexedTransaction.
+    """
+    if hasattr(obj, "tx_hash"):  # IndexedTransaction row
+        ts = obj.timestamp
+        return TxRecord(obj.tx_hash, obj.from_address, obj.to_address, int(obj.value_wei), int(obj.gas),
+                        int(obj.block_number), int(ts.timestamp()) if ts else None, obj.input or "")
+    if block is None:
+        block = obj.get("blockNumber")
+    if timestamp is None:
+        timestamp = obj.get("timeStamp")
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.timestamp()
+    return TxRecord(
+        _hexstr(obj.get("hash")),
+        obj.get("from"),
+        obj.get("to") or None,
+        _int(obj.get("value")),
+        _int(obj.get("gas")),
+        _int(block),
+        _int(timestamp) or None,
+        _hexstr(obj.get("input") or obj.get("data")) or "",
+    )
+
+
+class TxRecordEncoder(DjangoJSONEncoder):
+    """JSON encoder for TxRecord lists (e.g. json_script(txs, "id", encoder=TxRecordEncoder))."""
+
+    def default(self, o):
+        if isinstance(o, TxRecord):
+            return o.to_dict()
+        return super().default(o)
@@ -0,0 +1,536 @@
+# tracker/rpc.py
+"""
+Process-wide pooled JSON-RPC clients.
+
+Every view used to build a fresh Web3(HTTPProvider(rpc)) and call
+is_connected() per request, paying a TLS handshake plus an extra round trip
+before doing any real work. ChainClient keeps one keep-alive requests.Session
+per chain (pool sized per worker) and caches the connectivity status for a
+short TTL; Web3ClientRegistry hands those clients out to the views.
+
+A chain may list several endpoints. Each call goes to the healthy endpoint
+with the best score (EWMA latency plus an error penalty, see health.py); if
+it has not answered within its recent p95 latency for that kind of call
+(method and batch size, see health.latency_class()), or fails, a duplicate
+goes to the runner-up and the first good answer wins (hedged request).
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers.rpc import HTTPProvider
+
+from .health import CLOSED, CircuitOpenError, EndpointHealth, endpoint_health, latency_class
+from .instrumentation import batch_name, record, submit
+from .metrics import RPC_HEDGES
+from .ratelimit import RATE_LIMIT_RETRIES, bucket, retry_after
+from .rpc_cache import RPCResponseCache, block_of, finality_depth, is_cacheable
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive connections per chain in this worker process. Size it to the
+# number of threads a worker can run concurrently (fan-out + scan pools).
+RPC_POOL_MAXSIZE = int(os.getenv("RPC_POOL_MAXSIZE", "16"))
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+# How long a connectivity check result is trusted before re-probing the node.
+RPC_CONNECTIVITY_TTL = float(os.getenv("RPC_CONNECTIVITY_TTL", "30"))
+# How long the chain tip used for finality decisions is trusted.
+RPC_TIP_TTL = float(os.getenv("RPC_TIP_TTL", "5"))
+# Block-scan chunks fetched in parallel per request, unless RPC_ENDPOINTS sets
+# "scan_concurrency" for the chain.
+RPC_SCAN_CONCURRENCY = int(os.getenv("RPC_SCAN_CONCURRENCY", "4"))
+# Calls per second (a batch costs one per member) and burst allowed per RPC
+# endpoint across all workers, unless RPC_ENDPOINTS sets "rate_limit" /
+# "rate_burst"; 0 = unlimited.
+RPC_RATE_LIMIT = float(os.getenv("RPC_RATE_LIMIT", "0"))
+RPC_RATE_BURST = float(os.getenv("RPC_RATE_BURST", "0")) or None
+# Hedged requests on chains with several endpoints: the duplicate is sent once
+# the primary has been silent for its p95 latency on that kind of call (at least
+# RPC_HEDGE_MIN_DELAY seconds; RPC_HEDGE_DEFAULT_DELAY until enough were timed).
+RPC_HEDGE = os.getenv("RPC_HEDGE", "1") != "0"
+RPC_HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05"))
+RPC_HEDGE_DEFAULT_DELAY = float(os.getenv("RPC_HEDGE_DEFAULT_DELAY", "0.5"))
+# Threads running hedged calls per multi-endpoint chain in this worker. A call
+# is only handed to the pool when a thread is free (no queueing behind other
+# calls); when it is full the call runs on the caller's thread, unhedged.
+RPC_HEDGE_MAX_WORKERS = int(os.getenv("RPC_HEDGE_MAX_WORKERS", "16"))
+# Score penalty (ms) of an endpoint whose recent calls all failed.
+RPC_ERROR_PENALTY_MS = float(os.getenv("RPC_ERROR_PENALTY_MS", "2000"))
+# Share of calls sent to another healthy endpoint first, so its score stays current.
+RPC_EXPLORE_RATE = float(os.getenv("RPC_EXPLORE_RATE", "0.02"))
+
+# chain -> (head block, monotonic time it was seen) published by chain followers
+_followed_tips: Dict[str, Tuple[int, float]] = {}
+
+
+def note_tip(chain_name: str, block: int):
+    """Publish a chain head read by a follower (see follower.py) to every client of the chain."""
+    _followed_tips[chain_name] = (block, time.monotonic())
+
+
+def followed_tip(chain_name: str, max_age: float = RPC_TIP_TTL) -> Optional[int]:
+    """The followed head of a chain if it was read within max_age seconds, else None."""
+    seen = _followed_tips.get(chain_name)
+    if seen is None or time.monotonic() - seen[1] >= max_age:
+        return None
+    return seen[0]
+
+
+class HedgePool:
+    """
+    Thread pool for hedged calls that never queues: try_submit() only accepts
+    a call while one of its threads is free, so waiting on it for the hedge
+    delay measures the endpoint rather than the pool's backlog.
+    """
+
+    def __init__(self, name: str, max_workers: int = RPC_HEDGE_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"rpc-hedge-{name}")
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+    def try_submit(self, fn, *args) -> Optional[Future]:
+        """Future of fn(*args) running on a free thread, or None if all threads are busy."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            return submit(self._executor, self._run, fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _run(self, fn, *args):
+        # the slot is free again before the future resolves
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+
+def endpoint_urls(value: Union[None, str, Sequence[str]]) -> List[str]:
+    """RPC URLs from a URL, a comma-separated list of URLs or a list of URLs."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [url.strip() for url in value if url and url.strip()]
+
+
+def endpoint_config(endpoint: Any) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Split an RPC_ENDPOINTS value into (urls, options). Values are either
+    URLs (see endpoint_urls) or a dict {"url": <URLs>, "scan_concurrency": ...,
+    "rate_limit": ..., "rate_burst": ...}.
+    """
+    if isinstance(endpoint, dict):
+        options = dict(endpoint)
+        return endpoint_urls(options.pop("url", None)), options
+    return endpoint_urls(endpoint), {}
+
+
+class Endpoint:
+    """One URL of a chain with its rate limiter and health (both shared per URL)."""
+
+    def __init__(self, label: str, url: str, rate_limit: float, rate_burst: Optional[float]):
+        self.label = label
+        self.url = url
+        self.limiter = bucket(f"rpc:{label}", url, rate_limit, rate_burst)
+        self.health: EndpointHealth = endpoint_health(label, url)
+
+    def score(self) -> float:
+        """Lower is better: EWMA latency (0 while unmeasured) plus the error penalty."""
+        latency = self.health.latency_ms
+        return (latency if latency is not None else 0.0) + self.health.error_rate * RPC_ERROR_PENALTY_MS
+
+    def hedge_delay(self, kind: str) -> float:
+        """Seconds to wait for this endpoint before hedging: its recent p95 latency for the latency class."""
+        p95 = self.health.latency_percentile(95, kind)
+        if p95 is None:
+            return RPC_HEDGE_DEFAULT_DELAY
+        return max(RPC_HEDGE_MIN_DELAY, p95 / 1000.0)
+
+
+def build_endpoints(chain_name: str, urls: Sequence[str], rate_limit: float,
+                    rate_burst: Optional[float]) -> List[Endpoint]:
+    """Endpoints of a chain, labelled by the chain name (plus position and host when there are several)."""
+    if len(urls) == 1:
+        return [Endpoint(chain_name, urls[0], rate_limit, rate_burst)]
+    return [Endpoint(f"{chain_name} #{i} ({urlparse(url).hostname})", url, rate_limit, rate_burst)
+            for i, url in enumerate(urls, 1)]
+
+
+def rank(endpoints: Sequence[Endpoint]) -> List[Endpoint]:
+    """Endpoints with a closed circuit, best score first (now and then a random other one first)."""
+    healthy = sorted((e for e in endpoints if e.health.state == CLOSED), key=Endpoint.score)
+    if len(healthy) > 1 and random.random() < RPC_EXPLORE_RATE:
+        healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+    return healthy
+
+
+class RPCError(Exception):
+    """JSON-RPC level error returned by a node (HTTP succeeded)."""
+
+    def __init__(self, method: str, error: Any):
+        self.method = method
+        self.error = error
+        message = error.get("message") if isinstance(error, dict) else str(error)
+        super().__init__(f"{method}: {message}")
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """HTTPProvider that sends every request through its owning ChainClient."""
+
+    def __init__(self, client: "ChainClient"):
+        super().__init__(client.rpc_url, session=client.session, request_kwargs={"timeout": client.timeout})
+        self._client = client
+
+    def make_request(self, method, params):
+        return self._client.send(method, params)
+
+    def make_batch_request(self, batch_requests):
+        return self._client.send_batch(batch_requests)
+
+
+class ChainClient:
+    """Pooled JSON-RPC client for one chain, shared by all requests in a worker."""
+
+    def __init__(self, chain_name: str, rpc_url: Union[str, Sequence[str]], pool_maxsize: int = RPC_POOL_MAXSIZE,
+                 timeout: float = RPC_TIMEOUT, connectivity_ttl: float = RPC_CONNECTIVITY_TTL,
+                 cache: Optional[RPCResponseCache] = None, scan_concurrency: int = RPC_SCAN_CONCURRENCY,
+                 rate_limit: float = RPC_RATE_LIMIT, rate_burst: Optional[float] = RPC_RATE_BURST):
+        self.chain_name = chain_name
+        # rate limiters and health are shared with the async client and (limiters) other workers
+        self.endpoints = build_endpoints(chain_name, endpoint_urls(rpc_url), rate_limit, rate_burst)
+        self.rpc_url = self.endpoints[0].url
+        self.timeout = timeout
+        self.scan_concurrency = max(1, scan_concurrency)
+        self.connectivity_ttl = connectivity_ttl
+        self.cache = cache
+        self.finality_depth = finality_depth(chain_name)
+
+        # one keep-alive pool per endpoint
+        self._sessions: Dict[str, requests.Session] = {}
+        self._adapters: List[HTTPAdapter] = []
+        for endpoint in self.endpoints:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sessions[endpoint.url] = session
+            self._adapters.append(adapter)
+        self.session = self._sessions[self.rpc_url]
+        self.pool_maxsize = pool_maxsize
+        self._hedge_pool = HedgePool(chain_name) if len(self.endpoints) > 1 else None
+
+        self.w3 = Web3(PooledHTTPProvider(self))
+
+        self._lock = threading.Lock()
+        self._connected: Optional[bool] = None
+        self._connected_at = 0.0
+        self._tip: Optional[int] = None
+        self._tip_at = 0.0
+        self._stats = {
+            "requests": 0,
+            "batch_requests": 0,
+            "errors": 0,
+            "request_ms_total": 0.0,
+            "connectivity_probes": 0,
+            "connectivity_cache_hits": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+
+    # -------------------- transport --------------------
+    def throttled(self, retry_after: Optional[float] = None) -> bool:
+        """A JSON-RPC answer said "rate limited" (HTTP 429s are handled in _post_to): hold back the endpoint
+        calls go to first. False when it has no rate limiter, so there is nothing to wait for."""
+        ranked = rank(self.endpoints) or self.endpoints
+        limiter = ranked[0].limiter
+        limiter.throttled(retry_after)
+        return limiter.enabled
+
+    def _post(self, data: bytes, methods: List[str]) -> Any:
+        """POST an encoded JSON-RPC payload (carrying `methods`) and return the decoded JSON body.
+        Goes to the best healthy endpoint, hedged to the runner-up (see module docstring); fails fast
+        with CircuitOpenError while every endpoint's circuit is open."""
+        ranked = rank(self.endpoints)
+        if not ranked:
+            for endpoint in self.endpoints:
+                endpoint.health.allow()  # counts the fast failure
+            raise CircuitOpenError(self.chain_name)
+        if len(ranked) == 1 or not RPC_HEDGE or self._hedge_pool is None:
+            return self._post_to(ranked[0], data, methods)
+        return self._post_hedged(ranked[0], ranked[1], data, methods)
+
+    def _post_hedged(self, primary: Endpoint, runner_up: Endpoint, data: bytes, methods: List[str]) -> Any:
+        """First good answer of primary and (after primary.hedge_delay(), or at once if it fails) runner_up.
+        While the chain's hedge pool is full the primary runs on this thread, with failover but no hedge."""
+        first = self._hedge_pool.try_submit(self._post_to, primary, data, methods)
+        if first is None:
+            RPC_HEDGES.inc(chain=self.chain_name, outcome="pool_full")
+            return self._failover(lambda: self._post_to(primary, data, methods), primary, runner_up, data, methods)
+        wait([first], timeout=primary.hedge_delay(latency_class(methods)))
+        if first.done():
+            return self._failover(first.result, primary, runner_up, data, methods)
+        second = self._hedge_pool.try_submit(self._post_to, runner_up, data, methods)
+        if second is None:
+            # no free thread for the duplicate: wait for the primary after all
+            RPC_HEDGES.inc(chain=self.chain_name, outcome="pool_full")
+            return self._failover(first.result, primary, runner_up, data, methods)
+        with self._lock:
+            self._stats["hedged"] += 1
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is second:
+                    with self._lock:
+                        self._stats["hedge_wins"] += 1
+                RPC_HEDGES.inc(chain=self.chain_name, outcome="hedge_won" if future is second else "primary_won")
+                # the loser finishes in the background and still updates its endpoint's score
+                return future.result()
+        RPC_HEDGES.inc(chain=self.chain_name, outcome="both_failed")
+        raise error
+
+    def _failover(self, attempt: Callable[[], Any], primary: Endpoint, runner_up: Endpoint, data: bytes,
+                  methods: List[str]) -> Any:
+        """attempt() (the primary's answer), or the runner-up's if it fails."""
+        try:
+            return attempt()
+        except Exception as e:
+            logger.debug("%s failed, retrying on %s: %s", primary.label, runner_up.label, e)
+            RPC_HEDGES.inc(chain=self.chain_name, outcome="failover")
+            return self._post_to(runner_up, data, methods)
+
+    def _post_to(self, endpoint: Endpoint, data: bytes, methods: List[str]) -> Any:
+        """POST to one endpoint: fails fast while its circuit is open, waits for its rate limiter; a 429
+        answer is queued again up to RATE_LIMIT_RETRIES times."""
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            endpoint.health.check()
+            endpoint.limiter.acquire(len(methods))
+            try:
+                return self._post_once(endpoint, data, methods)
+            except requests.HTTPError as e:
+                if (e.response is None or e.response.status_code != 429 or attempt == RATE_LIMIT_RETRIES
+                        or not endpoint.limiter.enabled):
+                    raise
+                endpoint.limiter.throttled(retry_after(e.response.headers))
+
+    def _post_once(self, endpoint: Endpoint, data: bytes, methods: List[str]) -> Any:
+        started = time.perf_counter()
+        error = False
+        try:
+            r = self._sessions[endpoint.url].post(endpoint.url, data=data, timeout=self.timeout,
+                                                  headers={"Content-Type": "application/json"})
+            r.raise_for_status()
+            body = r.json()
+        except Exception as e:
+            error = True
+            with self._lock:
+                self._stats["errors"] += 1
+                if isinstance(e, requests.RequestException):
+                    # transport failure: re-probe instead of trusting the cached status
+                    self._connected = None
+            if not (isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 429):
+                endpoint.health.failure(e, (time.perf_counter() - started) * 1000.0)
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._stats["requests"] += 1
+                self._stats["request_ms_total"] += elapsed_ms
+            record("rpc", self.chain_name, batch_name(methods), elapsed_ms, len(methods), error)
+        endpoint.health.success(elapsed_ms, latency_class(methods))
+        return body
+
+    def _send_uncached(self, method: str, params: Any) -> Dict[str, Any]:
+        return self._post(self.w3.provider.encode_rpc_request(method, params), [method])
+
+    def _send_batch_uncached(self, calls: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._stats["batch_requests"] += 1
+        payload = [{"jsonrpc": "2.0", "method": m, "params": p, "id": i} for i, (m, p) in enumerate(calls)]
+        response = self._post(json.dumps(payload).encode("utf-8"), [m for m, _ in calls])
+        if not isinstance(response, list):
+            # node rejected the batch as a whole (single error object)
+            raise RPCError("batch", response.get("error") if isinstance(response, dict) else response)
+        by_id = {item.get("id"): item for item in response if isinstance(item, dict)}
+        return [by_id.get(i, {"id": i, "error": {"message": "missing batch response"}}) for i in range(len(calls))]
+
+    def _cache_lookup(self, method: str, params: Any) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        return self.cache.envelope(self.chain_name, method, params)
+
+    def _cache_store(self, method: str, params: Any, response: Dict[str, Any]):
+        if self.cache is None or "error" in response or not is_cacheable(method, params):
+            return
+        result = response.get("result")
+        block = block_of(method, result, params)
+        final = block is not None and block <= self.final_block(block)
+        self.cache.put(self.chain_name, method, params, result, final)
+
+    def send(self, method: str, params: Any) -> Dict[str, Any]:
+        """Send one JSON-RPC request (read-through cache) and return the response envelope."""
+        cached = self._cache_lookup(method, params)
+        if cached is not None:
+            return cached
+        response = self._send_uncached(method, params)
+        self._cache_store(method, params, response)
+        return response
+
+    def send_batch(self, calls: List[Tuple[str, Any]], fresh: bool = False) -> List[Dict[str, Any]]:
+        """Send a JSON-RPC batch and return the response envelopes in call order.
+        Cached calls are answered locally; only misses go to the node. fresh=True
+        asks the node for every call (the answers still replace cached entries)."""
+        if not calls:
+            return []
+        responses: List[Optional[Dict[str, Any]]] = [None if fresh else self._cache_lookup(m, p) for m, p in calls]
+        missing = [i for i, r in enumerate(responses) if r is None]
+        if missing:
+            fetched = self._send_batch_uncached([calls[i] for i in missing])
+            for i, response in zip(missing, fetched):
+                responses[i] = response
+                self._cache_store(calls[i][0], calls[i][1], response)
+        return responses
+
+    def request(self, method: str, params: Any) -> Any:
+        """Send one JSON-RPC request and return its result (raises RPCError)."""
+        response = self.send(method, params)
+        if "error" in response:
+            raise RPCError(method, response["error"])
+        return response.get("result")
+
+    # -------------------- chain tip / finality --------------------
+    def tip(self, max_age: float = RPC_TIP_TTL) -> int:
+        """Latest block number, reused for up to max_age seconds (a followed chain's head costs no call)."""
+        tip = followed_tip(self.chain_name, max_age)
+        if tip is None:
+            now = time.monotonic()
+            with self._lock:
+                if self._tip is not None and now - self._tip_at < max_age:
+                    return self._tip
+            tip = int(self.request("eth_blockNumber", []), 16)
+        with self._lock:
+            self._tip = max(tip, self._tip or 0)
+            self._tip_at = time.monotonic()
+            return self._tip
+
+    def final_block(self, block: Optional[int] = None) -> int:
+        """
+        Highest block treated as final. The tip is only re-read when `block`
+        lies above the last known horizon (blocks never become unfinal).
+        """
+        with self._lock:
+            known = self._tip
+        if known is not None and block is not None and block <= known - self.finality_depth:
+            return known - self.finality_depth
+        try:
+            return self.tip() - self.finality_depth
+        except Exception as e:
+            logger.debug("Could not read chain tip for %s: %s", self.chain_name, e)
+            return -1
+
+    # -------------------- connectivity --------------------
+    def is_connected(self) -> bool:
+        """Connectivity status, probed at most once per connectivity_ttl seconds (False while every circuit is open)."""
+        if not rank(self.endpoints):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self._connected is not None and now - self._connected_at < self.connectivity_ttl:
+                self._stats["connectivity_cache_hits"] += 1
+                return self._connected
+            self._stats["connectivity_probes"] += 1
+        try:
+            ok = bool(self.w3.is_connected())
+        except Exception as e:
+            logger.debug("Connectivity probe failed for %s: %s", self.chain_name, e)
+            ok = False
+        with self._lock:
+            self._connected = ok
+            self._connected_at = time.monotonic()
+        return ok
+
+    # -------------------- stats --------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["connected"] = self._connected
+        out["endpoints"] = [{"label": e.label, "circuit": e.health.state, "score": round(e.score(), 1)}
+                            for e in self.endpoints]
+        opened = 0
+        served = 0
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                opened += getattr(pool, "num_connections", 0)
+                served += getattr(pool, "num_requests", 0)
+        out["pool_maxsize"] = self.pool_maxsize
+        out["connections_opened"] = opened
+        # every request beyond the first on a connection skipped a TCP/TLS handshake
+        out["connections_reused"] = max(0, served - opened)
+        out["avg_request_ms"] = round(out["request_ms_total"] / out["requests"], 2) if out["requests"] else None
+        out["request_ms_total"] = round(out["request_ms_total"], 2)
+        return out
+
+
+class Web3ClientRegistry:
+    """Lazily built ChainClient per chain name, shared across the worker process."""
+
+    def __init__(self, endpoints: Dict[str, Any], cache: Optional[RPCResponseCache] = None):
+        self._endpoints = endpoints
+        self.cache = cache
+        self._clients: Dict[str, ChainClient] = {}
+        self._lock = threading.Lock()
+
+    def chains(self) -> List[str]:
+        return list(self._endpoints.keys())
+
+    def get(self, chain_name: Optional[str]) -> Optional[ChainClient]:
+        """Return the pooled client for a chain, or None if no RPC is configured."""
+        rpc, options = endpoint_config(self._endpoints.get(chain_name) if chain_name else None)
+        if not rpc:
+            return None
+        client = self._clients.get(chain_name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(chain_name)
+                if client is None:
+                    client = ChainClient(chain_name, rpc, cache=self.cache, **options)
+                    self._clients[chain_name] = client
+        return client
+
+    def connected(self, chain_name: Optional[str]) -> Optional[ChainClient]:
+        """Return the pooled client for a chain if its node is reachable, else None."""
+        client = self.get(chain_name)
+        if client is None:
+            return None
+        if not client.is_connected():
+            logger.debug("RPC not connected for %s", chain_name)
+            return None
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-chain pool statistics for the clients built so far in this worker."""
+        with self._lock:
+            clients = dict(self._clients)
+        return {name: client.stats() for name, client in clients.items()}
+
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+        return self.cache.stats() if self.cache is not None else None
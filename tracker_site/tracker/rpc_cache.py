@@ -0,0 +1,237 @@
+# tracker/rpc_cache.py
+"""
+Read-through cache for immutable JSON-RPC responses.
+
+Blocks, transactions and receipts below the finality depth never change, yet
+tx_search, download_tx_pdf_plain and the last10_from_tx scan re-downloaded
+them on every request. RPCResponseCache keys results by (chain, method,
+params): finalized results are kept permanently in a bounded in-memory LRU
+tier (Django LocMemCache) backed by an on-disk tier (FileBasedCache);
+unfinalized and null results only live in memory for a short TTL.
+The async clients use aenvelopes() / aput_many(): the memory tier is used
+in place and the disk tier on a worker thread, one hop per batch, so no
+file I/O runs on the event loop.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.core.cache import InvalidCacheBackendError, caches
+
+from .metrics import RPC_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Seconds an unfinalized (or null) result may be reused.
+RPC_CACHE_UNFINALIZED_TTL = int(os.getenv("RPC_CACHE_UNFINALIZED_TTL", "15"))
+
+# Blocks after which a block is treated as final (reorg-safe) per chain.
+FINALITY_DEPTH = {
+    "Ethereum Mainnet": 64,
+    "Sepolia Testnet": 64,
+    "Polygon Mainnet": 256,
+    "Binance Smart Chain": 15,
+}
+DEFAULT_FINALITY_DEPTH = int(os.getenv("RPC_FINALITY_DEPTH", "64"))
+
+# Methods whose response is fully determined by their params once final.
+CACHEABLE_METHODS = {
+    "eth_getBlockByNumber",
+    "eth_getBlockByHash",
+    "eth_getTransactionByHash",
+    "eth_getTransactionReceipt",
+    "eth_getTransactionCount",  # at an explicit block number (nonce bisection, nonces.py)
+}
+
+_MISS = object()
+
+
+def finality_depth(chain_name: str) -> int:
+    return FINALITY_DEPTH.get(chain_name, DEFAULT_FINALITY_DEPTH)
+
+
+def _explicit_block(tag: Any) -> Optional[int]:
+    if isinstance(tag, int):
+        return tag
+    return int(tag, 16) if isinstance(tag, str) and tag.startswith("0x") else None
+
+
+def block_of(method: str, result: Any, params: Any = None) -> Optional[int]:
+    """Block number that decides whether a result is final (None if unknown)."""
+    if method == "eth_getTransactionCount":
+        return _explicit_block(params[1]) if params and len(params) > 1 else None
+    if not isinstance(result, dict):
+        return None
+    field = "number" if method in ("eth_getBlockByNumber", "eth_getBlockByHash") else "blockNumber"
+    number = result.get(field)
+    if isinstance(number, str):
+        return int(number, 16)
+    return number if isinstance(number, int) else None
+
+
+def is_cacheable(method: str, params: Any) -> bool:
+    if method not in CACHEABLE_METHODS:
+        return False
+    if method == "eth_getBlockByNumber":
+        # only explicit numbers; tags like "latest" move
+        return _explicit_block(params[0] if params else None) is not None
+    if method == "eth_getTransactionCount":
+        return _explicit_block(params[1] if params and len(params) > 1 else None) is not None
+    return True
+
+
+def _envelope(result: Any) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+
+class RPCResponseCache:
+    """Two-tier (memory LRU + disk) cache of JSON-RPC results keyed by (chain, method, params)."""
+
+    def __init__(self, memory_alias: str = "rpc_memory", disk_alias: str = "rpc_disk"):
+        self.memory_alias = memory_alias
+        self.disk_alias = disk_alias
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored_final": 0, "stored_ttl": 0}
+
+    def _tier(self, alias: str):
+        try:
+            return caches[alias]
+        except InvalidCacheBackendError:
+            return None
+
+    @staticmethod
+    def key(chain_name: str, method: str, params: Any) -> str:
+        raw = json.dumps([chain_name, method, params], sort_keys=True, default=str)
+        return "rpc:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, chain_name: str, method: str, params: Any) -> Tuple[bool, Any]:
+        """Return (hit, result)."""
+        key = self.key(chain_name, method, params)
+        hit, value = self._get_memory(chain_name, key)
+        if not hit:
+            hit, value = self._get_disk(chain_name, key)
+        if not hit:
+            self._miss(chain_name)
+        return hit, value
+
+    def _get_memory(self, chain_name: str, key: str) -> Tuple[bool, Any]:
+        memory = self._tier(self.memory_alias)
+        if memory is not None:
+            value = memory.get(key, _MISS)
+            if value is not _MISS:
+                self._count("memory_hits")
+                RPC_CACHE_LOOKUPS.inc(chain=chain_name, result="memory")
+                return True, value
+        return False, None
+
+    def _get_disk(self, chain_name: str, key: str) -> Tuple[bool, Any]:
+        disk = self._tier(self.disk_alias)
+        if disk is not None:
+            try:
+                value = disk.get(key, _MISS)
+            except Exception as e:
+                logger.debug("RPC disk cache read failed: %s", e)
+                value = _MISS
+            if value is not _MISS:
+                self._count("disk_hits")
+                RPC_CACHE_LOOKUPS.inc(chain=chain_name, result="disk")
+                memory = self._tier(self.memory_alias)
+                if memory is not None:
+                    memory.set(key, value, timeout=None)  # disk only holds final results
+                return True, value
+        return False, None
+
+    def _miss(self, chain_name: str):
+        self._count("misses")
+        RPC_CACHE_LOOKUPS.inc(chain=chain_name, result="miss")
+
+    def envelope(self, chain_name: str, method: str, params: Any) -> Optional[Dict[str, Any]]:
+        """Cached result wrapped as a JSON-RPC response envelope, or None on a miss."""
+        if not is_cacheable(method, params):
+            return None
+        hit, result = self.get(chain_name, method, params)
+        if not hit:
+            return None
+        return _envelope(result)
+
+    async def aenvelopes(self, chain_name: str, calls: Sequence[Tuple[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """envelope() of every (method, params) call; memory misses are read from disk on a worker thread."""
+        envelopes: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        missing: List[Tuple[int, str]] = []
+        for i, (method, params) in enumerate(calls):
+            if not is_cacheable(method, params):
+                continue
+            key = self.key(chain_name, method, params)
+            hit, result = self._get_memory(chain_name, key)
+            if hit:
+                envelopes[i] = _envelope(result)
+            else:
+                missing.append((i, key))
+        if missing:
+            found = await sync_to_async(self._get_disk_many, thread_sensitive=False)(
+                chain_name, [key for _, key in missing])
+            for (i, _), (hit, result) in zip(missing, found):
+                envelopes[i] = _envelope(result) if hit else None
+        return envelopes
+
+    def _get_disk_many(self, chain_name: str, keys: List[str]) -> List[Tuple[bool, Any]]:
+        found = []
+        for key in keys:
+            hit, value = self._get_disk(chain_name, key)
+            if not hit:
+                self._miss(chain_name)
+            found.append((hit, value))
+        return found
+
+    def put(self, chain_name: str, method: str, params: Any, result: Any, final: bool):
+        """Store a result: final results permanently in both tiers, others briefly in memory."""
+        key = self.key(chain_name, method, params)
+        if self._put_memory(key, result, final):
+            self._put_disk(key, result)
+
+    async def aput_many(self, chain_name: str, entries: Sequence[Tuple[str, Any, Any, bool]]):
+        """put() of every (method, params, result, final); disk writes go to a worker thread."""
+        to_disk = []
+        for method, params, result, final in entries:
+            key = self.key(chain_name, method, params)
+            if self._put_memory(key, result, final):
+                to_disk.append((key, result))
+        if to_disk and self._tier(self.disk_alias) is not None:
+            await sync_to_async(self._put_disk_many, thread_sensitive=False)(to_disk)
+
+    def _put_memory(self, key: str, result: Any, final: bool) -> bool:
+        """Store in the memory tier; True if the result is final and belongs on disk too."""
+        memory = self._tier(self.memory_alias)
+        if final and result is not None:
+            if memory is not None:
+                memory.set(key, result, timeout=None)
+            self._count("stored_final")
+            return True
+        if memory is not None and RPC_CACHE_UNFINALIZED_TTL > 0:
+            memory.set(key, result, timeout=RPC_CACHE_UNFINALIZED_TTL)
+            self._count("stored_ttl")
+        return False
+
+    def _put_disk(self, key: str, result: Any):
+        disk = self._tier(self.disk_alias)
+        if disk is not None:
+            try:
+                disk.set(key, result, timeout=None)
+            except Exception as e:
+                logger.debug("RPC disk cache write failed: %s", e)
+
+    def _put_disk_many(self, entries: List[Tuple[str, Any]]):
+        for key, result in entries:
+            self._put_disk(key, result)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
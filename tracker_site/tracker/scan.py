@@ -0,0 +1,478 @@
+# tracker/scan.py
+"""
+Block iteration and wallet matching for the last10_from_tx backward scan.
+
+iter_blocks() yields (block_number, block) newest-first. With a batch size
+above 1 it sends eth_getBlockByNumber calls as JSON-RPC batches, so an
+8000-block scan costs 8000 / batch_size round trips instead of 8000. The
+caller simply stops iterating once it has enough matches; at most one batch
+of prefetched blocks is wasted.
+
+scan_wallet_txs() spreads the block budget over chunks scanned on a small
+per-request pool (scan_concurrency per chain in RPC_ENDPOINTS) and merges
+them in block order, so a sparse wallet costs about budget / (chunk *
+workers) sequential chunk times instead of one long serial walk.
+
+In "bloom" scan mode (LAST10_SCAN_MODE / LAST10_SCAN_MODES) blocks are read
+as headers first, SCAN_HEADER_BATCH_SIZE per batch, and only blocks whose
+logsBloom may mention the wallet are fetched with their transactions; the
+rest are yielded as empty blocks. See bloom.py for what the filter can miss.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from web3.datastructures import AttributeDict
+
+from .bloom import candidates, record_bloom
+from .instrumentation import submit
+from .lookup import Cancelled, check_cancelled
+from .records import TxRecord, to_record
+from .rpc import ChainClient, RPCError
+
+logger = logging.getLogger(__name__)
+
+# Blocks per JSON-RPC batch in the backward scan; 1 disables batching.
+SCAN_BATCH_SIZE = max(1, int(os.getenv("LAST10_SCAN_BATCH_SIZE", "25")))
+# Blocks per parallel scan chunk (each chunk is fetched in SCAN_BATCH_SIZE batches).
+SCAN_CHUNK_BLOCKS = int(os.getenv("LAST10_SCAN_CHUNK_BLOCKS", "100"))
+# Blocks a last10 request may scan on the node in total (spread across chunks).
+SCAN_BLOCK_BUDGET = int(os.getenv("LAST10_SCAN_BLOCK_BUDGET", "8000"))
+
+SCAN_MODES = ("full", "bloom")
+DEFAULT_SCAN_MODE = os.getenv("LAST10_SCAN_MODE", "full")
+# Per-chain overrides, e.g. "Ethereum Mainnet=bloom;Polygon Mainnet=bloom"
+CHAIN_SCAN_MODES: Dict[str, str] = dict(
+    item.split("=", 1) for item in os.getenv("LAST10_SCAN_MODES", "").split(";") if "=" in item)
+# Headers per JSON-RPC batch in bloom mode (headers are small; bodies still go SCAN_BATCH_SIZE at a time).
+SCAN_HEADER_BATCH_SIZE = int(os.getenv("LAST10_SCAN_HEADER_BATCH_SIZE", "100"))
+
+# progress(new_matches, current_block) callback for long scans
+Progress = Callable[[List[TxRecord], int], None]
+
+_INT_BLOCK_FIELDS = ("number", "timestamp")
+_INT_TX_FIELDS = ("blockNumber", "value", "gas", "gasPrice", "nonce", "transactionIndex")
+
+
+def _to_int(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith("0x"):
+        return int(value, 16)
+    return value
+
+
+def decode_raw_block(raw: Dict[str, Any]) -> AttributeDict:
+    """
+    Turn a raw eth_getBlockByNumber result into the same shape web3 returns
+    (AttributeDict with int quantities), so scan code handles both alike.
+    """
+    block = dict(raw)
+    for key in _INT_BLOCK_FIELDS:
+        if key in block:
+            block[key] = _to_int(block[key])
+    txs = []
+    for t in raw.get("transactions") or []:
+        if isinstance(t, dict):
+            t = dict(t)
+            for key in _INT_TX_FIELDS:
+                if key in t:
+                    t[key] = _to_int(t[key])
+            t = AttributeDict(t)
+        txs.append(t)
+    block["transactions"] = txs
+    return AttributeDict(block)
+
+
+def scan_mode(chain_name: str) -> str:
+    mode = CHAIN_SCAN_MODES.get(chain_name, DEFAULT_SCAN_MODE)
+    if mode not in SCAN_MODES:
+        logger.warning("Unknown scan mode %r for %s, using full", mode, chain_name)
+        return "full"
+    return mode
+
+
+def _empty_block(header: Dict[str, Any]) -> AttributeDict:
+    """A header standing in for a block the bloom ruled out (no transactions to match)."""
+    return AttributeDict({"number": _to_int(header.get("number")), "hash": header.get("hash"),
+                          "timestamp": _to_int(header.get("timestamp")), "transactions": []})
+
+
+def _iter_serial(client: ChainClient, start_block: int, stop_block: int) -> Iterator[Tuple[int, Optional[Any]]]:
+    for block_num in range(start_block, stop_block - 1, -1):
+        try:
+            yield block_num, client.w3.eth.get_block(block_num, full_transactions=True)
+        except Exception as e:
+            logger.debug("Could not fetch block %s: %s", block_num, e)
+            yield block_num, None
+
+
+def _iter_batched(client: ChainClient, start_block: int, stop_block: int,
+                  batch_size: int) -> Iterator[Tuple[int, Optional[Any]]]:
+    hi = start_block
+    while hi >= stop_block:
+        lo = max(stop_block, hi - batch_size + 1)
+        numbers = list(range(hi, lo - 1, -1))
+        try:
+            responses = client.send_batch([("eth_getBlockByNumber", [hex(n), True]) for n in numbers])
+        except RPCError as e:
+            # node does not accept batches: finish the range one block at a time
+            logger.info("Batch block fetch rejected on %s (%s); falling back to serial scan", client.chain_name, e)
+            yield from _iter_serial(client, hi, stop_block)
+            return
+        except Exception as e:
+            logger.debug("Could not fetch blocks %s..%s: %s", lo, hi, e)
+            responses = [{} for _ in numbers]
+        for block_num, response in zip(numbers, responses):
+            raw = response.get("result")
+            if not raw:
+                logger.debug("Could not fetch block %s: %s", block_num, response.get("error"))
+                yield block_num, None
+                continue
+            yield block_num, decode_raw_block(raw)
+        hi = lo - 1
+
+
+def _bloom_outcome(client, wallet: str, bodies: Dict[int, Optional[Any]], headers: int):
+    hits = sum(1 for n, block in bodies.items() if block is not None and wallet_txs_in_block(block, n, wallet))
+    fetched = sum(1 for block in bodies.values() if block is not None)
+    record_bloom(client.chain_name, headers - len(bodies), hits, fetched - hits)
+
+
+def _iter_bloom(client: ChainClient, start_block: int, stop_block: int, batch_size: int,
+                wallet: str) -> Iterator[Tuple[int, Optional[Any]]]:
+    hi = start_block
+    while hi >= stop_block:
+        lo = max(stop_block, hi - SCAN_HEADER_BATCH_SIZE + 1)
+        numbers = list(range(hi, lo - 1, -1))
+        try:
+            headers = client.send_batch([("eth_getBlockByNumber", [hex(n), False]) for n in numbers])
+        except RPCError as e:
+            logger.info("Batch header fetch rejected on %s (%s); falling back to full scan", client.chain_name, e)
+            yield from _iter_batched(client, hi, stop_block, batch_size)
+            return
+        except Exception as e:
+            logger.debug("Could not fetch headers %s..%s: %s", lo, hi, e)
+            headers = [{} for _ in numbers]
+        wanted = candidates(numbers, headers, wallet)
+        bodies: Dict[int, Optional[Any]] = {}
+        try:
+            for block_num, response in zip(numbers, headers):
+                header = response.get("result")
+                if not header:
+                    yield block_num, None
+                    continue
+                if block_num not in wanted:
+                    yield block_num, _empty_block(header)
+                    continue
+                if block_num not in bodies:
+                    # bodies of the next batch_size candidates, fetched as they are reached
+                    start = wanted.index(block_num)
+                    chunk = wanted[start:start + batch_size]
+                    bodies.update(zip(chunk, _fetch_bodies(client, chunk)))
+                yield block_num, bodies[block_num]
+        finally:
+            _bloom_outcome(client, wallet, bodies, sum(1 for r in headers if r.get("result")))
+        hi = lo - 1
+
+
+def _fetch_bodies(client: ChainClient, numbers: List[int]) -> List[Optional[Any]]:
+    try:
+        responses = client.send_batch([("eth_getBlockByNumber", [hex(n), True]) for n in numbers])
+    except Exception as e:
+        logger.debug("Could not fetch candidate blocks %s: %s", numbers, e)
+        return [None for _ in numbers]
+    return [decode_raw_block(r["result"]) if r.get("result") else None for r in responses]
+
+
+def iter_blocks(client: ChainClient, start_block: int, max_blocks: int, batch_size: int = SCAN_BATCH_SIZE,
+                wallet: Optional[str] = None, mode: str = "full") -> Iterator[Tuple[int, Optional[Any]]]:
+    """
+    Yield (block_number, block) from start_block backwards, at most max_blocks.
+    block is None when it could not be fetched; blocks carry full transactions.
+    In "bloom" mode (needs wallet) blocks whose header rules the wallet out
+    come without transactions.
+    """
+    stop_block = max(0, start_block - max_blocks + 1)
+    if start_block < stop_block:
+        return
+    if mode == "bloom" and wallet:
+        yield from _iter_bloom(client, start_block, stop_block, max(1, batch_size), wallet)
+    elif batch_size <= 1:
+        yield from _iter_serial(client, start_block, stop_block)
+    else:
+        yield from _iter_batched(client, start_block, stop_block, batch_size)
+
+
+def wallet_txs_in_block(block: Any, block_num: int, wallet: str) -> List[TxRecord]:
+    """Return TxRecords for every tx in a full block sent or received by wallet."""
+    wallet = wallet.lower()
+    block_ts = block.get("timestamp")
+    matches = []
+    for t in (block.get("transactions") or []):
+        t_from = t.get("from")
+        if not t_from:
+            continue
+        if t_from.lower() != wallet and (t.get("to") or "").lower() != wallet:
+            continue
+        matches.append(to_record(t, block_num, block_ts))
+    return matches
+
+
+class ScanResult(NamedTuple):
+    matches: List[TxRecord]        # newest first
+    lowest_block: Optional[int]    # lowest block attempted (None if nothing scanned)
+    failed_blocks: List[int]       # blocks that could not be fetched
+
+
+def _scan_serial(client: ChainClient, wallet: str, start_block: int, max_blocks: int, limit: int,
+                 batch_size: int, progress: Optional[Progress], mode: str = "full",
+                 cancelled: Optional[threading.Event] = None) -> ScanResult:
+    matches: List[TxRecord] = []
+    lowest = None
+    failed = []
+    for block_num, block in iter_blocks(client, start_block, max_blocks, batch_size, wallet, mode):
+        if cancelled is not None and cancelled.is_set():
+            break
+        lowest = block_num
+        if block is None:
+            failed.append(block_num)
+            continue
+        found = wallet_txs_in_block(block, block_num, wallet)
+        matches.extend(found)
+        if progress is not None and (found or (start_block - block_num + 1) % max(1, batch_size) == 0):
+            progress(found, block_num)
+        if len(matches) >= limit:
+            break
+    return ScanResult(matches, lowest, failed)
+
+
+def _chunks(start_block: int, max_blocks: int, chunk_blocks: int) -> List[Tuple[int, int]]:
+    """(hi, lo) block chunks covering the scan budget, newest first."""
+    stop_block = max(0, start_block - max_blocks + 1)
+    return [(hi, max(stop_block, hi - chunk_blocks + 1)) for hi in range(start_block, stop_block - 1, -chunk_blocks)]
+
+
+def _scan_parallel(client: ChainClient, wallet: str, start_block: int, max_blocks: int, limit: int,
+                   batch_size: int, workers: int, chunk_blocks: int, progress: Optional[Progress],
+                   mode: str = "full", cancelled: Optional[threading.Event] = None) -> ScanResult:
+    chunks = _chunks(start_block, max_blocks, chunk_blocks)
+    finished = threading.Event()
+
+    def scan_chunk(hi: int, lo: int) -> Tuple[List[TxRecord], List[int]]:
+        chunk_matches: List[TxRecord] = []
+        chunk_failed = []
+        for block_num, block in iter_blocks(client, hi, hi - lo + 1, batch_size, wallet, mode):
+            check_cancelled(finished)
+            if cancelled is not None:
+                check_cancelled(cancelled)
+            if block is None:
+                chunk_failed.append(block_num)
+            else:
+                chunk_matches.extend(wallet_txs_in_block(block, block_num, wallet))
+        return chunk_matches, chunk_failed
+
+    matches: List[TxRecord] = []
+    lowest = None
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="block-scan")
+    futures: Dict[int, Future] = {}
+    submitted = 0
+    try:
+        for i, (_, lo) in enumerate(chunks):
+            # keep `workers` chunks in flight ahead of the one being merged
+            while submitted < len(chunks) and submitted < i + workers:
+                futures[submitted] = submit(executor, scan_chunk, *chunks[submitted])
+                submitted += 1
+            try:
+                chunk_matches, chunk_failed = futures.pop(i).result()
+            except Cancelled:
+                break  # the caller gave up: [lowest, start_block] is still complete
+            matches.extend(chunk_matches)
+            failed.extend(chunk_failed)
+            lowest = lo
+            if progress is not None:
+                progress(chunk_matches, lo)
+            if len(matches) >= limit:
+                break
+    finally:
+        # older chunks cannot change a satisfied newest-first result
+        finished.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return ScanResult(matches, lowest, failed)
+
+
+def scan_wallet_txs(client: ChainClient, wallet: str, start_block: int, max_blocks: int, limit: int,
+                    batch_size: int = SCAN_BATCH_SIZE, workers: Optional[int] = None,
+                    chunk_blocks: int = SCAN_CHUNK_BLOCKS, progress: Optional[Progress] = None,
+                    mode: Optional[str] = None, cancelled: Optional[threading.Event] = None) -> ScanResult:
+    """
+    Scan backwards from start_block for txs involving wallet, over a budget of
+    max_blocks blocks. The budget is split into chunk_blocks chunks scanned by
+    up to `workers` threads (default: the chain's scan_concurrency) and merged
+    newest-first; once `limit` matches are merged, chunks still in flight are
+    cancelled. Every match of the last merged block/chunk is kept so the
+    scanned range [lowest_block, start_block] is complete (callers may index it).
+
+    progress(new_matches, lowest_block_so_far) is called as the merged range
+    grows (per batch serially, per chunk in parallel), newest matches first.
+    mode is "full" or "bloom" (default: the chain's scan_mode()). Once
+    `cancelled` is set the scan stops early and returns the complete range
+    scanned so far (lowest_block None if nothing was).
+    """
+    workers = workers or getattr(client, "scan_concurrency", 1)
+    mode = mode or scan_mode(client.chain_name)
+    if workers <= 1 or max_blocks <= chunk_blocks:
+        return _scan_serial(client, wallet, start_block, max_blocks, limit, batch_size, progress, mode, cancelled)
+    return _scan_parallel(client, wallet, start_block, max_blocks, limit, batch_size, workers, chunk_blocks,
+                          progress, mode, cancelled)
+
+
+# -------------------- async (ASGI views) --------------------
+async def _afetch_bodies(client, numbers: List[int]) -> List[Optional[Any]]:
+    try:
+        responses = await client.send_batch([("eth_getBlockByNumber", [hex(n), True]) for n in numbers])
+    except Exception as e:
+        logger.debug("Could not fetch candidate blocks %s: %s", numbers, e)
+        return [None for _ in numbers]
+    return [decode_raw_block(r["result"]) if r.get("result") else None for r in responses]
+
+
+async def _aiter_bloom(client, start_block: int, stop_block: int, batch_size: int,
+                       wallet: str) -> AsyncIterator[Tuple[int, Optional[Any]]]:
+    hi = start_block
+    while hi >= stop_block:
+        lo = max(stop_block, hi - SCAN_HEADER_BATCH_SIZE + 1)
+        numbers = list(range(hi, lo - 1, -1))
+        try:
+            headers = await client.send_batch([("eth_getBlockByNumber", [hex(n), False]) for n in numbers])
+        except RPCError as e:
+            logger.info("Batch header fetch rejected on %s (%s); falling back to full scan", client.chain_name, e)
+            async for item in _aiter_batched(client, hi, stop_block, batch_size):
+                yield item
+            return
+        except Exception as e:
+            logger.debug("Could not fetch headers %s..%s: %s", lo, hi, e)
+            headers = [{} for _ in numbers]
+        wanted = candidates(numbers, headers, wallet)
+        bodies: Dict[int, Optional[Any]] = {}
+        try:
+            for block_num, response in zip(numbers, headers):
+                header = response.get("result")
+                if not header:
+                    yield block_num, None
+                    continue
+                if block_num not in wanted:
+                    yield block_num, _empty_block(header)
+                    continue
+                if block_num not in bodies:
+                    start = wanted.index(block_num)
+                    chunk = wanted[start:start + batch_size]
+                    bodies.update(zip(chunk, await _afetch_bodies(client, chunk)))
+                yield block_num, bodies[block_num]
+        finally:
+            _bloom_outcome(client, wallet, bodies, sum(1 for r in headers if r.get("result")))
+        hi = lo - 1
+
+
+async def aiter_blocks(client, start_block: int, max_blocks: int, batch_size: int = SCAN_BATCH_SIZE,
+                       wallet: Optional[str] = None, mode: str = "full") -> AsyncIterator[Tuple[int, Optional[Any]]]:
+    """Async iter_blocks() for an AsyncChainClient."""
+    stop_block = max(0, start_block - max_blocks + 1)
+    if start_block < stop_block:
+        return
+    if mode == "bloom" and wallet:
+        blocks = _aiter_bloom(client, start_block, stop_block, max(1, batch_size), wallet)
+    elif batch_size <= 1:
+        blocks = _aiter_serial(client, start_block, stop_block)
+    else:
+        blocks = _aiter_batched(client, start_block, stop_block, batch_size)
+    async for item in blocks:
+        yield item
+
+
+async def _aiter_serial(client, start_block: int, stop_block: int) -> AsyncIterator[Tuple[int, Optional[Any]]]:
+    for block_num in range(start_block, stop_block - 1, -1):
+        try:
+            raw = await client.request("eth_getBlockByNumber", [hex(block_num), True])
+        except Exception as e:
+            logger.debug("Could not fetch block %s: %s", block_num, e)
+            raw = None
+        yield block_num, (decode_raw_block(raw) if raw else None)
+
+
+async def _aiter_batched(client, start_block: int, stop_block: int,
+                         batch_size: int) -> AsyncIterator[Tuple[int, Optional[Any]]]:
+    hi = start_block
+    while hi >= stop_block:
+        lo = max(stop_block, hi - batch_size + 1)
+        numbers = list(range(hi, lo - 1, -1))
+        try:
+            responses = await client.send_batch([("eth_getBlockByNumber", [hex(n), True]) for n in numbers])
+        except RPCError as e:
+            # node does not accept batches: finish the range one block at a time
+            logger.info("Batch block fetch rejected on %s (%s); falling back to serial scan", client.chain_name, e)
+            async for item in _aiter_serial(client, hi, stop_block):
+                yield item
+            return
+        except Exception as e:
+            logger.debug("Could not fetch blocks %s..%s: %s", lo, hi, e)
+            responses = [{} for _ in numbers]
+        for block_num, response in zip(numbers, responses):
+            raw = response.get("result")
+            yield block_num, (decode_raw_block(raw) if raw else None)
+        hi = lo - 1
+
+
+async def _ascan_chunk(client, wallet: str, hi: int, lo: int, batch_size: int,
+                       mode: str = "full") -> Tuple[List[TxRecord], List[int]]:
+    chunk_matches: List[TxRecord] = []
+    chunk_failed = []
+    async for block_num, block in aiter_blocks(client, hi, hi - lo + 1, batch_size, wallet, mode):
+        if block is None:
+            chunk_failed.append(block_num)
+        else:
+            chunk_matches.extend(wallet_txs_in_block(block, block_num, wallet))
+    return chunk_matches, chunk_failed
+
+
+async def ascan_wallet_txs(client, wallet: str, start_block: int, max_blocks: int, limit: int,
+                           batch_size: int = SCAN_BATCH_SIZE, workers: Optional[int] = None,
+                           chunk_blocks: int = SCAN_CHUNK_BLOCKS, mode: Optional[str] = None) -> ScanResult:
+    """Async scan_wallet_txs() for an AsyncChainClient (chunks run as tasks)."""
+    workers = workers or getattr(client, "scan_concurrency", 1)
+    mode = mode or scan_mode(client.chain_name)
+    matches: List[TxRecord] = []
+    lowest = None
+    failed = []
+    if workers <= 1 or max_blocks <= chunk_blocks:
+        async for block_num, block in aiter_blocks(client, start_block, max_blocks, batch_size, wallet, mode):
+            lowest = block_num
+            if block is None:
+                failed.append(block_num)
+                continue
+            matches.extend(wallet_txs_in_block(block, block_num, wallet))
+            if len(matches) >= limit:
+                break
+        return ScanResult(matches, lowest, failed)
+
+    chunks = _chunks(start_block, max_blocks, chunk_blocks)
+    tasks: Dict[int, asyncio.Task] = {}
+    submitted = 0
+    try:
+        for i, (_, lo) in enumerate(chunks):
+            while submitted < len(chunks) and submitted < i + workers:
+                tasks[submitted] = asyncio.ensure_future(
+                    _ascan_chunk(client, wallet, *chunks[submitted], batch_size, mode))
+                submitted += 1
+            chunk_matches, chunk_failed = await tasks.pop(i)
+            matches.extend(chunk_matches)
+            failed.extend(chunk_failed)
+            lowest = lo
+            if len(matches) >= limit:
+                break
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return ScanResult(matches, lowest, failed)
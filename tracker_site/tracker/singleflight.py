@@ -0,0 +1,197 @@
+# tracker/singleflight.py
+"""
+Coalescing of identical concurrent calls.
+
+SingleFlight.do(key, fn) runs fn once per key at a time; callers arriving
+while it is in flight wait and share its result (or its exception).
+
+SharedFlight extends that to every worker process on the host: the
+in-process leader takes an flock() on a per-key lock file before running fn
+and publishes the result in the "singleflight" cache (file based) before
+releasing it. A worker that finds the lock taken waits for it and returns
+the published result instead of repeating the work; if the leader failed
+(nothing published) it runs fn itself, still holding the lock for the next
+waiter. Without fcntl or the "singleflight" cache it only coalesces within
+the process.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+from .instrumentation import record
+from .metrics import SINGLEFLIGHT_CALLS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_LOCK_DIR = Path(os.getenv("SINGLEFLIGHT_LOCK_DIR") or str(settings.RUNTIME_DIR / "singleflight-locks"))
+# Longest a worker waits for another worker's call before running fn itself.
+SINGLEFLIGHT_WAIT = float(os.getenv("SINGLEFLIGHT_WAIT", "60"))
+# A result another worker finished up to this many seconds before the call
+# arrived is still shared (0: only calls that were in flight).
+SINGLEFLIGHT_SHARE_WINDOW = float(os.getenv("SINGLEFLIGHT_SHARE_WINDOW", "1"))
+# Seconds between sweeps of idle lock files.
+SINGLEFLIGHT_SWEEP_INTERVAL = float(os.getenv("SINGLEFLIGHT_SWEEP_INTERVAL", "600"))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class SharedFlight:
+    """SingleFlight across worker processes (see module docstring); results must be picklable."""
+
+    def __init__(self, name: str, wait: float = SINGLEFLIGHT_WAIT, share_window: float = SINGLEFLIGHT_SHARE_WINDOW):
+        self.name = name
+        self.wait = wait
+        self.share_window = share_window
+        self._local = SingleFlight()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        led = []
+
+        def lead():
+            led.append(True)
+            return self._across_workers(key, fn)
+
+        result = self._local.do(key, lead)
+        if not led:
+            self._joined("process", started)
+        return result
+
+    def _joined(self, outcome: str, started: float):
+        SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome=outcome)
+        # shows in Server-Timing how long this request waited for somebody else's call
+        record("singleflight", self.name, outcome, (time.perf_counter() - started) * 1000.0)
+
+    def _across_workers(self, key: str, fn: Callable[[], Any]) -> Any:
+        store = _store()
+        if fcntl is None or store is None:
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome="leader")
+            return fn()
+        digest = hashlib.sha256(f"{self.name}\0{key}".encode()).hexdigest()[:40]
+        arrived, started = time.time(), time.perf_counter()
+        try:
+            SINGLEFLIGHT_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+            fd = os.open(SINGLEFLIGHT_LOCK_DIR / f"{digest}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.warning("Single-flight lock unavailable for %s: %s", self.name, e)
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome="leader")
+            return fn()
+        try:
+            if not _flock(fd, self.wait):
+                logger.info("Gave up waiting %.0fs for %s %s in another worker", self.wait, self.name, key)
+                SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome="wait_timeout")
+                return fn()
+            os.utime(fd)  # keeps the lock file from being swept
+            shared = store.get(digest)
+            if shared is not None and shared[0] >= arrived - self.share_window:
+                self._joined("worker", started)
+                return shared[1]
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome="leader")
+            result = fn()
+            try:
+                store.set(digest, (time.time(), result), timeout=max(60, int(self.share_window) + 1))
+            except Exception as e:  # unpicklable result, disk full: waiters run fn themselves
+                logger.warning("Could not share %s result: %s", self.name, e)
+            return result
+        finally:
+            os.close(fd)  # releases the flock
+            _sweep()
+
+
+def _flock(fd: int, timeout: float) -> bool:
+    """Exclusive flock() within timeout seconds (polling, backing off to 100 ms)."""
+    deadline = time.monotonic() + timeout
+    delay = 0.005
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+def _store():
+    """The cross-process result cache, or None if not configured."""
+    try:
+        return caches["singleflight"]
+    except InvalidCacheBackendError:
+        return None
+
+
+_swept_at = time.monotonic()
+_sweep_lock = threading.Lock()
+
+
+def _sweep():
+    """Delete lock files idle for SINGLEFLIGHT_SWEEP_INTERVAL (at most once per interval per process)."""
+    global _swept_at
+    with _sweep_lock:
+        if time.monotonic() - _swept_at < SINGLEFLIGHT_SWEEP_INTERVAL:
+            return
+        _swept_at = time.monotonic()
+    cutoff = time.time() - SINGLEFLIGHT_SWEEP_INTERVAL
+    for path in SINGLEFLIGHT_LOCK_DIR.glob("*.lock"):
+        try:
+            if path.stat().st_mtime >= cutoff:
+                continue
+            fd = os.open(path, os.O_RDWR)
+        except OSError:
+            continue
+        try:
+            # only unlocked files; a worker opening the file right now at worst duplicates one call
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            path.unlink()
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,1128 @@
+# tracker/tests.py
+"""
+Tests against the benchmark's fake chain (tracker/benchmark/fakes.py).
+
+FakeNode serves a deterministic FakeChain over local HTTP, so the lookups
+run through the real ChainClient and JSON-RPC code paths.
+Run with: python manage.py test tracker (from tracker_site/)
+"""
+import os
+import json
+import asyncio
+import time
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlparse
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from . import (chainmemo, explorer, follower, health, history, labels, lookup, metrics, ratelimit, rpc_cache, scan,
+               singleflight, transfers)
+from .benchmark.fakes import COUNTERPARTY, OTHER, WALLET, FakeChain, FakeExplorer, FakeNode, _FakeServer
+from .benchmark.runner import offline_stack
+from .health import latency_class
+from .models import AddressParticipation, IndexedRange, IndexedTransaction, TxChain
+from .nonces import sent_txs
+from .records import TxRecord
+from .rpc import ChainClient, Endpoint, HedgePool, RPCError, Web3ClientRegistry
+from .rpc_cache import RPCResponseCache, finality_depth
+from .async_rpc import AsyncChainClient, shared_session
+from .scan import ascan_wallet_txs, decode_raw_block, scan_wallet_txs
+from .txindex import _next_segment, collect_wallet_txs, covered_ranges, record_scan
+
+CHAIN = "Ethereum Mainnet"
+
+
+class FakeNodeMixin:
+    """A FakeNode per test class (cls.chain / cls.node / cls.rpc); calls are reset before each test."""
+
+    chain_args: dict = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.chain = FakeChain(**cls.chain_args)
+        cls.node = FakeNode(cls.chain).start()
+        # "client" would shadow the Django test client
+        cls.rpc = ChainClient(CHAIN, cls.node.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.node.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.node.take_calls()
+
+    def wallet_blocks(self, lo: int, hi: int):
+        return list(self.chain.wallet_blocks(lo, hi))
+
+
+# -------------------- tx index --------------------
+def _tx(block: int, i: int = 0, sender: str = WALLET, to: str = "0x" + "cd" * 20) -> TxRecord:
+    return TxRecord(FakeChain.tx_hash(block, i), sender, to, 10**17, 21000, block)
+
+
+class RecordScanTests(TestCase):
+    """Range merge / split bookkeeping of record_scan()."""
+
+    def test_records_range_and_participants(self):
+        record_scan(CHAIN, "0x" + WALLET[2:].upper(), [_tx(150), _tx(160)], 100, 200, [])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(100, 200)])
+        self.assertEqual(IndexedTransaction.objects.count(), 2)
+        self.assertEqual(AddressParticipation.objects.filter(address=WALLET).count(), 2)
+        self.assertEqual(AddressParticipation.objects.filter(address="0x" + "cd" * 20).count(), 2)
+
+    def test_ignores_matches_outside_the_range(self):
+        record_scan(CHAIN, WALLET, [_tx(99), _tx(150), _tx(201)], 100, 200, [])
+        self.assertEqual(list(IndexedTransaction.objects.values_list("block_number", flat=True)), [150])
+
+    def test_merges_overlapping_and_adjacent_ranges(self):
+        record_scan(CHAIN, WALLET, [], 100, 200, [])
+        record_scan(CHAIN, WALLET, [], 201, 300, [])
+        record_scan(CHAIN, WALLET, [], 50, 120, [])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(50, 300)])
+        record_scan(CHAIN, WALLET, [], 400, 500, [])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(400, 500), (50, 300)])
+        self.assertEqual(IndexedRange.objects.count(), 2)
+
+    def test_failed_blocks_split_the_range(self):
+        record_scan(CHAIN, WALLET, [], 100, 200, [150, 151, 200, 99, 150])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(152, 199), (100, 149)])
+        record_scan(CHAIN, WALLET, [], 100, 100, [100])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(152, 199), (100, 149)])
+        # a later scan that got the failed blocks closes the holes
+        record_scan(CHAIN, WALLET, [], 145, 210, [])
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(100, 210)])
+
+    def test_repeated_scan_does_not_duplicate_rows(self):
+        record_scan(CHAIN, WALLET, [_tx(150)], 100, 200, [])
+        record_scan(CHAIN, WALLET, [_tx(150)], 100, 200, [])
+        self.assertEqual(IndexedTransaction.objects.count(), 1)
+        self.assertEqual(AddressParticipation.objects.count(), 2)
+
+    def test_ranges_are_per_address_and_chain(self):
+        record_scan(CHAIN, WALLET, [], 100, 200, [])
+        self.assertEqual(covered_ranges(CHAIN, "0x" + "cd" * 20), [])
+        self.assertEqual(covered_ranges("Polygon Mainnet", WALLET), [])
+
+
+class NextSegmentTests(SimpleTestCase):
+    """_next_segment() plans over newest-first covered ranges."""
+
+    ranges = [(900, 1000), (500, 600)]
+
+    def test_inside_a_range_reads_the_index(self):
+        self.assertEqual(_next_segment(self.ranges, 950, 0), (True, 900))
+        self.assertEqual(_next_segment(self.ranges, 600, 0), (True, 500))
+
+    def test_floor_clips_an_indexed_segment(self):
+        self.assertEqual(_next_segment(self.ranges, 950, 920), (True, 920))
+
+    def test_gap_is_bounded_by_the_next_range_below(self):
+        self.assertEqual(_next_segment(self.ranges, 1200, 0), (False, 1001))
+        self.assertEqual(_next_segment(self.ranges, 899, 0), (False, 601))
+
+    def test_gap_below_all_ranges_runs_to_the_floor(self):
+        self.assertEqual(_next_segment(self.ranges, 499, 100), (False, 100))
+        self.assertEqual(_next_segment([], 499, 0), (False, 0))
+
+    def test_floor_above_the_range_below(self):
+        self.assertEqual(_next_segment(self.ranges, 899, 700), (False, 700))
+
+
+@mock.patch.object(follower, "FOLLOW_BLOCKS", 0)
+class CollectWalletTxsTests(FakeNodeMixin, TestCase):
+    """collect_wallet_txs() reads indexed ranges and scans only the gaps."""
+
+    chain_args = {"tip": 20000, "wallet_every": 97}
+
+    def test_first_lookup_scans_and_indexes(self):
+        found = collect_wallet_txs(self.rpc, WALLET, 5000, 2000, limit=100)
+        self.assertEqual([t.block for t in found], self.wallet_blocks(3001, 5000))
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 2000)
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(3001, 5000)])
+
+    def test_only_gaps_go_to_the_node(self):
+        collect_wallet_txs(self.rpc, WALLET, 4500, 500, limit=100)   # indexes [4001, 4500]
+        self.node.take_calls()
+        found = collect_wallet_txs(self.rpc, WALLET, 5000, 2000, limit=100)
+        self.assertEqual([t.block for t in found], self.wallet_blocks(3001, 5000))
+        # [4501, 5000] and [3001, 4000]
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 1500)
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(3001, 5000)])
+
+    def test_repeat_lookup_is_answered_from_the_index(self):
+        first = collect_wallet_txs(self.rpc, WALLET, 5000, 2000, limit=100)
+        self.node.take_calls()
+        again = collect_wallet_txs(self.rpc, WALLET, 5000, 2000, limit=100)
+        self.assertEqual([t.hash for t in again], [t.hash for t in first])
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 0)
+
+    def test_limit_stops_the_walk(self):
+        found = collect_wallet_txs(self.rpc, WALLET, 5000, 8000, limit=3)
+        self.assertEqual([t.block for t in found], self.wallet_blocks(0, 5000)[:3])
+        self.assertLess(self.node.take_calls()["eth_getBlockByNumber"], 500)
+
+    def test_bloom_mode_scans_are_not_indexed(self):
+        with mock.patch.object(scan, "DEFAULT_SCAN_MODE", "bloom"):
+            collect_wallet_txs(self.rpc, WALLET, 5000, 500, limit=100)
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [])
+
+    def test_blocks_near_the_tip_are_not_indexed(self):
+        collect_wallet_txs(self.rpc, WALLET, 20000, 100, limit=100)
+        self.assertEqual(covered_ranges(CHAIN, WALLET), [(19901, 20000 - 12)])
+
+
+# -------------------- block scan --------------------
+class ScanWalletTxsTests(FakeNodeMixin, SimpleTestCase):
+    """Ordering and early termination of scan_wallet_txs() (serial and chunked)."""
+
+    chain_args = {"tip": 20000, "wallet_every": 50}
+
+    def test_serial_scan_is_newest_first_and_stops_at_limit(self):
+        result = scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 5, batch_size=25, workers=1)
+        self.assertEqual([t.block for t in result.matches], [10000, 9950, 9900, 9850, 9800])
+        self.assertEqual(result.lowest_block, 9800)
+        self.assertEqual(result.failed_blocks, [])
+        # at most one batch read past the block that completed the limit
+        self.assertLessEqual(self.node.take_calls()["eth_getBlockByNumber"], 201 + 25)
+
+    def test_unbatched_serial_scan_reports_progress(self):
+        seen = []
+        result = scan_wallet_txs(self.rpc, WALLET, 10000, 60, 10, batch_size=0, workers=1,
+                                 progress=lambda found, lowest: seen.append(lowest))
+        self.assertEqual([t.block for t in result.matches], [10000, 9950])
+        self.assertEqual(len(seen), 60)
+
+    def test_parallel_scan_matches_serial_order(self):
+        serial = scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 12, workers=1)
+        parallel = scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 12, workers=4, chunk_blocks=100)
+        blocks = [t.block for t in parallel.matches]
+        self.assertEqual(blocks, sorted(blocks, reverse=True))
+        self.assertEqual(blocks[:12], [t.block for t in serial.matches][:12])
+        self.assertLessEqual(parallel.lowest_block, serial.lowest_block)
+
+    def test_parallel_scan_stops_early(self):
+        scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 5, workers=4, chunk_blocks=100)
+        self.node.wait_idle(quiet=0.2)
+        # 3 chunks hold the 5 matches; in-flight chunks are cancelled, the other 75 never start
+        self.assertLess(self.node.take_calls()["eth_getBlockByNumber"], 1000)
+
+    def test_exhausted_budget_returns_what_it_found(self):
+        result = scan_wallet_txs(self.rpc, WALLET, 10000, 120, 10, workers=1)
+        self.assertEqual([t.block for t in result.matches], [10000, 9950, 9900])
+        self.assertEqual(result.lowest_block, 9881)
+
+    def test_cancelled_scan_returns_what_it_covered(self):
+        cancelled = threading.Event()
+
+        def progress(found, lowest):
+            if lowest <= 9900:
+                cancelled.set()
+
+        result = scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 100, batch_size=25, workers=1, progress=progress,
+                                 cancelled=cancelled)
+        self.assertEqual(result.lowest_block, 9900)
+        self.assertEqual([t.block for t in result.matches], [10000, 9950, 9900])
+        parallel = scan_wallet_txs(self.rpc, WALLET, 10000, 8000, 100, workers=4, cancelled=cancelled)
+        self.assertIsNone(parallel.lowest_block)
+
+    def test_blocks_past_the_tip_are_reported_failed(self):
+        result = scan_wallet_txs(self.rpc, WALLET, 20002, 10, 10, workers=1)
+        self.assertEqual(result.failed_blocks, [20002, 20001])
+        self.assertEqual([t.block for t in result.matches], [20000])
+
+
+class BatchRejectedScanTests(FakeNodeMixin, SimpleTestCase):
+    """Both scan paths finish one block at a time on a node that rejects batches."""
+
+    chain_args = {"tip": 2000, "wallet_every": 50}
+
+    def setUp(self):
+        super().setUp()
+        self.node.batches = False
+        self.addCleanup(setattr, self.node, "batches", True)
+
+    def test_sync_scan_falls_back_to_serial(self):
+        result = scan_wallet_txs(self.rpc, WALLET, 2000, 120, 10, batch_size=25, workers=1, mode="full")
+        self.assertEqual([t.block for t in result.matches], [2000, 1950, 1900])
+        self.assertEqual(result.failed_blocks, [])
+
+    def test_async_scan_falls_back_to_serial(self):
+        client = AsyncChainClient(CHAIN, self.node.url)
+
+        async def scan():
+            try:
+                return await ascan_wallet_txs(client, WALLET, 2000, 120, 10, batch_size=25, workers=1, mode="full")
+            finally:
+                await shared_session().close()
+
+        result = asyncio.run(scan())
+        self.assertEqual([t.block for t in result.matches], [2000, 1950, 1900])
+        self.assertEqual(result.failed_blocks, [])
+        calls = self.node.take_calls()
+        self.assertEqual(calls["batch_rejected"], 1)
+        self.assertEqual(calls["eth_getBlockByNumber"], 120)
+
+
+# -------------------- chain follower --------------------
+class BlockRingTests(SimpleTestCase):
+    chain = FakeChain(tip=100, wallet_every=3)
+
+    def ring_of(self, max_blocks: int, lo: int, hi: int) -> follower.BlockRing:
+        ring = follower.BlockRing(max_blocks)
+        for n in range(lo, hi + 1):
+            self.assertTrue(ring.push(decode_raw_block(self.chain.block(n, True))))
+        return ring
+
+    def test_evicts_oldest_at_capacity(self):
+        ring = self.ring_of(4, 0, 9)
+        self.assertEqual((ring.lowest, ring.highest, len(ring)), (6, 9, 4))
+        found = ring.scan(WALLET, 9, 0, 100)
+        self.assertEqual([tx.block for tx in found.matches], [9, 6])
+        self.assertEqual(found.lowest_block, 6)
+        # evicted blocks leave the address index too
+        self.assertEqual(len(ring._by_address[WALLET]), 2)
+        self.assertIsNone(ring.scan(WALLET, 5, 0, 100))
+
+    def test_rejects_block_that_does_not_link_up(self):
+        ring = self.ring_of(8, 0, 3)
+        forked = decode_raw_block(dict(self.chain.block(4, True), parentHash="0x" + "ab" * 32))
+        self.assertFalse(ring.push(forked))
+        self.assertFalse(ring.push(decode_raw_block(self.chain.block(5, True))))
+        self.assertEqual(ring.rewind(), 3)
+        self.assertEqual(ring.highest, 2)
+
+    def test_scan_returns_copies(self):
+        ring = self.ring_of(8, 0, 9)
+        first = ring.scan(WALLET, 9, 0, 100).matches[0]
+        first.source = "annotated"
+        again = ring.scan(WALLET, 9, 0, 100).matches[0]
+        self.assertIsNot(first, again)
+        self.assertEqual(again.hash, first.hash)
+        self.assertNotEqual(again.source, "annotated")
+
+
+class ChainFollowerTests(FakeNodeMixin, SimpleTestCase):
+    """Polls against a FakeNode whose newest blocks are replaced by a fork."""
+
+    chain_args = {"tip": 100, "wallet_every": 3}
+
+    def setUp(self):
+        super().setUp()
+        self.chain.tip = 100
+        # own chain name: poll() publishes its tip with note_tip()
+        self.follower = follower.ChainFollower(ChainClient("follower-test", self.node.url), blocks=8, batch_size=4)
+        self.follower.poll()
+        self.assertEqual((self.follower.ring.lowest, self.follower.ring.highest), (93, 100))
+
+    def fork_from(self, fork: int, tip: int):
+        """Blocks >= fork get new hashes (and their children new parentHashes); the chain grows to tip."""
+        real_block = FakeChain.block.__get__(self.chain)
+
+        def block(n, full):
+            found = real_block(n, full)
+            if n >= fork:
+                found["hash"] = "0x" + "f" * 8 + found["hash"][10:]
+            if n - 1 >= fork:
+                found["parentHash"] = "0x" + "f" * 8 + found["parentHash"][10:]
+            return found
+
+        self.chain.tip = tip
+        return mock.patch.object(self.chain, "block", block)
+
+    def ring_hashes(self):
+        return {b.number: b.hash for b in self.follower.ring._blocks}
+
+    def test_rewinds_to_the_fork_point(self):
+        with self.fork_from(98, 101):
+            self.follower.poll()
+        self.assertEqual(self.follower.reorgs, 3)
+        self.assertEqual((self.follower.ring.lowest, self.follower.ring.highest), (94, 101))
+        hashes = self.ring_hashes()
+        self.assertEqual(hashes[97], FakeChain.block_hash(97))
+        self.assertTrue(all(hashes[n].startswith("0xffffffff") for n in range(98, 102)))
+
+    @mock.patch.object(follower, "FOLLOW_MAX_REWINDS", 2)
+    def test_deep_reorg_continues_next_poll(self):
+        with self.fork_from(98, 101):
+            self.follower.poll()
+            self.assertEqual(self.follower.reorgs, 2)
+            self.assertEqual(self.follower.ring.highest, 98)
+            self.follower.poll()
+        self.assertEqual(self.follower.reorgs, 3)
+        self.assertEqual(self.follower.ring.highest, 101)
+        self.assertTrue(self.ring_hashes()[98].startswith("0xffffffff"))
+
+
+# -------------------- explorer paging --------------------
+def _row(block: int, i: int) -> dict:
+    return {"blockNumber": str(block), "hash": FakeChain.tx_hash(block, i)}
+
+
+class ExplorerWalkTests(SimpleTestCase):
+    """Boundary de-duplication of explorer._Walk across pages and window restarts."""
+
+    def page(self, rows):
+        return {"status": "1", "message": "OK", "result": rows}
+
+    def test_rows_repeated_at_a_page_boundary_are_dropped(self):
+        walk = explorer._Walk(WALLET, 0, 1000, 3, "desc")
+        first = walk.rows(self.page([_row(900, 0), _row(800, 1), _row(800, 0)]))
+        # the explorer shifted: the next page repeats one row of block 800
+        second = walk.rows(self.page([_row(800, 0), _row(800, 2), _row(700, 0)]))
+        self.assertEqual(len(first), 3)
+        self.assertEqual([r["hash"] for r in second], [FakeChain.tx_hash(800, 2), FakeChain.tx_hash(700, 0)])
+        self.assertEqual(walk.page, 3)
+
+    def test_window_restart_narrows_the_block_range(self):
+        with mock.patch.object(explorer, "EXPLORER_RESULT_WINDOW", 4):
+            walk = explorer._Walk(WALLET, 0, 1000, 2, "desc")
+            walk.rows(self.page([_row(900, 0), _row(850, 0)]))
+            walk.rows(self.page([_row(800, 0), _row(800, 1)]))
+        self.assertEqual((walk.page, walk.endblock), (1, 800))
+        self.assertEqual(walk.rows(self.page([_row(800, 0), _row(800, 1)])), [])
+        self.assertEqual(len(walk.rows(self.page([_row(700, 0)]))), 1)
+        self.assertTrue(walk.done)
+
+    def test_ascending_restart_moves_the_start_block(self):
+        with mock.patch.object(explorer, "EXPLORER_RESULT_WINDOW", 2):
+            walk = explorer._Walk(WALLET, 0, 1000, 2, "asc")
+            walk.rows(self.page([_row(100, 0), _row(200, 0)]))
+        self.assertEqual((walk.page, walk.startblock), (1, 200))
+
+    def test_no_transactions_ends_the_walk(self):
+        walk = explorer._Walk(WALLET, 0, 1000, 2, "desc")
+        self.assertEqual(walk.rows({"status": "0", "message": "No transactions found", "result": []}), [])
+        self.assertTrue(walk.done)
+
+    def test_error_status_raises(self):
+        walk = explorer._Walk(WALLET, 0, 1000, 2, "desc")
+        with self.assertRaises(explorer.ExplorerAPIError):
+            walk.rows({"status": "0", "message": "NOTOK", "result": "Invalid API Key"})
+
+    def test_walk_past_the_result_window_has_no_duplicates(self):
+        chain = FakeChain(tip=20000, wallet_every=97)
+        with FakeExplorer(chain) as fake, \
+                mock.patch.object(FakeExplorer, "result_window", 40), \
+                mock.patch.object(explorer, "EXPLORER_RESULT_WINDOW", 40), \
+                mock.patch.dict(explorer.EXPLORER_APIS[CHAIN], api_base=fake.url, rate_limit=0), \
+                mock.patch.dict(os.environ, {explorer.EXPLORER_APIS[CHAIN]["env_key"]: "test"}):
+            rows = list(explorer.iter_explorer_txs(CHAIN, WALLET, 10000, 20000, page_size=10))
+            calls = fake.take_calls()["txlist"]
+        self.assertEqual([int(r["blockNumber"]) for r in rows], list(chain.wallet_blocks(10000, 20000)))
+        self.assertGreater(calls, 10)
+
+
+# -------------------- token transfers --------------------
+class RateLimitedLogsNode(FakeNode):
+    """FakeNode whose first `refusals` getLogs calls are answered with Infura's -32005 "limit exceeded"."""
+
+    refusals = 0
+
+    def rpc_eth_getLogs(self, flt):
+        with self._lock:
+            refuse, self.refusals = self.refusals > 0, max(0, self.refusals - 1)
+        if refuse:
+            raise ValueError("limit exceeded")
+        return super().rpc_eth_getLogs(flt)
+
+
+@mock.patch.dict(transfers._spans, clear=True)
+class TokenTransfersTests(SimpleTestCase):
+    """getLogs refusals: too large shrinks the window, a rate limit waits and retries it."""
+
+    def test_error_wordings(self):
+        too_large = [
+            {"code": -32005, "message": "query returned more than 10000 results. Try with this block range "
+                                        "[0x1, 0x2]."},
+            {"code": -32602, "message": "Log response size exceeded. You can make eth_getLogs requests with up "
+                                        "to a 2K block range and no limit on the response size"},
+            {"code": -32614, "message": "eth_getLogs is limited to a 10,000 range"},
+            {"code": -32000, "message": "exceed maximum block range: 5000"},
+        ]
+        rate_limited = [
+            {"code": -32005, "message": "limit exceeded"},
+            {"code": -32005, "message": "daily request count exceeded, request rate limited"},
+            {"code": 429, "message": "Your app has exceeded its compute units per second capacity"},
+        ]
+        for error in too_large:
+            self.assertTrue(transfers._too_large(error), error)
+            self.assertFalse(transfers._rate_limited(error), error)
+        for error in rate_limited:
+            self.assertFalse(transfers._too_large(error), error)
+            self.assertTrue(transfers._rate_limited(error), error)
+
+    @mock.patch.object(ratelimit, "RATE_LIMIT_THROTTLE_PENALTY", 0.01)
+    def test_rate_limited_window_is_retried_at_the_same_span(self):
+        chain = FakeChain(tip=20000)
+        with tempfile.TemporaryDirectory() as directory, RateLimitedLogsNode(chain) as node, \
+                mock.patch.object(ratelimit, "RATE_LIMIT_DIR", Path(directory)):
+            node.refusals = 4  # two windows (a window is one batch of two getLogs)
+            client = ChainClient(CHAIN, node.url, rate_limit=1000)
+            found = transfers.token_transfers(client, WALLET, 20000, limit=5, max_blocks=4000)
+            self.assertTrue(found["complete"])
+            self.assertEqual(found["calls"], 3)
+            self.assertEqual(transfers._spans[CHAIN].bad, None)  # no window was refused as too large
+
+    def test_rate_limited_without_a_limiter_raises(self):
+        chain = FakeChain(tip=20000)
+        with RateLimitedLogsNode(chain) as node:
+            node.refusals = 100
+            with self.assertRaises(RPCError):
+                transfers.token_transfers(ChainClient(CHAIN, node.url), WALLET, 20000, limit=5)
+            # one batch (two getLogs), not a run of ever smaller windows
+            self.assertEqual(node.take_calls()["eth_getLogs"], 2)
+
+
+# -------------------- history race --------------------
+@mock.patch.object(follower, "FOLLOW_BLOCKS", 0)
+class HistoryRaceTests(TransactionTestCase):
+    """wallet_history() stops the node scan once the explorer has won the race or the caller has gone."""
+
+    def test_losing_node_scan_stops(self):
+        chain = FakeChain(tip=20000, wallet_every=5000)
+        # the explorer answers after the node scan is under way
+        with FakeNode(chain, latency=0.02) as node, FakeExplorer(chain, 0.3) as fake_explorer, \
+                offline_stack(node.url, fake_explorer.url):
+            found = history.wallet_history(ChainClient(CHAIN, node.url), WALLET, 20000, 20000, mode="race")
+            self.assertEqual(found.source, "explorer")
+            self.assertEqual([t.block for t in found.txs], [20000, 15000, 10000, 5000, 0])
+            node.wait_idle(quiet=0.3)
+            # the whole budget is 20000 blocks
+            self.assertLess(node.take_calls()["eth_getBlockByNumber"], 5000)
+
+
+    def test_node_first_scan_stops_when_cancelled(self):
+        chain = FakeChain(tip=20000, wallet_every=5000)
+        cancelled = threading.Event()
+        with FakeNode(chain, latency=0.02) as node, FakeExplorer(chain) as fake_explorer, \
+                offline_stack(node.url, fake_explorer.url):
+            found = history.wallet_history(ChainClient(CHAIN, node.url), WALLET, 19999, 20000, mode="node",
+                                           progress=lambda new, lowest: cancelled.set(), cancelled=cancelled)
+            self.assertEqual(found.txs, [])
+            self.assertLess(node.take_calls()["eth_getBlockByNumber"], 5000)
+            # the caller is gone: the explorer fallback is not asked either
+            self.assertEqual(fake_explorer.take_calls()["txlist"], 0)
+
+@mock.patch.object(follower, "FOLLOW_BLOCKS", 0)
+class Last10StreamTests(TransactionTestCase):
+    """The last10 stream's scan stops once the SSE client has gone."""
+
+    def test_disconnect_stops_the_scan(self):
+        chain = FakeChain(tip=20000, wallet_every=5000)
+        with FakeNode(chain, latency=0.02) as node, FakeExplorer(chain) as fake_explorer, \
+                offline_stack(node.url, fake_explorer.url, history_mode="node"):
+            response = self.client.get("/last10/stream/", {"q": chain.wallet_tx_hashes(1)[0]})
+            for chunk in response.streaming_content:
+                if chunk.startswith(b"event: progress"):
+                    break
+            response.close()
+            node.wait_idle(quiet=0.5)
+            # the budget is SCAN_BLOCK_BUDGET (8000) blocks; the explorer fallback is not asked either
+            self.assertLess(node.take_calls()["eth_getBlockByNumber"], 4000)
+            self.assertEqual(fake_explorer.take_calls()["txlist"], 0)
+
+
+# -------------------- endpoint health --------------------
+class LatencyClassTests(SimpleTestCase):
+    """Hedge thresholds are per method and batch size."""
+
+    def test_latency_classes(self):
+        self.assertEqual(latency_class(["eth_getTransactionByHash"]), "eth_getTransactionByHash")
+        self.assertEqual(latency_class(["eth_getBlockByNumber"] * 25), "eth_getBlockByNumber x32")
+        self.assertEqual(latency_class(["eth_getBlockByNumber"] * 32), "eth_getBlockByNumber x32")
+        self.assertEqual(latency_class(["eth_getBlockByNumber", "eth_getLogs"]), "batch x2")
+
+    def test_single_calls_and_batches_get_separate_thresholds(self):
+        endpoint = Endpoint("latency-test", "http://127.0.0.1:9/latency-test", 0, None)
+        single, batch = latency_class(["eth_getTransactionByHash"]), latency_class(["eth_getBlockByNumber"] * 100)
+        for _ in range(40):
+            endpoint.health.success(20.0, single)
+            endpoint.health.success(400.0, batch)
+        self.assertAlmostEqual(endpoint.hedge_delay(batch), 0.4)
+        self.assertLess(endpoint.hedge_delay(single), 0.1)
+        self.assertEqual(endpoint.health.status()["p95_ms"], {batch: 400.0, single: 20.0})
+
+
+class HedgePoolTests(SimpleTestCase):
+    """A full hedge pool turns calls away instead of queueing them."""
+
+    def test_full_pool_rejects_and_frees_slots(self):
+        pool = HedgePool("pool-test", max_workers=2)
+        release = threading.Event()
+        busy = [pool.try_submit(release.wait, 5) for _ in range(2)]
+        self.assertNotIn(None, busy)
+        self.assertIsNone(pool.try_submit(int))
+        release.set()
+        for future in busy:
+            future.result(timeout=5)
+        self.assertEqual(pool.try_submit(int, "7").result(timeout=5), 7)
+
+
+class ManualClock:
+    """Stands in for health.time: wall and perf clocks that only move when told to."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class BreakerTests(SimpleTestCase):
+    """EndpointHealth's closed -> open -> half-open -> closed cycle, with injected failures, probes and clock."""
+
+    def setUp(self):
+        super().setUp()
+        self.clock = ManualClock()
+        self.probes_scheduled = []  # cooldown of every probe timer started
+        for patcher in (mock.patch.object(health, "time", self.clock),
+                        mock.patch.object(health.EndpointHealth, "_schedule_probe",
+                                          lambda h: self.probes_scheduled.append(h.cooldown))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.health = health.EndpointHealth("breaker-test", "http://breaker.invalid", failure_threshold=3,
+                                            cooldown=5, max_cooldown=15)
+
+    def fail(self, times: int):
+        for _ in range(times):
+            self.health.failure(ConnectionError("down"), 10.0)
+            self.clock.advance(1)
+
+    def probe(self, answer: bool):
+        """Run the scheduled probe; the node answers it or not."""
+        response = mock.Mock(json=lambda: {"jsonrpc": "2.0", "id": 1, "result": "0x1"})
+        seen = []
+
+        def post(*args, **kwargs):
+            seen.append((self.health.state, self.health.allow()))
+            if not answer:
+                raise ConnectionError("still down")
+            return response
+
+        with mock.patch.object(health._probe_session, "post", post):
+            self.health.probe()
+        return seen
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.health.success(10.0, "eth_call")
+        self.fail(2)
+        self.assertEqual(self.health.state, health.CLOSED)
+        self.assertTrue(self.health.allow())
+        self.fail(1)
+        self.assertEqual(self.health.state, health.OPEN)
+        self.assertEqual(self.health.changed_at, self.clock.now - 1)
+        self.assertEqual(self.probes_scheduled, [5])
+
+    def test_open_breaker_fails_fast_and_counts(self):
+        self.fail(3)
+        self.assertFalse(self.health.allow())
+        self.assertFalse(self.health.allow())
+        with self.assertRaises(health.CircuitOpenError):
+            self.health.check()
+        self.assertEqual(self.health.rejected, 3)
+        self.assertEqual(self.health.failures, 3)
+
+    def test_probe_goes_half_open_then_closes(self):
+        self.fail(3)
+        self.clock.advance(5)
+        # requests stay rejected while the probe is out
+        self.assertEqual(self.probe(answer=True), [(health.HALF_OPEN, False)])
+        self.assertEqual(self.health.state, health.CLOSED)
+        self.assertEqual(self.health.changed_at, self.clock.now)
+        self.assertEqual((self.health.probes, self.health.consecutive_failures), (1, 0))
+        self.assertTrue(self.health.allow())
+        self.assertEqual(self.probes_scheduled, [5])
+
+    def test_failed_probes_double_the_cooldown_up_to_the_max(self):
+        self.fail(3)
+        for _ in range(3):
+            self.probe(answer=False)
+            self.assertEqual(self.health.state, health.OPEN)
+        self.assertEqual(self.probes_scheduled, [5, 10, 15, 15])
+        self.assertTrue(self.health.last_error.startswith("probe ConnectionError"))
+        self.probe(answer=True)
+        self.assertEqual(self.health.state, health.CLOSED)
+        # the next opening starts from the base cool-down again
+        self.fail(3)
+        self.assertEqual(self.probes_scheduled[-1], 5)
+
+    def test_probe_only_runs_while_open(self):
+        self.assertEqual(self.probe(answer=True), [])
+        self.assertEqual((self.health.state, self.health.probes), (health.CLOSED, 0))
+
+
+class OpenCircuitClientTests(FakeNodeMixin, SimpleTestCase):
+    """ChainClient fails fast with CircuitOpenError while every endpoint's breaker is open."""
+
+    def test_all_endpoints_open(self):
+        client = ChainClient("breaker-client-test", [self.node.url, "http://127.0.0.1:9/breaker-client-test"])
+        with mock.patch.object(health.EndpointHealth, "_schedule_probe"):
+            for endpoint in client.endpoints:
+                for _ in range(endpoint.health.failure_threshold):
+                    endpoint.health.failure(ConnectionError("down"))
+        self.addCleanup(self.close_breakers, client)
+        with self.assertRaises(health.CircuitOpenError):
+            client.request("eth_blockNumber", [])
+        self.assertEqual([e.health.rejected for e in client.endpoints], [1, 1])
+        self.assertFalse(self.node.take_calls())
+
+    @staticmethod
+    def close_breakers(client):
+        # breakers are shared per URL with the other tests on this node
+        for endpoint in client.endpoints:
+            endpoint.health.state, endpoint.health.consecutive_failures = health.CLOSED, 0
+
+
+# -------------------- rpc cache --------------------
+class RPCResponseCacheTests(FakeNodeMixin, SimpleTestCase):
+    """Final results go to both tiers, unfinal ones only briefly to memory; disk hits refill memory."""
+
+    chain_args = {"tip": 20000}
+
+    def setUp(self):
+        super().setUp()
+        disk_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "rpc_memory": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rpc-cache-test"},
+            "rpc_disk": {"BACKEND": "tracker.disk_cache.PeriodicCullFileBasedCache", "LOCATION": disk_dir},
+        }))
+        caches["rpc_memory"].clear()
+        self.cache = RPCResponseCache()
+        self.cached_rpc = ChainClient(CHAIN, self.node.url, cache=self.cache)
+
+    def get_block(self, n: int):
+        return self.cached_rpc.request("eth_getBlockByNumber", [hex(n), False])
+
+    def stored(self, alias: str, n: int) -> bool:
+        key = RPCResponseCache.key(CHAIN, "eth_getBlockByNumber", [hex(n), False])
+        return caches[alias].get(key) is not None
+
+    def test_only_final_blocks_reach_disk(self):
+        final, recent = 20000 - finality_depth(CHAIN) - 1, 19990
+        self.get_block(final)
+        self.get_block(recent)
+        self.assertEqual([self.stored("rpc_disk", n) for n in (final, recent)], [True, False])
+        self.assertEqual([self.stored("rpc_memory", n) for n in (final, recent)], [True, True])
+        self.assertEqual(self.cache.stats()["stored_final"], 1)
+        self.assertEqual(self.cache.stats()["stored_ttl"], 1)
+        self.node.take_calls()
+        self.get_block(final)
+        self.get_block(recent)  # within RPC_CACHE_UNFINALIZED_TTL
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 0)
+
+    @mock.patch.object(rpc_cache, "RPC_CACHE_UNFINALIZED_TTL", 0)
+    def test_unfinal_blocks_are_not_kept_without_ttl(self):
+        self.get_block(19990)
+        self.get_block(19990)
+        self.assertFalse(self.stored("rpc_memory", 19990))
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 2)
+
+    def test_memory_miss_falls_through_to_disk(self):
+        self.get_block(1000)
+        caches["rpc_memory"].clear()  # evicted from the LRU tier
+        self.node.take_calls()
+        self.assertEqual(self.get_block(1000)["hash"], FakeChain.block_hash(1000))
+        self.assertEqual(self.cache.stats()["disk_hits"], 1)
+        self.assertTrue(self.stored("rpc_memory", 1000))
+        self.get_block(1000)
+        self.assertEqual(self.cache.stats()["disk_hits"], 1)
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 0)
+
+    def test_async_lookup_falls_through_to_disk(self):
+        calls = [("eth_getBlockByNumber", [hex(n), False]) for n in (1000, 1001)] + [("eth_blockNumber", [])]
+        self.get_block(1000)
+        caches["rpc_memory"].clear()
+        found = asyncio.run(self.cache.aenvelopes(CHAIN, calls))
+        self.assertEqual(found[0]["result"]["number"], hex(1000))
+        self.assertEqual(found[1:], [None, None])
+        self.assertEqual(self.cache.stats()["disk_hits"], 1)
+
+
+# -------------------- address labels --------------------
+class FakeArkham(_FakeServer):
+    """Arkham intelligence API: WALLET is a known entity, every other address has none."""
+
+    def respond(self, handler):
+        address = urlparse(handler.path).path.split("/")[3]
+        self.count(address.lower())
+        entity = {"id": "fake-exchange", "name": "Fake Exchange"} if address.lower() == WALLET else None
+        return {"ethereum": {"address": address, "arkhamEntity": entity}}
+
+
+class LabelTests(SimpleTestCase):
+    """Arkham answers are cached with a TTL per kind (label, no label, failure) and looked up in bulk."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.arkham = FakeArkham(FakeChain()).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.arkham.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "labels-test"}}))
+        caches["default"].clear()
+        self.cache = mock.Mock(wraps=caches["default"])
+        self.enterContext(mock.patch.object(labels, "cache", self.cache))
+        self.enterContext(mock.patch.object(labels, "ARKHAM_KEY", "test"))
+        self.enterContext(mock.patch.object(labels, "ARKHAM_BASE", self.arkham.url))
+        self.arkham.take_calls()
+
+    def ttls(self):
+        return {key: ttl for key, _, ttl in (c.args for c in self.cache.set.call_args_list)}
+
+    def test_answers_are_cached_per_kind(self):
+        self.assertEqual(labels.arkham_label_for(WALLET), "fake-exchange")
+        self.assertIsNone(labels.arkham_label_for(COUNTERPARTY))
+        with mock.patch.object(labels, "ARKHAM_BASE", "http://127.0.0.1:9"):
+            self.assertIsNone(labels.arkham_label_for(OTHER))
+        self.assertEqual(self.ttls(), {
+            f"arkham:{WALLET}": labels.ARKHAM_LABEL_TTL,
+            f"arkham:{COUNTERPARTY}": labels.ARKHAM_NEGATIVE_TTL,
+            f"arkham:{OTHER}": labels.ARKHAM_ERROR_TTL,
+        })
+        # every answer, the failure included, is served from the cache until it expires
+        self.assertEqual([labels.arkham_label_for(a) for a in (WALLET, COUNTERPARTY, OTHER)],
+                         ["fake-exchange", None, None])
+        self.assertEqual(sum(self.arkham.take_calls().values()), 2)
+
+    def test_bulk_lookup_fetches_each_missing_address_once(self):
+        labels.arkham_label_for(COUNTERPARTY)
+        self.arkham.take_calls()
+        found = labels.resolve_labels([WALLET, WALLET.upper().replace("0X", "0x"), COUNTERPARTY, None, OTHER])
+        self.assertEqual(found, {WALLET: "fake-exchange", COUNTERPARTY: None, OTHER: None})
+        self.assertEqual(self.arkham.take_calls(), {WALLET: 1, OTHER: 1})
+        self.assertEqual(labels.resolve_labels([WALLET, OTHER]), {WALLET: "fake-exchange", OTHER: None})
+        self.assertFalse(self.arkham.take_calls())
+
+    def test_async_bulk_lookup(self):
+        async def resolve():
+            try:
+                return await labels.aresolve_labels([WALLET, COUNTERPARTY, WALLET])
+            finally:
+                await shared_session().close()
+
+        self.assertEqual(asyncio.run(resolve()), {WALLET: "fake-exchange", COUNTERPARTY: None})
+        self.assertEqual(self.arkham.take_calls(), {WALLET: 1, COUNTERPARTY: 1})
+        self.assertEqual(self.cache.get(f"arkham:{COUNTERPARTY}"), "")
+
+
+# -------------------- multi-chain lookup --------------------
+class FirstHitTests(FakeNodeMixin, SimpleTestCase):
+    """first_hit() returns the first chain with an answer and stops the others."""
+
+    chain_args = {"tip": 20000}
+    target = FakeChain.block_hash(19996)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a shorter chain that never holds the target block, and slower to answer
+        cls.loser = FakeNode(FakeChain(tip=10000), latency=0.02).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loser.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.loser.take_calls()
+        self.registry = Web3ClientRegistry({"winner": self.node.url, "loser": self.loser.url,
+                                            "down": "http://127.0.0.1:9/first-hit-test"})
+
+    def find_block(self, client, cancelled):
+        """Walk down from the tip looking for the target block, checking for cancellation between calls."""
+        tip = int(client.request("eth_blockNumber", []), 16)
+        for n in range(tip, tip - 100, -1):
+            lookup.check_cancelled(cancelled)
+            if client.request("eth_getBlockByNumber", [hex(n), False])["hash"] == self.target:
+                return n
+        return None
+
+    def test_winner_cancels_the_others(self):
+        hit = lookup.first_hit(self.registry, ["loser", "down", "winner"], self.find_block)
+        self.assertEqual((hit.chain, hit.result), ("winner", 19996))
+        self.loser.wait_idle(quiet=0.2)
+        # the loser's walk is 100 blocks long
+        self.assertLess(self.loser.take_calls()["eth_getBlockByNumber"], 20)
+
+    def test_misses_and_errors(self):
+        def fetch(client, cancelled):
+            if client.chain_name == "winner":
+                raise RPCError("eth_getBlockByNumber", {"code": -32000, "message": "boom"})
+            return self.find_block(client, cancelled)
+
+        self.assertIsNone(lookup.first_hit(self.registry, ["loser", "down", "winner"], fetch))
+        self.assertEqual(self.loser.take_calls()["eth_getBlockByNumber"], 100)
+        self.assertIsNone(lookup.first_hit(self.registry, ["down"], self.find_block))
+
+
+class ChainMemoTests(FakeNodeMixin, TestCase):
+    """find_tx() asks the memoised chain alone first and memoises the winner of every search."""
+
+    chain_args = {"tip": 20000}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # too short to hold the tx
+        cls.other = FakeNode(FakeChain(tip=10000)).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.other.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.other.take_calls()
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "chainmemo-test"}}))
+        caches["default"].clear()
+        self.registry = Web3ClientRegistry({CHAIN: self.node.url, "Other": self.other.url})
+        self.tx_hash = self.chain.tx_hash(19000, 0)
+
+    def find(self, chains):
+        return chainmemo.find_tx(self.registry, self.tx_hash, chains,
+                                 lambda client, cancelled: client.request("eth_getTransactionByHash", [self.tx_hash]))
+
+    def test_winner_is_remembered(self):
+        self.assertIsNone(chainmemo.known_chain(self.tx_hash))
+        self.assertEqual(self.find(["Other", CHAIN]).chain, CHAIN)
+        self.assertEqual(TxChain.objects.get(tx_hash=self.tx_hash).chain, CHAIN)
+        self.assertEqual(chainmemo.known_chain(self.tx_hash.upper().replace("0X", "0x")), CHAIN)
+        # the database outlives the cache front
+        caches["default"].clear()
+        self.assertEqual(chainmemo.known_chain(self.tx_hash), CHAIN)
+
+    def test_memoised_chain_is_asked_alone_first(self):
+        chainmemo.remember_chain(self.tx_hash, CHAIN)
+        # even though the caller names another chain
+        self.assertEqual(self.find(["Other"]).chain, CHAIN)
+        self.assertEqual(self.other.take_calls()["eth_getTransactionByHash"], 0)
+        self.assertEqual(self.node.take_calls()["eth_getTransactionByHash"], 1)
+
+    def test_stale_memo_falls_back_to_a_search(self):
+        chainmemo.remember_chain(self.tx_hash, "Other")
+        self.assertEqual(self.find(["Other", CHAIN]).chain, CHAIN)
+        self.assertEqual(self.other.take_calls()["eth_getTransactionByHash"], 1)
+        self.assertEqual(TxChain.objects.get(tx_hash=self.tx_hash).chain, CHAIN)
+        self.assertEqual(chainmemo.known_chain(self.tx_hash), CHAIN)
+
+    def test_indexed_transactions_count_as_memo(self):
+        IndexedTransaction.objects.create(chain=CHAIN, tx_hash=self.tx_hash, block_number=19000, from_address=WALLET)
+        self.assertEqual(chainmemo.known_chain(self.tx_hash), CHAIN)
+
+
+# -------------------- nonce locator --------------------
+class SentTxsTests(FakeNodeMixin, SimpleTestCase):
+    """nonces.sent_txs() on an archive-node stand-in (one wallet tx every 40000 blocks)."""
+
+    chain_args = {"tip": 2_000_000, "wallet_every": 40_000}
+
+    def setUp(self):
+        super().setUp()
+        self.node.archive_depth = None
+
+    def expected(self, start_block: int, limit: int, floor: int = 0):
+        return list(self.chain.wallet_blocks(floor, start_block))[:limit]
+
+    def test_locates_newest_sent_blocks(self):
+        found = sent_txs(self.rpc, WALLET, 1_999_999, limit=10)
+        self.assertEqual([t.block for t in found["txs"]], self.expected(1_999_999, 10))
+        self.assertTrue(all(t.from_.lower() == WALLET for t in found["txs"]))
+        self.assertEqual(found["nonce"], self.chain.tx_count(WALLET, 1_999_999))
+        self.assertEqual(found["lowest_block"], 1_600_000)
+        self.assertEqual(found["failed_blocks"], [])
+        # log2(2M) bisection rounds instead of a 2M-block scan
+        self.assertLess(found["calls"], 30)
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 10)
+
+    def test_start_block_holding_a_sent_tx(self):
+        found = sent_txs(self.rpc, WALLET, 1_200_000, limit=3)
+        self.assertEqual([t.block for t in found["txs"]], [1_200_000, 1_160_000, 1_120_000])
+
+    def test_floor_bounds_the_search(self):
+        found = sent_txs(self.rpc, WALLET, 1_999_999, limit=10, floor=1_900_000)
+        self.assertEqual([t.block for t in found["txs"]], [1_960_000, 1_920_000])
+        self.assertEqual(found["lowest_block"], 1_900_000)
+
+    def test_fewer_nonces_than_limit(self):
+        found = sent_txs(self.rpc, WALLET, 80_000, limit=10)
+        self.assertEqual([t.block for t in found["txs"]], [80_000, 40_000, 0])
+        self.assertEqual(found["nonce"], 3)
+        self.assertEqual(found["lowest_block"], 0)
+
+    def test_wallet_without_sent_txs(self):
+        found = sent_txs(self.rpc, "0x" + "12" * 20, 1_999_999, limit=10)
+        self.assertEqual(found["txs"], [])
+        self.assertEqual(found["nonce"], 0)
+        self.assertEqual(self.node.take_calls()["eth_getBlockByNumber"], 0)
+
+    def test_pruned_state_raises(self):
+        self.node.archive_depth = 128
+        with self.assertRaises(RPCError) as caught:
+            sent_txs(self.rpc, WALLET, 1_999_999, limit=10)
+        self.assertIn("missing trie node", str(caught.exception))
+
+    def test_recent_blocks_work_on_a_pruned_node(self):
+        self.node.archive_depth = 128
+        found = sent_txs(self.rpc, WALLET, 1_999_999, limit=10, floor=1_999_900)
+        self.assertEqual(found["txs"], [])
+        self.assertEqual(found["lowest_block"], 1_999_900)
+
+
+# -------------------- single flight --------------------
+class SharedFlightTests(SimpleTestCase):
+    """SharedFlight coalesces identical calls within a process and across "workers" (separate instances)."""
+
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "singleflight": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                             "LOCATION": os.path.join(directory, "results")},
+        }))
+        self.enterContext(mock.patch.object(singleflight, "SINGLEFLIGHT_LOCK_DIR", Path(directory) / "locks"))
+        self.calls = 0
+        self.running = threading.Event()
+        self.release = threading.Event()
+
+    def slow(self, result="answer"):
+        """fn for do(): counts its runs and blocks until self.release."""
+        def fn():
+            self.calls += 1
+            self.running.set()
+            self.release.wait(5)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return fn
+
+    def run_all(self, calls):
+        """Start do() calls on threads, the first alone until its fn runs; returns their results in order."""
+        results = [None] * len(calls)
+
+        def run(i, flight, fn):
+            try:
+                results[i] = flight.do("key", fn)
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i, *call)) for i, call in enumerate(calls)]
+        threads[0].start()
+        self.assertTrue(self.running.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.2)  # the others are waiting on the leader now
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_coalesces_callers_in_one_process(self):
+        flight = singleflight.SharedFlight("test-process")
+        results = self.run_all([(flight, self.slow())] * 4)
+        self.assertEqual(results, ["answer"] * 4)
+        self.assertEqual(self.calls, 1)
+
+    def test_coalesces_across_workers(self):
+        workers = [singleflight.SharedFlight("test-workers") for _ in range(3)]
+        results = self.run_all([(worker, self.slow()) for worker in workers])
+        self.assertEqual(results, ["answer"] * 3)
+        self.assertEqual(self.calls, 1)
+
+    def test_waiter_runs_fn_after_lock_timeout(self):
+        leader = singleflight.SharedFlight("test-timeout")
+        impatient = singleflight.SharedFlight("test-timeout", wait=0.05)
+        results = self.run_all([(leader, self.slow("leader")), (impatient, self.slow("own"))])
+        self.assertEqual(results, ["leader", "own"])
+        self.assertEqual(self.calls, 2)
+
+    def test_waiter_runs_fn_when_leader_failed(self):
+        workers = [singleflight.SharedFlight("test-failed") for _ in range(2)]
+        results = self.run_all([(workers[0], self.slow(ValueError("node down"))), (workers[1], self.slow())])
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(results[1], "answer")
+        self.assertEqual(self.calls, 2)
+
+
+# -------------------- rate limiting --------------------
+class AsyncBucketTests(SimpleTestCase):
+    """aacquire() / athrottled() lock and update the bucket file on a worker thread."""
+
+    def test_bucket_file_io_leaves_the_loop(self):
+        threads = []
+        bucket = ratelimit.TokenBucket("async-test", "async-test-key", rate=1000)
+        real_reserve, real_throttled = bucket.reserve, bucket.throttled
+
+        def reserve(*args):
+            threads.append(threading.get_ident())
+            return real_reserve(*args)
+
+        def throttled(*args):
+            threads.append(threading.get_ident())
+            return real_throttled(*args)
+
+        async def run():
+            await bucket.aacquire()
+            await bucket.athrottled(0)
+            return threading.get_ident()
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(bucket, "path", Path(directory) / "async-test.bucket"), \
+                mock.patch.object(bucket, "reserve", reserve), mock.patch.object(bucket, "throttled", throttled):
+            loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+
+# -------------------- metrics --------------------
+class MetricsMergeTests(SimpleTestCase):
+    """Files of exited workers are folded into the archive without losing counts."""
+
+    def test_exited_worker_is_folded(self):
+        counter = metrics.RPC_CALLS
+        key = counter._key({"chain": "merge-test", "method": "eth_call"})
+        with tempfile.TemporaryDirectory() as directory, metrics.isolated(directory):
+            dead = os.path.join(directory, "999999999-1.json")  # above any pid_max
+            with open(dead, "w") as f:
+                json.dump({counter.name: {key: 5}}, f)
+            counter.inc(2, chain="merge-test", method="eth_call")
+            self.assertEqual(metrics._REGISTRY.collect()[counter.name][key], 7)
+            self.assertFalse(os.path.exists(dead))
+            self.assertTrue(os.path.exists(os.path.join(directory, "exited.archive")))
+            counter.inc(chain="merge-test", method="eth_call")
+            self.assertEqual(metrics._REGISTRY.collect()[counter.name][key], 8)
+        self.assertNotIn(key, metrics._REGISTRY._values.get(counter.name, {}))
+
+
+class MetricsViewTests(SimpleTestCase):
+    def test_scrape(self):
+        with tempfile.TemporaryDirectory() as directory, metrics.isolated(directory):
+            metrics.RPC_CALLS.inc(chain="scrape-test", method="eth_call")
+            response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('tracker_rpc_calls_total{chain="scrape-test",method="eth_call"} 1', response.content.decode())
@@ -0,0 +1,304 @@
+# tracker/transfers.py
+"""
+ERC-20 / ERC-721 token transfer history from eth_getLogs.
+
+analyze_tx_source() only sees a token transfer when the wallet sent the tx
+itself; tokens the wallet received (or that a contract moved for it) are
+invisible to the tx scan. Both standards emit
+Transfer(address indexed from, address indexed to, ...), so one eth_getLogs
+filter with the wallet in topic1 (sent) and one with it in topic2
+(received) find every transfer in a block range; ERC-721 logs carry the
+token id as topic3, ERC-20 logs the amount as data.
+
+token_transfers() walks back from a block in windows, newest first, sending
+both filters of a window as one JSON-RPC batch. Providers cap getLogs by
+range or result count; when a window is rejected as too large it is retried
+smaller (half, or the range the error message suggests). Accepted windows
+double the span until the first refusal; after that it settles between the
+largest accepted and the smallest refused span. That state is kept per chain,
+so later lookups start at a span the provider takes and thousands of blocks
+usually cost a handful of calls. A -32005 answer without any range wording
+or hint is a rate limit (Infura's "limit exceeded"): the window is retried at
+the same span once the endpoint's rate limiter has backed off.
+"""
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import TOKEN_LOGS_SPLITS
+from .ratelimit import RATE_LIMIT_RETRIES
+from .rpc import ChainClient, RPCError
+
+logger = logging.getLogger(__name__)
+
+# keccak256("Transfer(address,address,uint256)"), shared by ERC-20 and ERC-721
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# First getLogs window (blocks) on a chain, and the largest it may grow to.
+TOKEN_LOGS_SPAN = int(os.getenv("TOKEN_LOGS_SPAN", "10000"))
+TOKEN_LOGS_MAX_SPAN = int(os.getenv("TOKEN_LOGS_MAX_SPAN", "1000000"))
+# Blocks a token history lookup may cover, and getLogs round trips it may spend.
+TOKEN_LOGS_BLOCK_BUDGET = int(os.getenv("TOKEN_LOGS_BLOCK_BUDGET", "5000000"))
+TOKEN_LOGS_MAX_CALLS = int(os.getenv("TOKEN_LOGS_MAX_CALLS", "40"))
+
+# provider wordings for "range / result set too large" (Infura, Alchemy, QuickNode, geth, erigon, BSC);
+# a bare "exceeded" also covers rate limits ("limit exceeded", "compute units exceeded")
+_TOO_LARGE = re.compile(
+    r"more than \d+ results|too many (results|logs|blocks)|range (is )?too (large|wide)|block range|"
+    r"response size|(result|log|response) (size )?limit|limited to (a )?[\d,]+ (blocks?|range)|query timeout", re.I)
+_SUGGESTED_RANGE = re.compile(r"\[(0x[0-9a-f]+),\s*(0x[0-9a-f]+)\]", re.I)
+
+_spans: Dict[str, "_Span"] = {}
+_spans_lock = threading.Lock()
+# (chain, token) -> (symbol, decimals); None values when the contract does not say
+_token_meta: Dict[Tuple[str, str], Tuple[Optional[str], Optional[int]]] = {}
+
+
+class TokenTransfer:
+    """One Transfer log involving the wallet."""
+
+    __slots__ = ("tx_hash", "log_index", "block", "ts", "token", "from_", "to", "value", "token_id",
+                 "standard", "direction", "symbol", "decimals")
+
+    def __init__(self, tx_hash: str, log_index: int, block: int, token: str, from_: str, to: str,
+                 value: Optional[int], token_id: Optional[int], direction: str):
+        self.tx_hash = tx_hash
+        self.log_index = log_index
+        self.block = block
+        self.ts: Optional[int] = None
+        self.token = token
+        self.from_ = from_
+        self.to = to
+        self.value = value          # ERC-20 amount in base units
+        self.token_id = token_id    # ERC-721 token id
+        self.standard = "ERC-721" if token_id is not None else "ERC-20"
+        self.direction = direction  # "in", "out" or "self"
+        self.symbol: Optional[str] = None
+        self.decimals: Optional[int] = None
+
+    @property
+    def amount(self) -> Optional[float]:
+        """ERC-20 value scaled by the token's decimals (None if unknown or ERC-721)."""
+        if self.value is None or self.decimals is None:
+            return None
+        return self.value / 10 ** self.decimals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tx_hash": self.tx_hash, "log_index": self.log_index, "block": self.block, "timestamp": self.ts,
+            "token": self.token, "symbol": self.symbol, "standard": self.standard, "direction": self.direction,
+            "from": self.from_, "to": self.to, "value": str(self.value) if self.value is not None else None,
+            "amount": self.amount, "token_id": str(self.token_id) if self.token_id is not None else None,
+        }
+
+    def __repr__(self):
+        return f"TokenTransfer({self.tx_hash!r}, {self.standard}, block={self.block})"
+
+
+class _Span:
+    """getLogs window size for one chain (callers hold _spans_lock)."""
+
+    def __init__(self, start: int = TOKEN_LOGS_SPAN):
+        self.current = max(1, start)
+        self.good = 0              # largest span accepted
+        self.bad: Optional[int] = None  # smallest span refused
+
+    def accepted(self, span: int):
+        self.good = max(self.good, span)
+        if self.bad is None:
+            self.current = min(span * 2, TOKEN_LOGS_MAX_SPAN)
+        elif self.bad - self.good > max(1, self.good // 8):
+            self.current = (self.good + self.bad) // 2
+        else:
+            self.current = self.good
+
+    def refused(self, span: int, suggested: Optional[int]):
+        self.bad = span if self.bad is None else min(self.bad, span)
+        if self.good >= span:
+            self.good = 0  # a denser stretch than where `good` was measured
+        self.current = self.good or max(1, min(suggested or span // 2, span - 1))
+
+
+def _topic(address: str) -> str:
+    return "0x" + address.lower()[2:].rjust(64, "0")
+
+
+def _address(topic: str) -> str:
+    return "0x" + topic[-40:].lower()
+
+
+def decode_transfer(log: Dict[str, Any], wallet: str) -> Optional[TokenTransfer]:
+    """TokenTransfer from a raw Transfer log, None if it is not one (wrong topic, unindexed variant)."""
+    topics = log.get("topics") or []
+    if len(topics) < 3 or str(topics[0]).lower() != TRANSFER_TOPIC or log.get("removed"):
+        return None
+    sender, receiver = _address(topics[1]), _address(topics[2])
+    wallet = wallet.lower()
+    direction = "self" if sender == receiver == wallet else "out" if sender == wallet else "in"
+    data = log.get("data") or "0x"
+    if len(topics) >= 4:
+        value, token_id = None, int(topics[3], 16)
+    else:
+        value, token_id = int(data, 16) if data not in ("0x", "") else 0, None
+    return TokenTransfer(log.get("transactionHash"), int(log.get("logIndex") or "0x0", 16),
+                         int(log.get("blockNumber") or "0x0", 16), (log.get("address") or "").lower(),
+                         sender, receiver, value, token_id, direction)
+
+
+def _too_large(error: Any) -> bool:
+    message = error.get("message") if isinstance(error, dict) else str(error)
+    return bool(_TOO_LARGE.search(message or "")) or _suggested_span(error) is not None
+
+
+def _rate_limited(error: Any) -> bool:
+    """-32005 ("limit exceeded") or 429 without a range wording or hint: the provider wants fewer requests."""
+    return isinstance(error, dict) and error.get("code") in (-32005, 429) and not _too_large(error)
+
+
+def _suggested_span(error: Any) -> Optional[int]:
+    """Span of the range a provider suggests in its error ("... this block range should work: [0x.., 0x..]")."""
+    message = error.get("message") if isinstance(error, dict) else str(error)
+    data = error.get("data") if isinstance(error, dict) else None
+    found = _SUGGESTED_RANGE.search(f"{message} {data or ''}")
+    if found is None:
+        return None
+    return max(1, int(found.group(2), 16) - int(found.group(1), 16) + 1)
+
+
+def _window(client: ChainClient, wallet: str, lo: int, hi: int) -> Tuple[Optional[List[Dict[str, Any]]], Any]:
+    """Logs sent or received by wallet in [lo, hi] as (logs, None), or (None, error) if the range was
+    refused as too large or the call was rate limited."""
+    span = {"fromBlock": hex(lo), "toBlock": hex(hi)}
+    calls = [("eth_getLogs", [dict(span, topics=[TRANSFER_TOPIC, _topic(wallet)])]),
+             ("eth_getLogs", [dict(span, topics=[TRANSFER_TOPIC, None, _topic(wallet)])])]
+    try:
+        responses = client.send_batch(calls)
+    except RPCError:
+        # node does not take batches
+        responses = [client.send(method, params) for method, params in calls]
+    logs: List[Dict[str, Any]] = []
+    for response in responses:
+        if "error" in response:
+            if _too_large(response["error"]) or _rate_limited(response["error"]):
+                return None, response["error"]
+            raise RPCError("eth_getLogs", response["error"])
+        logs.extend(response.get("result") or [])
+    return logs, None
+
+
+def token_transfers(client: ChainClient, wallet: str, start_block: int, limit: int = 10,
+                    max_blocks: int = TOKEN_LOGS_BLOCK_BUDGET,
+                    max_calls: int = TOKEN_LOGS_MAX_CALLS) -> Dict[str, Any]:
+    """
+    Up to `limit` token transfers of wallet at or below start_block, newest
+    first (every transfer of the oldest block reached is kept, like the tx
+    scan). Returns {"transfers", "lowest_block", "calls", "complete"}; complete
+    is False when the call or block budget ran out before `limit` was reached.
+    """
+    chain = client.chain_name
+    floor = max(0, start_block - max_blocks + 1)
+    with _spans_lock:
+        tuner = _spans.setdefault(chain, _Span())
+    by_key: Dict[Tuple[str, int], TokenTransfer] = {}
+    hi = start_block
+    calls = 0
+    throttles = 0
+    while hi >= floor and len(by_key) < limit and calls < max_calls:
+        with _spans_lock:
+            span = tuner.current
+        lo = max(floor, hi - span + 1)
+        logs, error = _window(client, wallet, lo, hi)
+        calls += 1
+        if logs is None and not _too_large(error):
+            # rate limited: the span is fine, wait for the limiter and ask again
+            if throttles >= RATE_LIMIT_RETRIES or not client.throttled():
+                raise RPCError("eth_getLogs", error)
+            throttles += 1
+            continue
+        if logs is None:
+            if hi == lo:
+                raise RPCError("eth_getLogs", error)
+            with _spans_lock:
+                tuner.refused(hi - lo + 1, _suggested_span(error))
+            TOKEN_LOGS_SPLITS.inc(chain=chain)
+            logger.debug("getLogs window %s..%s refused on %s: %s", lo, hi, chain, error)
+            continue
+        for log in logs:
+            transfer = decode_transfer(log, wallet)
+            if transfer is not None:
+                by_key.setdefault((transfer.tx_hash, transfer.log_index), transfer)
+        hi = lo - 1
+        if lo > floor:  # a window cut short by the floor says nothing about the span
+            with _spans_lock:
+                tuner.accepted(span)
+
+    transfers = sorted(by_key.values(), key=lambda t: (t.block, t.log_index), reverse=True)
+    if len(transfers) > limit:
+        last = transfers[limit - 1].block
+        transfers = [t for t in transfers if t.block >= last]
+    _add_block_times(client, transfers)
+    _add_token_meta(client, transfers)
+    return {"transfers": transfers, "lowest_block": hi + 1, "calls": calls,
+            "complete": len(transfers) >= limit or hi < floor}
+
+
+def _add_block_times(client: ChainClient, transfers: List[TokenTransfer]):
+    """Logs carry no timestamp: read the blocks' headers in one batch (finalized ones are cached)."""
+    blocks = sorted({t.block for t in transfers})
+    if not blocks:
+        return
+    try:
+        responses = client.send_batch([("eth_getBlockByNumber", [hex(n), False]) for n in blocks])
+    except Exception as e:
+        logger.debug("Could not read transfer block times on %s: %s", client.chain_name, e)
+        return
+    times = {n: (r.get("result") or {}).get("timestamp") for n, r in zip(blocks, responses)}
+    for t in transfers:
+        ts = times.get(t.block)
+        t.ts = int(ts, 16) if ts else None
+
+
+def _decode_symbol(result: Optional[str]) -> Optional[str]:
+    """symbol() return value: an ABI string, or bytes32 on old tokens (MKR, SAI)."""
+    raw = bytes.fromhex((result or "0x")[2:])
+    if len(raw) >= 96 and int.from_bytes(raw[:32], "big") == 32:
+        length = int.from_bytes(raw[32:64], "big")
+        raw = raw[64:64 + length]
+    elif len(raw) == 32:
+        raw = raw.rstrip(b"\0")
+    else:
+        return None
+    return raw.decode("utf-8", "replace") or None
+
+
+def _add_token_meta(client: ChainClient, transfers: List[TokenTransfer]):
+    """Fill in symbol and decimals, one batch of eth_calls for the tokens not seen before in this process."""
+    chain = client.chain_name
+    tokens = sorted({t.token for t in transfers if (chain, t.token) not in _token_meta})
+    if tokens:
+        calls = []
+        for token in tokens:
+            calls.append(("eth_call", [{"to": token, "data": "0x95d89b41"}, "latest"]))  # symbol()
+            calls.append(("eth_call", [{"to": token, "data": "0x313ce567"}, "latest"]))  # decimals()
+        try:
+            responses = client.send_batch(calls)
+        except Exception as e:
+            logger.debug("Could not read token metadata on %s: %s", chain, e)
+            responses = None
+        if responses is not None:
+            for i, token in enumerate(tokens):
+                symbol, decimals = responses[2 * i].get("result"), responses[2 * i + 1].get("result")
+                try:
+                    symbol = _decode_symbol(symbol)
+                except ValueError:
+                    symbol = None
+                try:
+                    decimals = int(decimals, 16) if decimals and decimals != "0x" else None
+                except ValueError:
+                    decimals = None
+                _token_meta[(chain, token)] = (symbol, decimals if decimals is not None and decimals <= 77 else None)
+    for t in transfers:
+        t.symbol, decimals = _token_meta.get((chain, t.token), (None, None))
+        t.decimals = decimals if t.standard == "ERC-20" else None
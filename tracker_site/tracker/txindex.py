@@ -0,0 +1,246 @@
+# tracker/txindex.py
+"""
+Persistent address -> transaction index.
+
+Every wallet scan records the transactions it found and the block range it
+fully covered (IndexedRange). collect_wallet_txs() answers covered parts of a
+"last N" request with one indexed query on (chain, address, block desc) and
+only scans the node for gaps, so already indexed wallets skip the node scan.
+Blocks held by the chain's follower ring (follower.py) are read from memory
+first and recorded like a node scan. Scans in "bloom" mode are not recorded:
+they skip blocks whose bloom rules the wallet out, and a range marked covered
+is never scanned again, so the txs they miss (plain transfers) would stay
+hidden from every later lookup.
+"""
+import os
+import logging
+import threading
+from decimal import Decimal
+from typing import Callable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, transaction
+
+from .follower import chain_follower
+from .metrics import SCAN_DEPTH_BLOCKS, SCAN_NODE_BLOCKS
+from .models import AddressParticipation, IndexedRange, IndexedTransaction
+from .records import TxRecord, to_record
+from .rpc import ChainClient
+from .scan import Progress, ScanResult, ascan_wallet_txs, scan_mode, scan_wallet_txs
+
+logger = logging.getLogger(__name__)
+
+# Blocks closer than this to the chain tip may still reorg and are not indexed.
+TX_INDEX_CONFIRMATIONS = int(os.getenv("TX_INDEX_CONFIRMATIONS", "12"))
+
+
+def covered_ranges(chain: str, address: str) -> List[Tuple[int, int]]:
+    """Indexed (start_block, end_block) ranges for an address, newest first."""
+    rows = (IndexedRange.objects
+            .filter(chain=chain, address=address.lower())
+            .order_by("-end_block")
+            .values_list("start_block", "end_block"))
+    return [(int(lo), int(hi)) for lo, hi in rows]
+
+
+def indexed_wallet_txs(chain: str, address: str, lo: int, hi: int, limit: int) -> List[TxRecord]:
+    """Indexed txs for an address in blocks [lo, hi], newest first."""
+    rows = (AddressParticipation.objects
+            .filter(chain=chain, address=address.lower(), block_number__gte=lo, block_number__lte=hi)
+            .select_related("transaction")
+            .order_by("-block_number")[:limit])
+    return [to_record(p.transaction) for p in rows]
+
+
+def _add_range(chain: str, address: str, lo: int, hi: int):
+    """Insert [lo, hi] and merge it with overlapping or adjacent ranges."""
+    overlapping = IndexedRange.objects.select_for_update().filter(
+        chain=chain, address=address, start_block__lte=hi + 1, end_block__gte=lo - 1)
+    for r in overlapping:
+        lo = min(lo, r.start_block)
+        hi = max(hi, r.end_block)
+    overlapping.delete()
+    IndexedRange.objects.create(chain=chain, address=address, start_block=lo, end_block=hi)
+
+
+def record_scan(chain: str, address: str, matches: List[TxRecord], lo: int, hi: int,
+                failed_blocks: List[int]):
+    """Store scanned txs and mark [lo, hi] (minus failed blocks) as covered for address."""
+    address = address.lower()
+    with transaction.atomic():
+        for m in matches:
+            if not m.hash or not (lo <= m.block <= hi):
+                continue
+            itx, _ = IndexedTransaction.objects.get_or_create(
+                chain=chain, tx_hash=m.hash,
+                defaults={
+                    "block_number": m.block,
+                    "from_address": m.from_ or "",
+                    "to_address": m.to,
+                    "value_wei": Decimal(m.value_wei),
+                    "gas": m.gas,
+                    "timestamp": m.timestamp,
+                    "input": m.input or "",
+                })
+            for participant in {(m.from_ or "").lower(), (m.to or "").lower()} - {""}:
+                AddressParticipation.objects.get_or_create(
+                    chain=chain, address=participant, transaction=itx,
+                    defaults={"block_number": m.block})
+        # failed blocks split the covered range
+        seg_hi = hi
+        for b in sorted((b for b in set(failed_blocks) if lo <= b <= hi), reverse=True):
+            if b < seg_hi:
+                _add_range(chain, address, b + 1, seg_hi)
+            seg_hi = b - 1
+        if seg_hi >= lo:
+            _add_range(chain, address, lo, seg_hi)
+
+
+def _next_segment(ranges: List[Tuple[int, int]], cursor: int, floor: int) -> Tuple[bool, int]:
+    """
+    Plan the next step below cursor: (True, lo) to read [lo, cursor] from the
+    index, or (False, lo) to scan the node gap [lo, cursor].
+    """
+    covering = next((r for r in ranges if r[0] <= cursor <= r[1]), None)
+    if covering is not None:
+        return True, max(covering[0], floor)
+    # ranges are newest first: the first one ending below cursor bounds the gap
+    below = next((r for r in ranges if r[1] < cursor), None)
+    return False, max(floor, below[1] + 1) if below else floor
+
+
+def collect_wallet_txs(client: ChainClient, wallet: str, start_block: int, max_blocks: int,
+                       limit: int = 10, tip: Optional[Callable[[], int]] = None,
+                       progress: Optional[Progress] = None,
+                       cancelled: Optional[threading.Event] = None) -> List[TxRecord]:
+    """
+    Up to `limit` txs involving wallet in [start_block - max_blocks + 1, start_block],
+    newest first. Blocks in the follower ring are read from memory, indexed ranges
+    from the database; gaps are scanned on the node. Ring and node scans are
+    recorded (only up to tip - TX_INDEX_CONFIRMATIONS; bloom-mode node scans are
+    not). progress is passed on to the scan and also called for rows read from
+    the ring or the index. Once `cancelled` is set no further segment is read
+    and the node scan stops early; what it covered is still recorded.
+    """
+    chain = client.chain_name
+    address = wallet.lower()
+    floor = max(0, start_block - max_blocks + 1)
+    try:
+        ranges = covered_ranges(chain, address)
+        index_ok = True
+    except DatabaseError as e:
+        logger.warning("Transaction index unavailable, scanning node only: %s", e)
+        ranges = []
+        index_ok = False
+
+    if tip is None:
+        tip = client.tip
+    mode = scan_mode(chain)
+    follower = chain_follower(client)
+    safe_block = None
+    collected: List[TxRecord] = []
+    cursor = start_block
+    node_blocks = 0
+    while cursor >= floor and len(collected) < limit and not (cancelled is not None and cancelled.is_set()):
+        result: Optional[ScanResult] = follower.scan(address, cursor, floor, limit - len(collected)) \
+            if follower is not None else None
+        from_ring = result is not None
+        if from_ring:
+            if progress is not None:
+                progress(result.matches, result.lowest_block)
+        else:
+            indexed, lo = _next_segment(ranges, cursor, floor)
+            if indexed:
+                rows = indexed_wallet_txs(chain, address, lo, cursor, limit - len(collected))
+                collected.extend(rows)
+                if progress is not None:
+                    progress(rows, lo)
+                cursor = lo - 1
+                continue
+
+            result = scan_wallet_txs(client, wallet, cursor, cursor - lo + 1, limit - len(collected),
+                                     progress=progress, mode=mode, cancelled=cancelled)
+            if result.lowest_block is None:
+                break
+            node_blocks += cursor - result.lowest_block + 1
+        collected.extend(result.matches)
+
+        if index_ok and (from_ring or mode == "full"):
+            if safe_block is None:
+                try:
+                    safe_block = int(tip()) - TX_INDEX_CONFIRMATIONS
+                except Exception as e:
+                    logger.debug("Could not read chain tip for %s: %s", chain, e)
+                    safe_block = -1
+            rec_hi = min(cursor, safe_block)
+            if rec_hi >= result.lowest_block:
+                try:
+                    record_scan(chain, address, result.matches, result.lowest_block, rec_hi, result.failed_blocks)
+                except DatabaseError as e:
+                    logger.warning("Could not record scan for %s on %s: %s", address, chain, e)
+                    index_ok = False
+        cursor = result.lowest_block - 1
+
+    SCAN_DEPTH_BLOCKS.observe(start_block - cursor, chain=chain)
+    SCAN_NODE_BLOCKS.observe(node_blocks, chain=chain)
+    return collected[:limit]
+
+
+async def acollect_wallet_txs(client, wallet: str, start_block: int, max_blocks: int,
+                              limit: int = 10) -> List[TxRecord]:
+    """Async collect_wallet_txs() for an AsyncChainClient (database calls run in a thread)."""
+    chain = client.chain_name
+    address = wallet.lower()
+    floor = max(0, start_block - max_blocks + 1)
+    try:
+        ranges = await sync_to_async(covered_ranges)(chain, address)
+        index_ok = True
+    except DatabaseError as e:
+        logger.warning("Transaction index unavailable, scanning node only: %s", e)
+        ranges = []
+        index_ok = False
+
+    mode = scan_mode(chain)
+    follower = chain_follower(client)
+    safe_block = None
+    collected: List[TxRecord] = []
+    cursor = start_block
+    node_blocks = 0
+    while cursor >= floor and len(collected) < limit:
+        result = follower.scan(address, cursor, floor, limit - len(collected)) if follower is not None else None
+        from_ring = result is not None
+        if not from_ring:
+            indexed, lo = _next_segment(ranges, cursor, floor)
+            if indexed:
+                collected.extend(await sync_to_async(indexed_wallet_txs)(chain, address, lo, cursor,
+                                                                         limit - len(collected)))
+                cursor = lo - 1
+                continue
+
+            result = await ascan_wallet_txs(client, wallet, cursor, cursor - lo + 1, limit - len(collected),
+                                            mode=mode)
+            if result.lowest_block is None:
+                break
+            node_blocks += cursor - result.lowest_block + 1
+        collected.extend(result.matches)
+
+        if index_ok and (from_ring or mode == "full"):
+            if safe_block is None:
+                try:
+                    safe_block = int(await client.tip()) - TX_INDEX_CONFIRMATIONS
+                except Exception as e:
+                    logger.debug("Could not read chain tip for %s: %s", chain, e)
+                    safe_block = -1
+            rec_hi = min(cursor, safe_block)
+            if rec_hi >= result.lowest_block:
+                try:
+                    await sync_to_async(record_scan)(chain, address, result.matches, result.lowest_block, rec_hi,
+                                                     result.failed_blocks)
+                except DatabaseError as e:
+                    logger.warning("Could not record scan for %s on %s: %s", address, chain, e)
+                    index_ok = False
+        cursor = result.lowest_block - 1
+
+    SCAN_DEPTH_BLOCKS.observe(start_block - cursor, chain=chain)
+    SCAN_NODE_BLOCKS.observe(node_blocks, chain=chain)
+    return collected[:limit]
@@ -1,6 +1,9 @@
 # tracker/urls.py
 from django.urls import path
-from .views import tx_search, last10_from_tx , download_tx_pdf_plain
+from .views import tx_search, last10_from_tx , download_tx_pdf_plain, rpc_pool_stats, last10_stream, last10_report, last10_tokens, last10_sent
+from .health import health_page
+from .metrics import metrics_view
+from .async_views import tx_search_async, last10_from_tx_async, download_tx_pdf_plain_async
 
 urlpatterns = [
     path("", tx_search, name="tx_search"),
@@ -9,6 +12,17 @@ urlpatterns = [
     path("search/last10/",last10_from_tx, name="last10_from_tx"),
     path("download_tx_pdf_plain/",download_tx_pdf_plain, name="download_tx_pdf_plain"),
     path("last10/", last10_from_tx, name="last10_from_tx"),
-    path('download_pdf/', download_tx_pdf_plain, name='download_tx_pdf_plain')
+    path('download_pdf/', download_tx_pdf_plain, name='download_tx_pdf_plain'),
+    path("last10/stream/", last10_stream, name="last10_stream"),
+    path("last10/report/", last10_report, name="last10_report"),
+    path("last10/tokens/", last10_tokens, name="last10_tokens"),
+    path("last10/sent/", last10_sent, name="last10_sent"),
+    path("internal/rpc-pools/", rpc_pool_stats, name="rpc_pool_stats"),
+    path("internal/rpc-health/", health_page, name="rpc_health"),
+    path("metrics/", metrics_view, name="metrics"),
+    # async stack (serve through tracker_site/asgi.py)
+    path("async/search/", tx_search_async, name="tx_search_async"),
+    path("async/last10/", last10_from_tx_async, name="last10_from_tx_async"),
+    path("async/download_pdf/", download_tx_pdf_plain_async, name="download_tx_pdf_plain_async"),
 ]
     
\ No newline at end of file
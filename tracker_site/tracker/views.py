@@ -1,25 +1,45 @@
 # tracker/views.py
 import os
 import json
+import time
+import queue
 import logging
-import textwrap
-from io import BytesIO
+import threading
+from contextvars import copy_context
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
 
-import requests
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import json_script
 from dotenv import load_dotenv
 from web3 import Web3
 
-# Optional PDF dependency
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas as rl_canvas
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
+from .bloom import bloom_stats
+from .chainmemo import find_tx, known_chain
+from .labels import ARKHAM_KEY, arkham_label_for, resolve_labels
+from .explorer import EXPLORER_APIS, explorer_tx_rows, fetch_last_txs_from_explorer  # re-exported for older imports
+from .follower import follower_stats
+from .history import history_stats, wallet_history
+from .lookup import check_cancelled
+from .nonces import sent_txs
+from .pdfs import (  # render_tx_pdf / pdf_response re-exported for async_views
+    REPORTLAB_AVAILABLE,
+    cached_pdf_response,
+    is_tx_hash,
+    pdf_response,
+    render_report_pdf,
+    render_tx_pdf,
+    store_pdf,
+)
+from .records import TxRecord, TxRecordEncoder
+from .rpc import RPC_RATE_BURST, RPC_RATE_LIMIT, RPC_SCAN_CONCURRENCY, ChainClient, Web3ClientRegistry
+from .rpc_cache import RPCResponseCache
+from .scan import SCAN_BLOCK_BUDGET
+from .singleflight import SharedFlight
+from .transfers import token_transfers
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -27,45 +47,37 @@ logger.setLevel(logging.DEBUG)
 # Load environment variables (adjust path/name as needed)
 load_dotenv("variables.env")
 
-# RPC endpoints (ensure variables.env has these)
+
+def _endpoint(url_env: str) -> dict:
+    """RPC URL(s) from url_env (comma-separated for several endpoints) plus per-chain tuning
+    (<url_env>_SCAN_CONCURRENCY, _RATE_LIMIT, _RATE_BURST)."""
+    return {
+        "url": os.getenv(url_env),
+        "scan_concurrency": int(os.getenv(f"{url_env}_SCAN_CONCURRENCY", str(RPC_SCAN_CONCURRENCY))),
+        "rate_limit": float(os.getenv(f"{url_env}_RATE_LIMIT", str(RPC_RATE_LIMIT))),
+        "rate_burst": float(os.getenv(f"{url_env}_RATE_BURST", "0")) or RPC_RATE_BURST,
+    }
+
+
+# RPC endpoints (ensure variables.env has these); values may also be plain URLs
 RPC_ENDPOINTS = {
-    "Ethereum Mainnet": os.getenv("WEB3_MAINNET"),
-    "Sepolia Testnet": os.getenv("WEB3_SEPOLIA"),
-    "Polygon Mainnet": os.getenv("WEB3_POLYGON"),
-    "Binance Smart Chain": os.getenv("WEB3_BSC"),
+    "Ethereum Mainnet": _endpoint("WEB3_MAINNET"),
+    "Sepolia Testnet": _endpoint("WEB3_SEPOLIA"),
+    "Polygon Mainnet": _endpoint("WEB3_POLYGON"),
+    "Binance Smart Chain": _endpoint("WEB3_BSC"),
 }
 
-# Explorer API config (env_key must be present in variables.env for fallback)
-EXPLORER_APIS = {
-    "Ethereum Mainnet": {
-        "api_base": "https://api.etherscan.io/api",
-        "env_key": "ETHERSCAN_API_KEY",
-        "explorer_tx": "https://etherscan.io/tx/{}",
-        "explorer_addr": "https://etherscan.io/address/{}",
-    },
-    "Sepolia Testnet": {
-        "api_base": "https://api-sepolia.etherscan.io/api",
-        "env_key": "ETHERSCAN_API_KEY",
-        "explorer_tx": "https://sepolia.etherscan.io/tx/{}",
-        "explorer_addr": "https://sepolia.infura.io/address/{}",
-    },
-    "Polygon Mainnet": {
-        "api_base": "https://api.polygonscan.com/api",
-        "env_key": "POLYGONSCAN_API_KEY",
-        "explorer_tx": "https://polygonscan.com/tx/{}",
-        "explorer_addr": "https://polygonscan.com/address/{}",
-    },
-    "Binance Smart Chain": {
-        "api_base": "https://api.bscscan.com/api",
-        "env_key": "BSCSCAN_API_KEY",
-        "explorer_tx": "https://bscscan.com/tx/{}",
-        "explorer_addr": "https://bscscan.com/address/{}",
-    },
-}
+# Seconds between last10 stream progress events / keep-alive comments.
+SSE_PROGRESS_INTERVAL = float(os.getenv("LAST10_SSE_PROGRESS_INTERVAL", "0.5"))
+SSE_KEEPALIVE = float(os.getenv("LAST10_SSE_KEEPALIVE", "15"))
 
-# Arkham (optional)
-ARKHAM_KEY = os.getenv("ARKHAM_API_KEY")
-ARKHAM_BASE = "https://api.arkhamintelligence.com"
+# Pooled per-chain clients shared by every request in this worker; finalized
+# blocks/txs/receipts are served from the RPC response cache
+RPC_CLIENTS = Web3ClientRegistry(RPC_ENDPOINTS, cache=RPCResponseCache())
+
+# Identical concurrent lookups (a shared tx link) run once across all workers
+TX_SEARCH_FLIGHT = SharedFlight("tx_search")
+LAST10_FLIGHT = SharedFlight("last10_from_tx")
 
 
 # -------------------- Helpers --------------------
@@ -73,36 +85,14 @@ def get_w3_for_chain(chain_name: Optional[str]) -> Optional[Web3]:
     """Return connected Web3 instance for given chain name or None."""
     if not chain_name:
         chain_name = "Ethereum Mainnet"
-    rpc = RPC_ENDPOINTS.get(chain_name)
-    if not rpc:
+    client = RPC_CLIENTS.get(chain_name)
+    if client is None:
         logger.debug("No RPC configured for chain: %s", chain_name)
         return None
-    w3 = Web3(Web3.HTTPProvider(rpc))
-    try:
-        if not w3.is_connected():
-            logger.warning("Web3 not connected for %s (RPC: %s)", chain_name, rpc)
-            return None
-    except Exception as e:
-        logger.exception("Error checking Web3 connection for %s: %s", chain_name, e)
+    if not client.is_connected():
+        logger.warning("Web3 not connected for %s (RPC: %s)", chain_name, client.rpc_url)
         return None
-    return w3
-
-
-def arkham_label_for(address: str) -> Optional[str]:
-    """Return Arkham entity label for an address if available."""
-    if not address or not ARKHAM_KEY:
-        return None
-    try:
-        url = f"{ARKHAM_BASE}/intelligence/address/{address}/all"
-        r = requests.get(url, headers={"API-Key": ARKHAM_KEY}, timeout=8)
-        r.raise_for_status()
-        data = r.json()
-        for _, intel in data.items():
-            if isinstance(intel, dict) and intel.get("arkhamEntity"):
-                return intel["arkhamEntity"].get("id")
-    except Exception as e:
-        logger.debug("Arkham lookup failed for %s: %s", address, e)
-    return None
+    return client.w3
 
 
 def analyze_tx_source(tx_obj, w3: Web3) -> str:
@@ -115,8 +105,8 @@ def analyze_tx_source(tx_obj, w3: Web3) -> str:
     try:
         # prefer Arkham enrichment
         try:
-            _from = tx_obj.get("from") if isinstance(tx_obj, dict) else getattr(tx_obj, "from", None)
-            _to = tx_obj.get("to") if isinstance(tx_obj, dict) else getattr(tx_obj, "to", None)
+            _from = tx_obj.get("from") if isinstance(tx_obj, (dict, TxRecord)) else getattr(tx_obj, "from", None)
+            _to = tx_obj.get("to") if isinstance(tx_obj, (dict, TxRecord)) else getattr(tx_obj, "to", None)
         except Exception:
             _from = None
             _to = None
@@ -133,7 +123,7 @@ def analyze_tx_source(tx_obj, w3: Web3) -> str:
 
         # input heuristics
         input_data = ""
-        if isinstance(tx_obj, dict):
+        if isinstance(tx_obj, (dict, TxRecord)):
             input_data = tx_obj.get("input") or tx_obj.get("data") or ""
         else:
             input_data = getattr(tx_obj, "input", "") or getattr(tx_obj, "data", "") or ""
@@ -162,44 +152,179 @@ def analyze_tx_source(tx_obj, w3: Web3) -> str:
         return "Unknown"
 
 
-def fetch_last_txs_from_explorer(chain_name: str, address: str, limit: int = 10):
-    """
-    Fallback using Etherscan/Polygonscan/BscScan APIs to fetch recent txs for an address.
-    Returns:
-      - list of tx dicts (newest first) on success
-      - [] if explorer returned no txs
-      - None if API key missing or request failed
-    """
-    cfg = EXPLORER_APIS.get(chain_name)
-    if not cfg:
-        return None
-    api_key = os.getenv(cfg["env_key"])
-    if not api_key:
-        logger.debug("Explorer API key missing for chain %s (env var: %s)", chain_name, cfg["env_key"])
-        return None
+def fetch_tx_bundle(client, tx_hash: str, cancelled):
+    """Fetch (tx, receipt, block) for a hash on one chain (fan-out fetch function)."""
+    w3 = client.w3
+    tx = w3.eth.get_transaction(tx_hash)
+    check_cancelled(cancelled)
+    receipt = w3.eth.get_transaction_receipt(tx_hash)
+    check_cancelled(cancelled)
+    block = w3.eth.get_block(receipt.blockNumber)
+    return tx, receipt, block
+
+
+def tx_context(tx_hash: str, tx, receipt, block, labels: dict) -> dict:
+    """Template dict for tx_search.html from a (tx, receipt, block) bundle."""
+    timestamp = datetime.fromtimestamp(block.timestamp, tz=timezone.utc)
+    return {
+        "hash": tx_hash,
+        "status": "Success" if (getattr(receipt, "status", receipt.get("status")) == 1) else "Failed",
+        "from": (tx.get("from"), labels.get((tx.get("from") or "").lower())),
+        "to": (tx.get("to"), labels.get((tx.get("to") or "").lower())),
+        "value": float(Web3.from_wei(int(tx.get("value", 0)), "ether")),
+        "gas": int(tx.get("gas", 0)),
+        "block": int(receipt.blockNumber),
+        "time": timestamp,
+        "input": tx.get("input") or tx.get("data") or "",
+    }
+
 
-    params = {
-        "module": "account",
-        "action": "txlist",
-        "address": address,
-        "startblock": 0,
-        "endblock": 99999999,
-        "page": 1,
-        "offset": limit,
-        "sort": "desc",
-        "apikey": api_key,
+def pdf_tx_data(tx_hash: str, chain_name: str, tx, receipt, block) -> dict:
+    """Ordered key/value lines for the plain-text tx PDF."""
+    timestamp = datetime.fromtimestamp(block.timestamp, tz=timezone.utc)
+    from_addr = tx.get("from")
+    to_addr = tx.get("to")
+    return {
+        "Hash": tx_hash,
+        "Chain": chain_name,
+        "Status": "Success" if (getattr(receipt, "status", receipt.get("status")) == 1) else "Failed",
+        "From": from_addr or "",
+        "To": to_addr or "",
+        "Value (ETH)": str(Web3.from_wei(int(tx.get("value", 0) or 0), "ether")),
+        "Gas (limit)": str(tx.get("gas", "")),
+        "Gas Price (wei)": str(tx.get("gasPrice", "")),
+        "Block": str(receipt.blockNumber),
+        "Block Timestamp (UTC)": timestamp.isoformat(),
     }
+
+
+class WalletOrigin(NamedTuple):
+    client: ChainClient
+    chain: str
+    wallet: str
+    start_block: int
+
+
+def locate_wallet(tx_hash: str, selected_chain: Optional[str]) -> Tuple[Optional[WalletOrigin], Optional[str]]:
+    """Find the base tx (memoised chain, else all chains at once unless one is selected); returns (origin, error)."""
+    chains_to_search = [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
+    hit = find_tx(RPC_CLIENTS, tx_hash, chains_to_search,
+                  lambda client, cancelled: client.w3.eth.get_transaction(tx_hash))
+    if hit is None or not hit.result:
+        return None, f"Transaction {tx_hash} not found on supported chains or node doesn't have it."
+    base_tx = hit.result
+    from_addr = base_tx.get("from")
+    if not from_addr:
+        return None, "Source address not found in base transaction."
     try:
-        r = requests.get(cfg["api_base"], params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        if data.get("status") == "1" and isinstance(data.get("result"), list):
-            return data["result"]
-        logger.debug("Explorer API returned status=%s message=%s", data.get("status"), data.get("message"))
-        return []
-    except Exception as exc:
-        logger.exception("Explorer API request failed for %s: %s", chain_name, exc)
-        return None
+        start_block = int(base_tx.get("blockNumber") or hit.client.tip())
+    except Exception:
+        start_block = hit.client.tip()
+    return WalletOrigin(hit.client, hit.chain, from_addr, start_block), None
+
+
+def sse_event(event: str, data) -> str:
+    """One Server-Sent Events message (TxRecords serialise like in txs_json)."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=TxRecordEncoder)}\n\n"
+
+
+def label_tx_sources(collected: list, w3: Web3):
+    """Fill in the source of node/index rows (explorer rows are already labelled)."""
+    for tx_info in collected:
+        if tx_info.source:
+            continue
+        try:
+            tx_info.source = analyze_tx_source(tx_info, w3)
+        except Exception:
+            tx_info.source = "Unknown"
+
+
+def history_error(history, wallet: str) -> str:
+    """Error shown when neither the node scan nor the explorer found txs."""
+    if history.explorer_ok is False:
+        return "Explorer API error or missing API key. Check explorer keys in variables.env."
+    if history.explorer_ok:
+        return f"Explorer returned no transactions for wallet {wallet}."
+    return f"No recent transactions found for wallet {wallet}."
+
+
+def labelled_history(origin: WalletOrigin, limit: int = 10):
+    """wallet_history() for a located wallet, with every row's source filled in."""
+    history = wallet_history(origin.client, origin.wallet, origin.start_block, SCAN_BLOCK_BUDGET, limit=limit)
+    if history.txs and ARKHAM_KEY:
+        # label every counterparty at once; analyze_tx_source then hits the cache
+        resolve_labels([a for tx_info in history.txs if not tx_info.source for a in (tx_info.from_, tx_info.to)])
+    label_tx_sources(history.txs, origin.client.w3)
+    return history
+
+
+def last10_results(collected: list) -> dict:
+    """Sorted rows, chart payload and aggregates for last10_from_tx.html."""
+    # sort newest -> oldest
+    collected_sorted = sorted(collected, key=lambda x: x.block or 0, reverse=True)[:10]
+
+    # prepare chart payload and aggregates
+    labels = []
+    values = []
+    gas_list = []
+    hashes = []
+    total_value = 0.0
+    for tx in collected_sorted:
+        ts = tx.timestamp or datetime.now(timezone.utc)
+        labels.append(f"{tx.block} • {ts.strftime('%Y-%m-%d %H:%M')}")
+        values.append(round(tx.value_eth, 6))
+        gas_list.append(tx.gas)
+        hashes.append(tx.hash)
+        total_value += tx.value_eth
+
+    chart_payload = {"labels": labels, "values": values, "gas": gas_list, "hashes": hashes}
+    return {
+        "txs": collected_sorted,
+        "txs_json": json_script(collected_sorted, "last10-data", encoder=TxRecordEncoder),
+        "chart_json": json.dumps(chart_payload),
+        "total_value_eth": round(total_value, 6),
+        "tx_count": len(collected_sorted),
+        "err": None,
+    }
+
+
+def flight_key(tx_hash: str, selected_chain: Optional[str]) -> str:
+    """Coalescing key of a lookup: the same hash asked for on the same chain(s)."""
+    return f"{tx_hash.lower()}|{selected_chain or ''}"
+
+
+def search_tx(tx_hash: str, selected_chain: Optional[str]) -> dict:
+    """tx_search lookup: the context keys it sets ({"tx", "chain"} or {"err"})."""
+    chains_to_search = [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
+
+    # the chain this hash was found on before, else every candidate chain at once (first one wins)
+    hit = find_tx(RPC_CLIENTS, tx_hash, chains_to_search,
+                  lambda client, cancelled: fetch_tx_bundle(client, tx_hash, cancelled))
+    if hit is None:
+        return {"err": f"Transaction {tx_hash} not found on selected chain(s)."}
+    tx, receipt, block = hit.result
+    labels = resolve_labels([tx.get("from"), tx.get("to")]) if ARKHAM_KEY else {}
+    return {"tx": tx_context(tx_hash, tx, receipt, block, labels), "chain": hit.chain}
+
+
+def last10_lookup(tx_hash: str, selected_chain: Optional[str]) -> dict:
+    """
+    Locate the wallet and collect its last 10 txs: the last10_from_tx context
+    keys ({"err"} if the base tx is not found; wallet, chain, history_source
+    and last10_results() or "err" otherwise).
+    """
+    # Step 1: find base tx on any chain and derive the wallet from it
+    origin, err = locate_wallet(tx_hash, selected_chain)
+    if origin is None:
+        return {"err": err}
+    # Step 2: race the explorer against the index + parallel batched node scan
+    history = labelled_history(origin)
+    result = {"wallet": origin.wallet, "chain": origin.chain, "history_source": history.source}
+    if not history.txs:
+        result["err"] = history_error(history, origin.wallet)
+        return result
+    result.update(last10_results(history.txs))
+    return result
 
 
 # -------------------- Views --------------------
@@ -227,48 +352,8 @@ def tx_search(request):
         context["err"] = "Invalid transaction hash format"
         return render(request, "tx_search.html", context)
 
-    chains_to_search = [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
-
-    found = False
-    for chain_name in chains_to_search:
-        rpc = RPC_ENDPOINTS.get(chain_name)
-        if not rpc:
-            continue
-        try:
-            w3 = Web3(Web3.HTTPProvider(rpc))
-            if not w3.is_connected():
-                logger.debug("RPC not connected for %s", chain_name)
-                continue
-
-            tx = w3.eth.get_transaction(query)
-            receipt = w3.eth.get_transaction_receipt(query)
-            block = w3.eth.get_block(receipt.blockNumber)
-            timestamp = datetime.fromtimestamp(block.timestamp, tz=timezone.utc)
-
-            from_label = arkham_label_for(tx.get("from")) if ARKHAM_KEY else None
-            to_label = arkham_label_for(tx.get("to")) if ARKHAM_KEY and tx.get("to") else None
-
-            context["tx"] = {
-                "hash": query,
-                "status": "Success" if (getattr(receipt, "status", receipt.get("status")) == 1) else "Failed",
-                "from": (tx.get("from"), from_label),
-                "to": (tx.get("to"), to_label),
-                "value": float(Web3.from_wei(int(tx.get("value", 0)), "ether")),
-                "gas": int(tx.get("gas", 0)),
-                "block": int(receipt.blockNumber),
-                "time": timestamp,
-                "input": tx.get("input") or tx.get("data") or "",
-            }
-            context["chain"] = chain_name
-            found = True
-            break
-        except Exception as e:
-            logger.debug("Transaction not found on %s or error: %s", chain_name, e)
-            continue
-
-    if not found:
-        context["err"] = f"Transaction {query} not found on selected chain(s)."
-
+    context.update(TX_SEARCH_FLIGHT.do(flight_key(query, selected_chain),
+                                       lambda: search_tx(query, selected_chain)))
     return render(request, "tx_search.html", context)
 
 
@@ -277,8 +362,8 @@ def last10_from_tx(request):
     Given ?q=<tx_hash>&chain=<optional chain>:
       - locate base tx
       - take base_tx['from'] as wallet
-      - scan backwards collecting up to 10 txs where from OR to matches wallet
-      - fallback to explorer if node scan fails
+      - collect up to 10 txs where from OR to matches wallet, racing the
+        explorer against the index/node scan (see history.wallet_history)
     Renders last10_graph.html with:
       txs, chart_json, total_value_eth, tx_count, wallet, query, chain, chains, err
     """
@@ -305,172 +390,174 @@ def last10_from_tx(request):
         context["err"] = "Invalid transaction hash format"
         return render(request, "last10_from_tx.html", context)
 
-    # Step 1: find base tx and a working w3 instance (try selected chain first)
-    chains_to_search = [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
-    base_tx = None
-    w3 = None
-    found_chain = None
-    for chain_name in chains_to_search:
-        rpc = RPC_ENDPOINTS.get(chain_name)
-        if not rpc:
-            continue
-        try:
-            candidate = Web3(Web3.HTTPProvider(rpc))
-            if not candidate.is_connected():
-                logger.debug("RPC not connected for %s", chain_name)
-                continue
-            base_tx = candidate.eth.get_transaction(tx_hash)
-            w3 = candidate
-            found_chain = chain_name
-            break
-        except Exception as e:
-            logger.debug("tx not found on %s: %s", chain_name, e)
-            continue
-
-    if not base_tx or w3 is None:
-        context["err"] = f"Transaction {tx_hash} not found on supported chains or node doesn't have it."
+    if request.GET.get("stream") == "1":
+        # Step 1 only: find base tx on any chain and derive the wallet from it;
+        # render the page now, rows arrive over last10_stream (SSE)
+        origin, err = locate_wallet(tx_hash, selected_chain)
+        if origin is None:
+            context["err"] = err
+        else:
+            context.update(wallet=origin.wallet, chain=origin.chain,
+                           stream_url=f"{reverse('last10_stream')}?{request.GET.urlencode()}")
         return render(request, "last10_from_tx.html", context)
 
-    # derive wallet from base tx
-    from_addr = base_tx.get("from")
-    if not from_addr:
-        context["err"] = "Source address not found in base transaction."
-        return render(request, "last10_from_tx.html", context)
-    context["wallet"] = from_addr
-    context["chain"] = found_chain
+    # one lookup per (hash, chain) at a time across workers; everyone asking meanwhile shares it
+    context.update(LAST10_FLIGHT.do(flight_key(tx_hash, selected_chain),
+                                    lambda: last10_lookup(tx_hash, selected_chain)))
+    return render(request, "last10_from_tx.html", context)
 
-    # determine starting block
-    try:
-        start_block = int(base_tx.get("blockNumber") or w3.eth.block_number)
-    except Exception:
-        start_block = w3.eth.block_number
 
-    # Step 2: scan backwards block-by-block (node-first)
-    collected = []
-    block_num = start_block
-    safety_limit = 8000  # blocks to scan max (tune if needed)
-    scanned = 0
+def last10_stream(request):
+    """
+    Server-Sent Events for last10_from_tx (?q=<tx_hash>&chain=<optional chain>):
+      - wallet:   {wallet, chain, start_block} once the base tx is found
+      - tx:       one matched tx (TxRecord fields) as soon as the scan merges it
+      - progress: {current_block, blocks_scanned, budget} while scanning
+      - done:     {txs, total_value_eth, tx_count, source} final, authoritative rows
+      - failed:   {err}
+    """
+    tx_hash = (request.GET.get("q") or "").strip()
+    selected_chain = request.GET.get("chain")
 
-    while block_num >= 0 and len(collected) < 10 and scanned < safety_limit:
+    def events():
+        if not tx_hash.startswith("0x") or len(tx_hash) < 10:
+            yield sse_event("failed", {"err": "Invalid transaction hash format"})
+            return
+        origin, err = locate_wallet(tx_hash, selected_chain)
+        if origin is None:
+            yield sse_event("failed", {"err": err})
+            return
+        client, chain, wallet, start_block = origin
+        yield sse_event("wallet", {"wallet": wallet, "chain": chain, "start_block": start_block})
+
+        updates: "queue.Queue" = queue.Queue()
+        last_progress = [0.0]
+        # set once the client has gone; the scan gives up at its next progress report
+        disconnected = threading.Event()
+
+        def progress(matches, current_block):
+            check_cancelled(disconnected)
+            now = time.monotonic()
+            if matches or now - last_progress[0] >= SSE_PROGRESS_INTERVAL:
+                last_progress[0] = now
+                updates.put(("progress", (list(matches), current_block)))
+
+        def run():
+            try:
+                updates.put(("done", wallet_history(client, wallet, start_block, SCAN_BLOCK_BUDGET,
+                                                    limit=10, progress=progress, cancelled=disconnected)))
+            except Exception as e:
+                logger.exception("last10 stream failed for %s on %s: %s", wallet, chain, e)
+                updates.put(("failed", "Lookup failed, please retry."))
+            finally:
+                connection.close()
+
+        # the scan thread reports its calls to this request (see instrumentation)
+        threading.Thread(target=copy_context().run, args=(run,), name="last10-stream", daemon=True).start()
+        sent = set()
         try:
-            block = w3.eth.get_block(block_num, full_transactions=True)
-        except Exception as e:
-            logger.debug("Could not fetch block %s: %s", block_num, e)
-            block_num -= 1
-            scanned += 1
-            continue
-
-        block_ts = getattr(block, "timestamp", None) or (block.get("timestamp") if isinstance(block, dict) else None)
-        for t in (block.transactions or []):
-            # support AttributeDict-like and dict forms
-            t_from = (t.get("from") if isinstance(t, dict) else getattr(t, "from", None))
-            t_to = (t.get("to") if isinstance(t, dict) else getattr(t, "to", None))
-            if not t_from:
-                continue
-            if (t_from and t_from.lower() == from_addr.lower()) or (t_to and t_to.lower() == from_addr.lower()):
-                # normalize
-                _hash = None
-                if hasattr(t, "hash"):
-                    h = getattr(t, "hash")
-                    _hash = h.hex() if hasattr(h, "hex") else str(h)
-                else:
-                    _hash = t.get("hash")
-
-                value_wei = int(t.get("value", 0) if isinstance(t, dict) else getattr(t, "value", 0) or 0)
-                value_eth = float(Web3.from_wei(value_wei, "ether"))
-                gas = int(t.get("gas", 0) if isinstance(t, dict) else getattr(t, "gas", 0) or 0)
-                ts = datetime.fromtimestamp(int(block_ts), tz=timezone.utc) if block_ts else None
-
-                tx_info = {
-                    "hash": _hash,
-                    "from": t_from,
-                    "to": t_to,
-                    "value_wei": value_wei,
-                    "value_eth": value_eth,
-                    "gas": gas,
-                    "block": int(block_num),
-                    "timestamp": ts,
-                    "input": (t.get("input") if isinstance(t, dict) else getattr(t, "input", "")) or "",
-                }
+            while True:
                 try:
-                    tx_info["source"] = analyze_tx_source(t if isinstance(t, dict) else t, w3)
-                except Exception:
-                    tx_info["source"] = "Unknown"
-
-                collected.append(tx_info)
-                if len(collected) >= 10:
-                    break
-
-        block_num -= 1
-        scanned += 1
-
-    # Step 3: if node scan returned nothing, attempt explorer fallback
-    if not collected:
-        logger.debug("Node scan returned 0 txs; attempting explorer fallback for %s on %s", from_addr, found_chain)
-        explorer_txs = fetch_last_txs_from_explorer(found_chain, from_addr, limit=10)
-        if explorer_txs is None:
-            context["err"] = ("Explorer API error or missing API key. Check explorer keys in variables.env.")
-            return render(request, "last10_from_tx.html", context)
-        if not explorer_txs:
-            context["err"] = f"Explorer returned no transactions for wallet {from_addr}."
-            return render(request, "last10_from_tx.html", context)
-
-        collected = []
-        for et in explorer_txs:
-            try:
-                v_wei = int(et.get("value", 0) or 0)
-            except Exception:
-                v_wei = 0
-            v_eth = float(Web3.from_wei(v_wei, "ether"))
-            tx_info = {
-                "hash": et.get("hash"),
-                "from": et.get("from"),
-                "to": et.get("to"),
-                "value_wei": v_wei,
-                "value_eth": v_eth,
-                "gas": int(et.get("gas", 0) or 0),
-                "block": int(et.get("blockNumber") or 0),
-                "timestamp": datetime.fromtimestamp(int(et.get("timeStamp") or 0), tz=timezone.utc) if et.get("timeStamp") else None,
-                "input": et.get("input") or "",
-                "source": "Explorer (raw)",
-            }
-            # Add explorer URLs for template
-            explorer_cfg = EXPLORER_APIS.get(found_chain)
-            tx_info["explorer_url"] = explorer_cfg["explorer_tx"].format(tx_info["hash"])
-            tx_info["to_explorer_url"] = explorer_cfg["explorer_addr"].format(tx_info["to"]) if tx_info["to"] else None
-            collected.append(tx_info)
-
-    if not collected:
-        context["err"] = f"No recent transactions found for wallet {from_addr}."
-        return render(request, "last10_from_tx.html", context)
-
-    # sort newest -> oldest
-    collected_sorted = sorted(collected, key=lambda x: x.get("block") or 0, reverse=True)[:10]
+                    kind, payload = updates.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if kind == "progress":
+                    matches, current_block = payload
+                    for tx_info in matches:
+                        if tx_info.hash not in sent and len(sent) < 10:
+                            sent.add(tx_info.hash)
+                            yield sse_event("tx", tx_info)
+                    yield sse_event("progress", {"current_block": current_block,
+                                                 "blocks_scanned": start_block - current_block + 1,
+                                                 "budget": SCAN_BLOCK_BUDGET})
+                elif kind == "failed":
+                    yield sse_event("failed", {"err": payload})
+                    return
+                else:
+                    history = payload
+                    if not history.txs:
+                        yield sse_event("failed", {"err": history_error(history, wallet)})
+                        return
+                    if ARKHAM_KEY:
+                        resolve_labels([a for t in history.txs if not t.source for a in (t.from_, t.to)])
+                    label_tx_sources(history.txs, client.w3)
+                    results = last10_results(history.txs)
+                    yield sse_event("done", {"txs": results["txs"], "total_value_eth": results["total_value_eth"],
+                                             "tx_count": results["tx_count"], "source": history.source})
+                    return
+        finally:
+            # the client disconnected (generator closed) or the stream ended
+            disconnected.set()
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # let nginx pass events through unbuffered
+    return response
+
+
+def wallet_lookup_json(request, label: str, lookup: Callable[[WalletOrigin, int], Dict[str, Any]], rows: str,
+                       hash_attr: str, fields: Tuple[str, ...], hint: str = "try again later") -> JsonResponse:
+    """
+    Shared body of the JSON wallet lookups (?q=<tx_hash>&chain=<optional chain>&limit=<1..100>):
+    validates the query, locates the wallet and returns lookup(origin, limit)[rows] (objects with
+    to_dict(), linked to the explorer by their hash_attr) plus the listed fields, or {err}
+    (hint is appended to the node failure message).
+    """
+    tx_hash = (request.GET.get("q") or "").strip()
+    selected_chain = request.GET.get("chain")
+    if not tx_hash.startswith("0x") or len(tx_hash) < 10:
+        return JsonResponse({"err": "Invalid transaction hash format"}, status=400)
+    try:
+        limit = max(1, min(100, int(request.GET.get("limit") or 10)))
+    except ValueError:
+        return JsonResponse({"err": "limit must be a number"}, status=400)
 
-    # prepare chart payload and aggregates
-    labels = []
-    values = []
-    gas_list = []
-    hashes = []
-    total_value = 0.0
-    for tx in collected_sorted:
-        ts = tx.get("timestamp") or datetime.now(timezone.utc)
-        labels.append(f"{tx['block']} • {ts.strftime('%Y-%m-%d %H:%M')}")
-        values.append(round(tx["value_eth"], 6))
-        gas_list.append(tx["gas"])
-        hashes.append(tx["hash"])
-        total_value += tx["value_eth"]
+    origin, err = locate_wallet(tx_hash, selected_chain)
+    if origin is None:
+        return JsonResponse({"err": err}, status=404)
+    try:
+        found = lookup(origin, limit)
+    except Exception as e:
+        # the exception text can carry the RPC URL (and its API key): log it, do not echo it
+        logger.warning("%s failed for %s on %s: %s", label, origin.wallet, origin.chain, e)
+        return JsonResponse({"err": f"{label} failed on the node; {hint}.",
+                             "wallet": origin.wallet, "chain": origin.chain}, status=502)
+    explorer_cfg = EXPLORER_APIS.get(origin.chain)
+    out = []
+    for item in found[rows]:
+        row = item.to_dict()
+        if explorer_cfg and getattr(item, hash_attr):
+            row["explorer_url"] = explorer_cfg["explorer_tx"].format(getattr(item, hash_attr))
+        out.append(row)
+    body = {"wallet": origin.wallet, "chain": origin.chain, rows: out}
+    body.update((key, found[key]) for key in fields)
+    return JsonResponse(body)
+
+
+def last10_tokens(request):
+    """
+    ERC-20 / ERC-721 transfers of the wallet behind ?q=<tx_hash>&chain=<optional chain>,
+    sent and received, newest first, from eth_getLogs (see transfers.py); ?limit= up to 100.
+    JSON: {wallet, chain, transfers, lowest_block, complete, calls} or {err}.
+    """
+    return wallet_lookup_json(
+        request, "Token transfer lookup",
+        lambda origin, limit: token_transfers(origin.client, origin.wallet, origin.start_block, limit=limit),
+        "transfers", "tx_hash", ("lowest_block", "complete", "calls"))
 
-    chart_payload = {"labels": labels, "values": values, "gas": gas_list, "hashes": hashes}
 
-    context.update({
-        "txs": collected_sorted,
-        "chart_json": json.dumps(chart_payload),
-        "total_value_eth": round(total_value, 6),
-        "tx_count": len(collected_sorted),
-        "err": None,
-    })
-    return render(request, "last10_from_tx.html", context)
+def last10_sent(request):
+    """
+    The newest txs sent by the wallet behind ?q=<tx_hash>&chain=<optional chain>,
+    located by nonce bisection instead of a block scan (see nonces.py; needs an
+    archive node); ?limit= up to 100.
+    JSON: {wallet, chain, txs, nonce, lowest_block, calls} or {err}.
+    """
+    return wallet_lookup_json(
+        request, "Nonce lookup",
+        lambda origin, limit: sent_txs(origin.client, origin.wallet, origin.start_block, limit=limit),
+        "txs", "hash", ("nonce", "lowest_block", "calls"), hint="it needs an archive node")
 
 
 def download_tx_pdf_plain(request):
@@ -482,44 +569,23 @@ def download_tx_pdf_plain(request):
     selected_chain = request.GET.get("chain")
     if not tx_hash:
         return HttpResponse("Missing transaction hash (q parameter).", status=400)
-    if not tx_hash.startswith("0x") or len(tx_hash) != 66:
+    if not is_tx_hash(tx_hash):
         return HttpResponse("Invalid transaction hash format.", status=400)
 
+    # a finalized tx's PDF is rendered once and then served from disk
+    cached = cached_pdf_response(known_chain(tx_hash) or selected_chain, tx_hash)
+    if cached is not None:
+        return cached
+
     chains_to_search = [selected_chain] if selected_chain else list(RPC_ENDPOINTS.keys())
     found = False
     tx_data = None
-    for chain_name in chains_to_search:
-        rpc = RPC_ENDPOINTS.get(chain_name)
-        if not rpc:
-            continue
-        try:
-            w3 = Web3(Web3.HTTPProvider(rpc))
-            if not w3.is_connected():
-                continue
-            tx = w3.eth.get_transaction(tx_hash)
-            receipt = w3.eth.get_transaction_receipt(tx_hash)
-            block = w3.eth.get_block(receipt.blockNumber)
-            timestamp = datetime.fromtimestamp(block.timestamp, tz=timezone.utc)
-
-            from_addr = tx.get("from")
-            to_addr = tx.get("to")
-            tx_data = {
-                "Hash": tx_hash,
-                "Chain": chain_name,
-                "Status": "Success" if (getattr(receipt, "status", receipt.get("status")) == 1) else "Failed",
-                "From": from_addr or "",
-                "To": to_addr or "",
-                "Value (ETH)": str(Web3.from_wei(int(tx.get("value", 0) or 0), "ether")),
-                "Gas (limit)": str(tx.get("gas", "")),
-                "Gas Price (wei)": str(tx.get("gasPrice", "")),
-                "Block": str(receipt.blockNumber),
-                "Block Timestamp (UTC)": timestamp.isoformat(),
-            }
-            found = True
-            break
-        except Exception as e:
-            logger.debug("Chain %s error when building pdf tx: %s", chain_name, e)
-            continue
+    hit = find_tx(RPC_CLIENTS, tx_hash, chains_to_search,
+                  lambda client, cancelled: fetch_tx_bundle(client, tx_hash, cancelled))
+    if hit is not None:
+        tx, receipt, block = hit.result
+        tx_data = pdf_tx_data(tx_hash, hit.chain, tx, receipt, block)
+        found = True
 
     if not found or not tx_data:
         return HttpResponse(f"Transaction {tx_hash} not found.", status=404)
@@ -528,35 +594,43 @@ def download_tx_pdf_plain(request):
         return HttpResponse("PDF generation dependency missing. Install reportlab (pip install reportlab).", status=500)
 
     # Create plain-text PDF
-    buffer = BytesIO()
-    c = rl_canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    margin_x = 40
-    margin_top = height - 40
-    textobj = c.beginText(margin_x, margin_top)
-    textobj.setFont("Courier", 10)
-    textobj.setLeading(14)
-
-    for key, val in tx_data.items():
-        line = f"{key}: {val}"
-        wrapped = textwrap.wrap(line, width=100) or [line]
-        for w in wrapped:
-            textobj.textLine(w)
-        textobj.textLine("")
-        if textobj.getY() < 80:
-            c.drawText(textobj)
-            c.showPage()
-            textobj = c.beginText(margin_x, margin_top)
-            textobj.setFont("Courier", 10)
-            textobj.setLeading(14)
-
-    c.drawText(textobj)
-    c.showPage()
-    c.save()
-
-    pdf = buffer.getvalue()
-    buffer.close()
-    filename = f"tx_{tx_hash[:10]}.pdf"
-    resp = HttpResponse(pdf, content_type="application/pdf")
-    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return resp
+    pdf = render_tx_pdf(tx_data)
+    if int(receipt.blockNumber) <= hit.client.final_block(int(receipt.blockNumber)):
+        store_pdf(hit.chain, tx_hash, pdf)
+    return pdf_response(pdf, tx_hash)
+
+
+def last10_report(request):
+    """
+    The last10_from_tx result set as one plain-text PDF.
+    Query: ?q=<tx_hash>&chain=<optional chain>
+    """
+    tx_hash = (request.GET.get("q") or "").strip()
+    if not tx_hash:
+        return HttpResponse("Missing transaction hash (q parameter).", status=400)
+    if not tx_hash.startswith("0x") or len(tx_hash) < 10:
+        return HttpResponse("Invalid transaction hash format.", status=400)
+    if not REPORTLAB_AVAILABLE:
+        return HttpResponse("PDF generation dependency missing. Install reportlab (pip install reportlab).", status=500)
+
+    selected_chain = request.GET.get("chain")
+    # same lookup as the page, so a report requested alongside it shares the scan
+    results = LAST10_FLIGHT.do(flight_key(tx_hash, selected_chain), lambda: last10_lookup(tx_hash, selected_chain))
+    if results.get("err"):
+        return HttpResponse(results["err"], status=404)
+
+    pdf = render_report_pdf({
+        "Wallet": results["wallet"],
+        "Chain": results["chain"],
+        "Base transaction": tx_hash,
+        "Transactions": str(results["tx_count"]),
+        "Total value (ETH)": str(results["total_value_eth"]),
+    }, results["txs"])
+    return pdf_response(pdf, tx_hash, filename=f"last10_{results['wallet'][:10]}.pdf")
+
+
+def rpc_pool_stats(request):
+    """Per-chain pooled RPC client statistics for this worker (JSON)."""
+    return JsonResponse({"pid": os.getpid(), "chains": RPC_CLIENTS.stats(), "cache": RPC_CLIENTS.cache_stats(),
+                         "history": history_stats(), "followers": follower_stats(),
+                         "bloom": bloom_stats()})
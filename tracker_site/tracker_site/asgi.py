@@ -2,6 +2,8 @@
 ASGI config for tracker_site project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn tracker_site.asgi:application``)
+to run the async views under /async/ without a thread per request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
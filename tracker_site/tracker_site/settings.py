@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -19,6 +20,9 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")  
 
+# Writable runtime state (disk caches, metrics) lives outside the source tree.
+RUNTIME_DIR = Path(os.getenv("TRACKER_RUNTIME_DIR") or Path(tempfile.gettempdir()) / "tracker_site")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -45,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its totals cover every other middleware (see tracker/instrumentation.py)
+    'tracker.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +91,59 @@ DATABASES = {
 }
 
 
+# Caches
+# rpc_memory is a bounded LRU tier and rpc_disk a persistent tier for
+# finalized JSON-RPC responses (see tracker/rpc_cache.py). rpc_disk only
+# counts its files once a minute (tracker/disk_cache.py); plain FileBasedCache
+# lists the whole directory on every set().
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'rpc_memory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rpc-memory',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("RPC_CACHE_MEMORY_ENTRIES", "5000"))},
+    },
+    'rpc_disk': {
+        'BACKEND': 'tracker.disk_cache.PeriodicCullFileBasedCache',
+        'LOCATION': os.getenv("RPC_CACHE_DIR", str(RUNTIME_DIR / 'rpc')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv("RPC_CACHE_DISK_ENTRIES", "50000"))},
+    },
+    # results of coalesced lookups handed to waiting workers (tracker/singleflight.py)
+    'singleflight': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv("SINGLEFLIGHT_CACHE_DIR", str(RUNTIME_DIR / 'singleflight')),
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+
+# Logging
+# REQUEST_TIMINGS_LOG_LEVEL=INFO logs one JSON "request timings" line per
+# request (outbound calls by chain and method, see tracker/instrumentation.py);
+# off by default. Other loggers keep Django's defaults.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tracker.instrumentation': {
+            'handlers': ['console'],
+            'level': os.getenv("REQUEST_TIMINGS_LOG_LEVEL", "WARNING"),
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 